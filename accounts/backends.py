@@ -0,0 +1,99 @@
+"""
+Authentication backend that grants the permissions of the user's active role.
+
+Permissions are compiled into frozensets of ``app_label.codename``: one per
+role, and one per user combining their own, their groups' and their
+active role's. Both live in the cache under a permission version that any
+change to role, group or user permissions bumps (see ``accounts.signals``),
+and the user's set is keyed by their active role too, so switching roles
+needs no invalidation. On requests the active role is the one resolved by
+``accounts.roles`` (session switch included), bound to the user by
+``ActiveRoleMiddleware``. After warm-up ``has_perm``, ``has_perms`` and
+``has_module_perms`` (the admin index, ``perms`` in templates) are answered
+from memory without queries.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+from .roles import get_active_role_id
+
+
+ROLE_PERMISSIONS_CACHE_KEY = 'accounts:perms:role:{role_id}:v{version}'
+USER_PERMISSIONS_CACHE_KEY = 'accounts:perms:user:{user_id}:r{role_id}:s{superuser:d}:v{version}'
+PERMISSION_VERSION_CACHE_KEY = 'accounts:perms:version'
+PERMISSIONS_TIMEOUT = 60 * 60
+
+
+def get_permission_version():
+    return cache.get(PERMISSION_VERSION_CACHE_KEY, 0)
+
+
+def bump_permission_version():
+    """Invalidate every compiled permission set."""
+    cache.add(PERMISSION_VERSION_CACHE_KEY, 0, None)
+    try:
+        cache.incr(PERMISSION_VERSION_CACHE_KEY)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(PERMISSION_VERSION_CACHE_KEY, 1, None)
+
+
+def _permission_names(permissions):
+    return frozenset(
+        f'{app_label}.{codename}'
+        for app_label, codename in permissions.values_list('content_type__app_label', 'codename').order_by()
+    )
+
+
+def get_role_permissions(role_id, version=None):
+    """The compiled permissions of the role ``role_id``."""
+    if role_id is None:
+        return frozenset()
+    if version is None:
+        version = get_permission_version()
+    key = ROLE_PERMISSIONS_CACHE_KEY.format(role_id=role_id, version=version)
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = _permission_names(Permission.objects.filter(role=role_id))
+        cache.set(key, permissions, PERMISSIONS_TIMEOUT)
+    return permissions
+
+
+class RoleBackend(ModelBackend):
+    """
+    ModelBackend plus the permissions of the user's active role, compiled and cached.
+
+    Configuration:
+        Add to settings.py:
+        AUTHENTICATION_BACKENDS = ['accounts.backends.RoleBackend']
+    """
+
+    def get_role_permissions(self, user_obj, obj=None):
+        """Return the permission strings of ``user_obj``'s active role."""
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set(get_role_permissions(get_active_role_id(user_obj)))
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            version = get_permission_version()
+            role_id = get_active_role_id(user_obj)
+            key = USER_PERMISSIONS_CACHE_KEY.format(
+                user_id=user_obj.pk, role_id=role_id,
+                superuser=user_obj.is_superuser, version=version,
+            )
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = frozenset(
+                    super().get_all_permissions(user_obj)
+                ) | get_role_permissions(role_id, version)
+                cache.set(key, permissions, PERMISSIONS_TIMEOUT)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
+
+    async def aget_all_permissions(self, user_obj, obj=None):
+        return await sync_to_async(self.get_all_permissions)(user_obj, obj)
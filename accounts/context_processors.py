@@ -1,25 +1,77 @@
+from collections.abc import Mapping
+from functools import partial
+
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_active_role, get_user_roles, role_matches
+
+
+# Common role flags (case-insensitive)
+ROLE_FLAGS = (
+    'is_student',
+    'is_teacher',
+    'is_admin',
+    'is_administrator',
+    'is_manager',
+    'is_employee',
+    'is_director',
+    'is_owner',
+    'is_parent',
+)
+
+
+class RoleFlags(Mapping):
+    """
+    Lazy ``is_<role>`` flags for the request's active role.
+
+    Each flag is computed when a template first reads it, and the active
+    role behind them is resolved once per request (see ``accounts.roles``).
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._flags = {}
+
+    def __getitem__(self, name):
+        if name not in ROLE_FLAGS:
+            raise KeyError(name)
+        if name not in self._flags:
+            self._flags[name] = role_matches(get_active_role(self.request), name[len('is_'):])
+        return self._flags[name]
+
+    def __iter__(self):
+        return iter(ROLE_FLAGS)
+
+    def __len__(self):
+        return len(ROLE_FLAGS)
+
+
 def user_roles(request):
     """
     Context processor to inject user role information into all templates.
-    
+
     Provides:
         - active_role: Current active Role object (session or DB)
-        - user_roles: QuerySet of all roles assigned to user
+        - user_roles: List of all roles assigned to user
+        - role_flags: RoleFlags mapping of the flags below
         - Role-specific boolean flags for common roles
-    
+
+    Every value is lazy: a template that reads none of them costs no
+    queries, and one that reads several costs a single roles query.
+
     Usage in templates:
         {% if is_teacher %}
             <a href="{% url 'grade_students' %}">Grade Students</a>
         {% endif %}
-        
+
         {% if active_role %}
             Current role: {{ active_role.name }}
         {% endif %}
-        
+
         {% for role in user_roles %}
             <span>{{ role.name }}</span>
         {% endfor %}
-    
+
     Configuration:
         Add to settings.py:
         TEMPLATES = [{
@@ -31,62 +83,13 @@ def user_roles(request):
             },
         }]
     """
-    if not request.user.is_authenticated:
-        return {
-            'active_role': None,
-            'user_roles': [],
-            'is_student': False,
-            'is_teacher': False,
-            'is_admin': False,
-            'is_administrator': False,
-            'is_manager': False,
-            'is_employee': False,
-            'is_director': False,
-            'is_owner': False,
-            'is_parent': False,
-        }
-
-    user = request.user
-    active_role = None
-    
-    # Check session for ephemeral active role
-    role_id = request.session.get('active_role_id')
-    if role_id:
-        active_role = user.roles.filter(pk=role_id).first()
-        # Clean up if role was removed
-        if not active_role:
-            request.session.pop('active_role_id', None)
-    
-    # Fall back to database active role
-    if not active_role:
-        active_role = getattr(user, 'active_role', None)
-    
-    # Get role name for comparison
-    role_name = active_role.name if active_role else None
-    role_slug = active_role.slug if active_role else None
-    
-    return {
-        'active_role': active_role,
-        'user_roles': user.roles.all(),
-        
-        # Common role flags (case-insensitive)
-        'is_student': _role_matches(role_name, role_slug, 'student'),
-        'is_teacher': _role_matches(role_name, role_slug, 'teacher'),
-        'is_admin': _role_matches(role_name, role_slug, 'admin'),
-        'is_administrator': _role_matches(role_name, role_slug, 'administrator'),
-        'is_manager': _role_matches(role_name, role_slug, 'manager'),
-        'is_employee': _role_matches(role_name, role_slug, 'employee'),
-        'is_director': _role_matches(role_name, role_slug, 'director'),
-        'is_owner': _role_matches(role_name, role_slug, 'owner'),
-        'is_parent': _role_matches(role_name, role_slug, 'parent'),
+    flags = RoleFlags(request)
+    context = {
+        'active_role': SimpleLazyObject(partial(get_active_role, request)),
+        'user_roles': SimpleLazyObject(partial(get_user_roles, request)),
+        'role_flags': flags,
     }
-
-
-def _role_matches(role_name, role_slug, target):
-    """Helper to check if role matches target (case-insensitive)."""
-    if not role_name:
-        return False
-    return (
-        role_name.lower() == target.lower() or 
-        (role_slug and role_slug.lower() == target.lower())
-    )
+    # Templates look the flags up by name, so each one is a lazy proxy
+    # into the mapping rather than a precomputed bool.
+    context.update((name, SimpleLazyObject(partial(flags.__getitem__, name))) for name in flags)
+    return context
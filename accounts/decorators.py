@@ -1,6 +1,8 @@
 from django.contrib.auth.decorators import user_passes_test
 from functools import wraps
 
+from .roles import get_active_role, role_matches
+
 
 def has_roles(*roles):
     """
@@ -27,7 +29,7 @@ def has_roles(*roles):
             return False
         if user.is_superuser:
             return True
-        return any(user.has_role(r) for r in roles)
+        return user.has_any_role(*roles)
     
     return user_passes_test(tester)
 
@@ -72,23 +74,8 @@ def require_active_role(*roles):
             if user.is_superuser:
                 return view_func(request, *args, **kwargs)
             
-            # Check session active role first
-            active_role = None
-            role_id = request.session.get('active_role_id')
-            if role_id:
-                from .models import Role
-                active_role = user.roles.filter(pk=role_id).first()
-            
-            # Fall back to database active role
-            if not active_role:
-                active_role = getattr(user, 'active_role', None)
-            
-            # Check if active role matches
-            if active_role and any(
-                active_role.slug.lower() == r.lower() or 
-                active_role.name.lower() == r.lower() 
-                for r in roles
-            ):
+            # Active role, resolved once per request
+            if role_matches(get_active_role(request), *roles):
                 return view_func(request, *args, **kwargs)
             
             # Access denied
@@ -0,0 +1,143 @@
+"""
+Background processing of profile images.
+
+Saving a ``UserProfile`` only enqueues its user id (after the transaction
+commits); a small thread pool does the rest off the request path. The
+worker hashes the uploaded file and stops if that content was already
+processed for the profile. Otherwise it renders every size in
+``PROFILE_IMAGE_SIZES`` as WebP and JPEG under a content-addressed name
+(``profile_img/derived/<sha256>/<size>.<ext>``, sharded by the hash's first
+two characters), so identical uploads from
+any number of users share one set of files and are only rendered once.
+The original upload is left untouched.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_IMAGE_SIZES = (64, 150, 300)
+# (extension, PIL format, save options)
+PROFILE_IMAGE_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+DERIVED_DIR = 'profile_img/derived'
+PROFILE_IMAGE_WORKERS = 2
+HASH_CHUNK_SIZE = 64 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=PROFILE_IMAGE_WORKERS, thread_name_prefix='profile-images')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def content_hash(file):
+    """SHA-256 hex digest of an open binary file, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derived_name(digest, size, extension):
+    return f'{DERIVED_DIR}/{digest[:2]}/{digest}/{size}.{extension}'
+
+
+def variant_names(digest):
+    """``{size: {extension: name}}`` for the renditions of the content ``digest``."""
+    return {
+        str(size): {extension: derived_name(digest, size, extension) for extension, _, _ in PROFILE_IMAGE_FORMATS}
+        for size in PROFILE_IMAGE_SIZES
+    }
+
+
+def render_variants(digest, data):
+    """
+    Write the renditions of the image bytes ``data`` that do not exist yet.
+
+    Returns ``variant_names(digest)``. Content seen before (by any profile)
+    costs only the existence checks.
+    """
+    variants = variant_names(digest)
+    missing = [
+        (int(size), extension, name)
+        for size, names in variants.items()
+        for extension, name in names.items()
+        if not default_storage.exists(name)
+    ]
+    if not missing:
+        return variants
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    options = {extension: (fmt, save_options) for extension, fmt, save_options in PROFILE_IMAGE_FORMATS}
+    for size, extension, name in missing:
+        rendition = image.copy()
+        rendition.thumbnail((size, size))
+        fmt, save_options = options[extension]
+        if fmt == 'JPEG' and rendition.mode not in ('RGB', 'L'):
+            rendition = rendition.convert('RGB')
+        buffer = io.BytesIO()
+        rendition.save(buffer, fmt, **save_options)
+        # A concurrent worker may have written it meanwhile; the content is identical.
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def process_profile_image(user_id):
+    """Render the profile image of ``user_id`` unless that content is already processed."""
+    from .models import UserProfile
+
+    profile = UserProfile.objects.filter(pk=user_id).only('image', 'image_hash', 'image_variants').first()
+    if profile is None or not profile.image:
+        return
+    name = profile.image.name
+    try:
+        with profile.image.open('rb') as file:
+            digest = content_hash(file)
+            if digest == profile.image_hash and profile.image_variants:
+                return
+            file.seek(0)
+            data = file.read()
+    except FileNotFoundError:
+        logger.warning('Profile image %s of user %s is missing', name, user_id)
+        return
+    variants = render_variants(digest, data)
+    # Leave the row alone if a newer upload replaced the image meanwhile.
+    UserProfile.objects.filter(pk=user_id, image=name).update(image_hash=digest, image_variants=variants)
+
+
+def _run(user_id):
+    with _pending_lock:
+        _pending.discard(user_id)
+    try:
+        process_profile_image(user_id)
+    except Exception:
+        logger.exception('Processing the profile image of user %s failed', user_id)
+    finally:
+        close_old_connections()
+
+
+def _submit(user_id):
+    with _pending_lock:
+        if user_id in _pending:
+            # Already queued; that run will read the latest image.
+            return
+        _pending.add(user_id)
+    _executor.submit(_run, user_id)
+
+
+def enqueue_profile_image(user_id):
+    """Process ``user_id``'s profile image in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _submit(user_id))
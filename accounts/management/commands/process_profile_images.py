@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.images import process_profile_image
+from accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Render the sized WebP/JPEG versions of profile images now (skips images already processed).'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = list(UserProfile.objects.exclude(image='').exclude(image=None).values_list('pk', flat=True))
+        for user_id in user_ids:
+            process_profile_image(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(user_ids)} profile images in {time.perf_counter() - started:.1f}s'
+        ))
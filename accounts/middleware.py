@@ -0,0 +1,36 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import bind_active_role, get_active_role
+
+
+class ActiveRoleMiddleware:
+    """
+    Attach a lazy ``request.active_role`` to every request, and bind it to
+    ``request.user`` and ``request.auser()`` so permission checks use the
+    same role.
+    
+    Nothing is queried until the role is first read, and then only once
+    for the whole request (see ``accounts.roles``).
+    
+    Configuration:
+        Add to settings.py after AuthenticationMiddleware:
+        MIDDLEWARE = [
+            ...
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+            'accounts.middleware.ActiveRoleMiddleware',
+        ]
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        user = request.user
+        request.user = SimpleLazyObject(lambda: bind_active_role(request, user))
+        auser = getattr(request, 'auser', None)
+        if auser is not None:
+            async def bound_auser():
+                return bind_active_role(request, await auser())
+            request.auser = bound_auser
+        request.active_role = SimpleLazyObject(lambda: get_active_role(request))
+        return self.get_response(request)
@@ -1,6 +1,8 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
 
+from .roles import get_active_role, role_matches
+
 
 class RoleRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     """
@@ -40,29 +42,11 @@ class RoleRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
             return self._check_active_role(user)
         
         # Check any assigned role
-        return any(user.has_role(r) for r in self.allowed_roles)
+        return user.has_any_role(*self.allowed_roles)
     
     def _check_active_role(self, user):
         """Check if user's active role matches allowed roles."""
-        # Check session first
-        active_role = None
-        role_id = self.request.session.get('active_role_id')
-        if role_id:
-            active_role = user.roles.filter(pk=role_id).first()
-        
-        # Fall back to database
-        if not active_role:
-            active_role = getattr(user, 'active_role', None)
-        
-        if not active_role:
-            return False
-        
-        # Check if active role matches
-        return any(
-            active_role.slug.lower() == r.lower() or 
-            active_role.name.lower() == r.lower() 
-            for r in self.allowed_roles
-        )
+        return role_matches(get_active_role(self.request), *self.allowed_roles)
     
     def handle_no_permission(self):
         """
@@ -110,16 +94,8 @@ class MultiRoleViewMixin:
         if not user.is_authenticated:
             return [self.default_template] if self.default_template else super().get_template_names()
         
-        # Get active role
-        active_role = None
-        role_id = self.request.session.get('active_role_id')
-        if role_id:
-            active_role = user.roles.filter(pk=role_id).first()
-        
-        if not active_role:
-            active_role = getattr(user, 'active_role', None)
-        
         # Get template for role
+        active_role = get_active_role(self.request)
         if active_role:
             role_key = active_role.slug.lower()
             if role_key in self.role_templates:
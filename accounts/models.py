@@ -8,7 +8,7 @@ from django.db import models
 from django.utils import timezone
 from django.utils.text import slugify
 from django.conf import settings
-from PIL import Image
+from django.core.files.storage import default_storage
 
 
 class Role(models.Model):
@@ -88,10 +88,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     def has_role(self, role_identifier):
         """Check if user has a specific role by slug or name."""
-        return self.roles.filter(
-            models.Q(slug__iexact=role_identifier) | 
-            models.Q(name__iexact=role_identifier)
-        ).exists()
+        return self.has_any_role(role_identifier)
+    
+    def has_any_role(self, *role_identifiers):
+        """Check if user has any of the roles, by slug or name (cached, see accounts.roles)."""
+        from .roles import get_role_names
+        names = get_role_names(self)
+        return any(identifier.lower() in names for identifier in role_identifiers)
     
     def set_active_role(self, role=None, *, persist=True):
         """
@@ -141,18 +144,45 @@ class UserProfile(models.Model):
         blank=True,
         null=True,
     )
+    # Filled in by the background pipeline (see accounts.images)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         if self.user.name:
             return f"{self.user.name}'s profile"
         return f"{self.user.email}'s profile"
 
-    def save(self, *args, **kwargs):
-        super().save()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image = instance.__dict__.get("image")
+        return instance
 
-        img = Image.open(self.image.path)
+    def image_changed(self):
+        """Whether the image differs from the stored one (a new upload or another file)."""
+        if self._state.adding or not self.image:
+            return bool(self.image)
+        if not getattr(self.image, "_committed", True):
+            return True
+        return self.image.name != getattr(self, "_stored_image", None)
 
-        if img.height > 300 or img.width > 300:
-            output_size = (300, 300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+    def save(self, *args, **kwargs):
+        changed = self.image_changed()
+        super().save(*args, **kwargs)
+        self._stored_image = self.image.name if self.image else None
+
+        # Resizing happens off the request path, and only for new images
+        if changed:
+            from .images import enqueue_profile_image
+            enqueue_profile_image(self.pk)
+
+    def get_image_url(self, size=150, extension="webp"):
+        """URL of the processed image closest above ``size``, or of the upload until it is processed."""
+        from .images import PROFILE_IMAGE_SIZES
+        variants = self.image_variants or {}
+        fitting = [s for s in PROFILE_IMAGE_SIZES if s >= size] or [PROFILE_IMAGE_SIZES[-1]]
+        name = variants.get(str(fitting[0]), {}).get(extension)
+        if name:
+            return default_storage.url(name)
+        return self.image.url if self.image else ""
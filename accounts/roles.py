@@ -0,0 +1,158 @@
+"""
+Request-scoped active role resolution shared by every RBAC entry point.
+
+The active role is the session's ``active_role_id`` (an ephemeral switch)
+when it names one of the user's roles, else the user's stored
+``active_role``. ``get_active_role`` resolves it at most once per request,
+reading the user's roles in a single query, and the middleware, context
+processor, decorators and mixins all go through it.
+
+Membership checks (``User.has_role``) use ``get_role_names``: the user's
+role slugs and names, lowercased, as a frozenset cached per user and role
+version. ``RoleBackend`` applies the same active role rule to the role ids
+cached the same way (``get_active_role_id``), so permission checks need no
+query after warm-up. Changes to a user's roles drop that user's entries;
+saving or deleting a Role bumps the version, since a rename affects every
+holder.
+"""
+from django.core.cache import cache
+
+
+ROLE_NAMES_CACHE_KEY = 'accounts:roles:{user_id}:v{version}'
+ROLE_IDS_CACHE_KEY = 'accounts:roles:ids:{user_id}:v{version}'
+ROLE_VERSION_CACHE_KEY = 'accounts:roles:version'
+ROLE_NAMES_TIMEOUT = 60 * 60
+
+
+def get_role_version():
+    return cache.get(ROLE_VERSION_CACHE_KEY, 0)
+
+
+def bump_role_version():
+    """Invalidate every cached role set after a Role changes."""
+    cache.add(ROLE_VERSION_CACHE_KEY, 0, None)
+    try:
+        cache.incr(ROLE_VERSION_CACHE_KEY)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(ROLE_VERSION_CACHE_KEY, 1, None)
+
+
+def get_role_names(user):
+    """The lowercased slugs and names of ``user``'s roles, through the cache."""
+    key = ROLE_NAMES_CACHE_KEY.format(user_id=user.pk, version=get_role_version())
+    names = cache.get(key)
+    if names is None:
+        names = frozenset(
+            value.lower()
+            for pair in user.roles.values_list('slug', 'name')
+            for value in pair if value
+        )
+        cache.set(key, names, ROLE_NAMES_TIMEOUT)
+    return names
+
+
+def get_role_ids(user):
+    """The ids of ``user``'s roles, through the cache like ``get_role_names``."""
+    key = ROLE_IDS_CACHE_KEY.format(user_id=user.pk, version=get_role_version())
+    role_ids = cache.get(key)
+    if role_ids is None:
+        role_ids = frozenset(user.roles.values_list('pk', flat=True))
+        cache.set(key, role_ids, ROLE_NAMES_TIMEOUT)
+    return role_ids
+
+
+def forget_role_names(user_ids):
+    """Drop the cached role sets of ``user_ids`` after their roles changed."""
+    version = get_role_version()
+    cache.delete_many([
+        key.format(user_id=user_id, version=version)
+        for user_id in user_ids
+        for key in (ROLE_NAMES_CACHE_KEY, ROLE_IDS_CACHE_KEY)
+    ])
+
+
+def _role_state(request):
+    """Return ``(roles, active_role)`` for the request, resolving them on first use."""
+    state = getattr(request, '_role_state', None)
+    if state is not None:
+        return state
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        state = ([], None)
+    else:
+        roles = list(user.roles.all())
+        by_id = {role.pk: role for role in roles}
+        active_role = None
+        session = getattr(request, 'session', None)
+        role_id = session.get('active_role_id') if session is not None else None
+        if role_id:
+            active_role = by_id.get(role_id)
+            # Clean up if role was removed
+            if active_role is None:
+                session.pop('active_role_id', None)
+        if active_role is None:
+            active_role = by_id.get(user.active_role_id)
+        state = (roles, active_role)
+    request._role_state = state
+    return state
+
+
+def get_active_role(request):
+    """The request user's active Role, or ``None``."""
+    return _role_state(request)[1]
+
+
+def get_user_roles(request):
+    """All roles assigned to the request user, as a list."""
+    return _role_state(request)[0]
+
+
+def forget_active_role(request):
+    """Drop the resolved role so the next lookup sees a role switch made during the request."""
+    request.__dict__.pop('_role_state', None)
+    user = getattr(request, 'user', None)
+    if user is not None and hasattr(user, '_perm_cache'):
+        # Compiled for the previous role (see ``accounts.backends``).
+        del user._perm_cache
+
+
+def bind_active_role(request, user):
+    """
+    Let permission checks on ``user`` see the request's active role.
+
+    ``RoleBackend`` then resolves the role from the request's session, like
+    ``get_active_role``, instead of the stored ``active_role``, so a session
+    switch applies to ``has_perm`` too.
+    """
+    if user.is_authenticated:
+        user._active_role_session = getattr(request, 'session', None)
+    return user
+
+
+def get_active_role_id(user):
+    """
+    The id of ``user``'s active role.
+
+    For a user bound to a request this is the session's role, else the
+    stored one, each only if the user still holds it; the check reads the
+    cached ``get_role_ids``, so it costs no query after warm-up. Unbound
+    users get their stored ``active_role_id``.
+    """
+    if not hasattr(user, '_active_role_session'):
+        return user.active_role_id
+    session = user._active_role_session
+    role_ids = get_role_ids(user)
+    for role_id in (session.get('active_role_id') if session is not None else None, user.active_role_id):
+        if role_id in role_ids:
+            return role_id
+    return None
+
+
+def role_matches(role, *targets):
+    """Whether ``role`` has one of ``targets`` as its slug or name (case-insensitive)."""
+    if role is None:
+        return False
+    names = {role.name.lower(), (role.slug or '').lower()}
+    return any(target.lower() in names for target in targets)
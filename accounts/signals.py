@@ -1,6 +1,12 @@
 from django.dispatch import receiver
+from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.signals import user_logged_in
 from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .backends import bump_permission_version
+from .models import Role, User
+from .roles import bump_role_version, forget_role_names
 
 
 @receiver(user_logged_in)
@@ -50,3 +56,37 @@ def ensure_active_role_on_login(sender, user, request, **kwargs):
         if role_id and not user.roles.filter(pk=role_id).exists():
             # Session role was removed - clear it
             request.session.pop('active_role_id', None)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def user_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the cached role sets of the users whose roles changed."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        forget_role_names([instance.pk])
+    elif action == 'post_clear':
+        # The role's former holders are no longer known.
+        bump_role_version()
+    else:
+        forget_role_names(pk_set or ())
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def role_changed(sender, **kwargs):
+    """A renamed or deleted role changes the role sets of all its holders."""
+    bump_role_version()
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permissions_changed(sender, action=None, **kwargs):
+    """Recompile permission sets (see ``accounts.backends``) after any grant changes."""
+    if action is None or action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permission_version()
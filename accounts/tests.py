@@ -1,3 +1,247 @@
-from django.test import TestCase
+import io
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.views.generic import TemplateView
+from PIL import Image
+
+from .context_processors import user_roles
+from .decorators import require_active_role
+from .images import process_profile_image
+from .middleware import ActiveRoleMiddleware
+from .mixins import ActiveRoleRequiredMixin, MultiRoleViewMixin
+from .models import Role, User, UserProfile
+from .roles import forget_active_role, get_active_role
+
+
+class TeacherView(ActiveRoleRequiredMixin, MultiRoleViewMixin, TemplateView):
+    allowed_roles = ['teacher']
+    role_templates = {'teacher': 'teacher.html'}
+    default_template = 'generic.html'
+
+
+class ActiveRoleTest(TestCase):
+    def setUp(self):
+        self.teacher = Role.objects.create(name='Teacher')
+        self.parent = Role.objects.create(name='Parent')
+        self.user = User.objects.create_user('t@example.com', 'pw')
+        self.user.roles.add(self.teacher, self.parent)
+        self.user.set_active_role(self.parent)
+
+    def make_request(self, role_id=None):
+        request = RequestFactory().get('/')
+        SessionMiddleware(lambda request: None).process_request(request)
+        if role_id is not None:
+            request.session['active_role_id'] = role_id
+        request.user = User.objects.get(pk=self.user.pk)
+        return ActiveRoleMiddleware(lambda request: request)(request)
+
+    def test_resolved_once_per_request(self):
+        request = self.make_request(role_id=self.teacher.pk)
+        view = require_active_role('teacher')(lambda request: HttpResponse('ok'))
+        with self.assertNumQueries(1):
+            self.assertEqual(request.active_role, self.teacher)
+            self.assertEqual(view(request).status_code, 200)
+            self.assertEqual(TeacherView.as_view()(request).template_name, ['teacher.html'])
+            context = user_roles(request)
+            self.assertTrue(context['is_teacher'])
+            self.assertEqual(len(context['user_roles']), 2)
+
+    def test_falls_back_to_stored_role(self):
+        request = self.make_request(role_id=999)
+        self.assertEqual(get_active_role(request), self.parent)
+        self.assertNotIn('active_role_id', request.session)
+        with self.assertRaises(PermissionDenied):
+            require_active_role('teacher')(lambda request: HttpResponse('ok'))(request)
+        with self.assertRaises(PermissionDenied):
+            TeacherView.as_view()(request)
+
+    def test_flags_are_lazy(self):
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            context = user_roles(request)
+            self.assertEqual(set(context['role_flags']), {name for name in context if name.startswith('is_')})
+        with self.assertNumQueries(1):
+            rendered = Template(
+                '{% if is_parent %}parent{% endif %}{% if is_teacher %}teacher{% endif %} {{ active_role.name }}'
+            ).render(Context(context))
+        self.assertEqual(rendered, 'parent Parent')
+
+        anonymous = RequestFactory().get('/')
+        anonymous.user = AnonymousUser()
+        with self.assertNumQueries(0):
+            self.assertFalse(user_roles(anonymous)['role_flags']['is_admin'])
+
+
+class RoleMembershipCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('m@example.com', 'pw')
+        self.teacher = Role.objects.create(name='Teacher')
+        self.user.roles.add(self.teacher)
+
+    def test_role_checks_are_cached(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.user.has_any_role('admin', 'manager', 'TEACHER'))
+            self.assertFalse(self.user.has_role('admin'))
+            self.assertTrue(self.user.has_role('teacher'))
+
+    def test_invalidation(self):
+        self.assertFalse(self.user.has_role('admin'))
+        admin = Role.objects.create(name='Admin')
+        self.user.roles.add(admin)
+        self.assertTrue(self.user.has_role('admin'))
+        admin.users.remove(self.user)
+        self.assertFalse(self.user.has_role('admin'))
+
+        self.teacher.name = 'Lecturer'
+        self.teacher.save()
+        self.assertTrue(self.user.has_role('lecturer'))
+        self.assertTrue(self.user.has_role('teacher'))  # The slug is unchanged.
+        self.teacher.users.clear()
+        self.assertFalse(self.user.has_role('teacher'))
+        self.user.roles.add(self.teacher)
+        self.teacher.delete()
+        self.assertFalse(self.user.has_role('teacher'))
+
+
+class RoleBackendTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.editor = Role.objects.create(name='Editor')
+        self.editor.permissions.add(
+            Permission.objects.get(codename='change_article'),
+            Permission.objects.get(codename='view_device'),
+        )
+        self.viewer = Role.objects.create(name='Viewer')
+        self.user = User.objects.create_user('e@example.com', 'pw')
+        self.user.roles.add(self.editor, self.viewer)
+        self.user.set_active_role(self.editor)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_active_role_permissions_from_cache(self):
+        self.assertTrue(self.fresh_user().has_perm('blog.change_article'))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perms(['blog.change_article', 'inventory.view_device']))
+            self.assertFalse(user.has_perm('blog.delete_article'))
+            self.assertTrue(user.has_module_perms('inventory'))
+            self.assertFalse(user.has_module_perms('accounts'))
+
+        self.user.set_active_role(self.viewer)
+        self.assertFalse(self.fresh_user().has_perm('blog.change_article'))
+
+    def bound_request(self, role_id):
+        request = RequestFactory().get('/')
+        SessionMiddleware(lambda request: None).process_request(request)
+        request.session['active_role_id'] = role_id
+        user = self.fresh_user()
+        request.user = user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return ActiveRoleMiddleware(lambda request: request)(request)
+
+    def test_session_role_switch(self):
+        request = self.bound_request(self.viewer.pk)
+        self.assertFalse(request.user.has_perm('blog.change_article'))
+        # The stored role still applies outside the request.
+        self.assertTrue(self.fresh_user().has_perm('blog.change_article'))
+        # Later requests resolve the role and permissions from the cache.
+        request = self.bound_request(self.viewer.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(request.user.has_perm('blog.change_article'))
+
+        # As select_role does for a switch made during the request.
+        request.session['active_role_id'] = self.editor.pk
+        forget_active_role(request)
+        self.assertTrue(request.user.has_perm('blog.change_article'))
+
+        # A session role the user no longer holds falls back to the stored one.
+        self.user.roles.remove(self.viewer)
+        self.assertTrue(self.bound_request(self.viewer.pk).user.has_perm('blog.change_article'))
+
+    async def test_session_role_applies_to_auser(self):
+        request = await sync_to_async(self.bound_request)(self.viewer.pk)
+        user = await request.auser()
+        self.assertFalse(await user.ahas_perm('blog.change_article'))
+        request = await sync_to_async(self.bound_request)(self.editor.pk)
+        user = await request.auser()
+        self.assertTrue(await user.ahas_perm('blog.change_article'))
+
+    def test_invalidation(self):
+        self.assertFalse(self.fresh_user().has_perm('blog.delete_article'))
+        self.editor.permissions.add(Permission.objects.get(codename='delete_article'))
+        self.assertTrue(self.fresh_user().has_perm('blog.delete_article'))
+        self.user.user_permissions.add(Permission.objects.get(codename='add_device'))
+        self.assertTrue(self.fresh_user().has_perm('inventory.add_device'))
+        self.editor.permissions.clear()
+        self.assertEqual(self.fresh_user().get_all_permissions(), {'inventory.add_device'})
+
+
+class ProfileImagePipelineTest(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user('p@example.com', 'pw')
+
+    def upload(self, color='red'):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (640, 480), color).save(buffer, 'PNG')
+        return SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+
+    def test_saves_only_enqueue_new_images(self):
+        with mock.patch('accounts.images._submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                profile = UserProfile.objects.create(user=self.user, image=self.upload())
+            submit.assert_called_once_with(self.user.pk)
+
+            profile = UserProfile.objects.get(pk=self.user.pk)
+            profile.bio = 'Network engineer'
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.save()
+            submit.assert_called_once()
+
+            profile.image = self.upload('blue')
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.save()
+            self.assertEqual(submit.call_count, 2)
+
+    def test_variants_are_content_addressed(self):
+        with mock.patch('accounts.images._submit'):
+            profile = UserProfile.objects.create(user=self.user, image=self.upload())
+            other = UserProfile.objects.create(
+                user=User.objects.create_user('q@example.com', 'pw'), image=self.upload(),
+            )
+        process_profile_image(profile.pk)
+        profile.refresh_from_db()
+        self.assertEqual(set(profile.image_variants), {'64', '150', '300'})
+        with default_storage.open(profile.image_variants['150']['webp']) as file:
+            self.assertEqual(Image.open(file).size, (150, 113))
+        self.assertTrue(profile.get_image_url(100).endswith('/150.webp'))
+
+        # Identical content is not rendered again, and processed content is skipped.
+        with mock.patch('accounts.images.Image.open', side_effect=AssertionError):
+            process_profile_image(other.pk)
+            with self.assertNumQueries(1):
+                process_profile_image(profile.pk)
+        other.refresh_from_db()
+        self.assertEqual(other.image_variants, profile.image_variants)
+        self.assertEqual(other.image_hash, profile.image_hash)
@@ -6,6 +6,7 @@ from django.db import transaction
 from django.urls import reverse
 
 from ..models import Role
+from ..roles import forget_active_role
 
 
 # Define role-specific redirect targets
@@ -57,6 +58,9 @@ def select_role(request, role_slug):
         request.session["active_role_id"] = role.pk
         messages.success(request, f"Active role set to {role.name} for this session")
     
+    # Anything resolved earlier in this request saw the previous role
+    forget_active_role(request)
+    
     # Redirect to role-specific page
     key = role.slug.lower()
     redirect_url = REDIRECT_MAP.get(key, "home")
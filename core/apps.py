@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Core & Navigation'
+    
+    def ready(self):
+        """Import signal handlers when app is ready."""
+        import core.signals
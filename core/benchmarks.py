@@ -0,0 +1,121 @@
+"""
+Latency and query-count benchmarks for the main views.
+
+``run_benchmarks`` grows a synthetic inventory through a series of scales
+and measures each view at every scale: one cold request (cache cleared)
+for the query count and latency, then warm repeats for latency. A view's
+cold query count must not grow with the amount of data;
+``query_growth`` reports the views where it does.
+"""
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Article
+from inventory.models import Device
+
+from .synthetic import MIN_SITE_SIZE, generate_inventory
+
+
+BENCHMARK_SCALES = (1000, 10000, 100000)
+BENCHMARK_REPEAT = 5
+
+
+def benchmark_targets():
+    """Return ``[(label, url), ...]`` for the views under test, using generated rows."""
+    core = Device.objects.filter(name__endswith='-core-0001').order_by('id').first()
+    article = Article.objects.filter(is_published=True).order_by('id').first()
+    return [
+        ('DeviceListView', reverse('inventory:device-list')),
+        ('DeviceDetailView', core.get_absolute_url()),
+        ('network_topology_json', reverse('inventory:network-topology-json')),
+        ('device_topology_json', reverse('inventory:device-topology-json', kwargs={'slug': core.slug})),
+        ('HomeView', reverse('core:home')),
+        ('ArticleDetailView', article.get_absolute_url()),
+        ('DiagramListView', reverse('visualization:diagram-list')),
+    ]
+
+
+def measure(client, url, repeat=BENCHMARK_REPEAT):
+    """Return cold/warm timings (ms) and query counts for ``url``."""
+    cache.clear()
+    # CaptureQueriesContext counts by position in a bounded log; start empty
+    # so earlier bulk work cannot push it past its limit.
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as cold_queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        cold = (time.perf_counter() - started) * 1000
+
+    warm = []
+    with CaptureQueriesContext(connection) as warm_queries:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(url)
+            warm.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'status': response.status_code,
+        'cold_ms': round(cold, 1),
+        'warm_ms': round(statistics.median(warm), 1) if warm else None,
+        'cold_queries': len(cold_queries),
+        'warm_queries': len(warm_queries) // repeat if repeat else None,
+    }
+
+
+def check_scales(scales, current=0):
+    """
+    Raise ``ValueError`` unless every step up from ``current`` devices
+    generates at least ``MIN_SITE_SIZE`` of them.
+    """
+    for scale in sorted(scales):
+        if current < scale < current + MIN_SITE_SIZE:
+            raise ValueError(
+                f'scale {scale} is {scale - current} devices above the previous one; '
+                f'each step must add at least {MIN_SITE_SIZE}'
+            )
+        current = max(current, scale)
+
+
+def run_benchmarks(scales=BENCHMARK_SCALES, repeat=BENCHMARK_REPEAT, seed=0, on_scale=None):
+    """
+    Return ``{scale: {label: metrics}}``, generating data up to each scale in turn.
+
+    Data is only ever added, so the scales must be increasing; each step
+    generates the difference from the previous one (see ``check_scales``,
+    which runs before anything is generated). ``on_scale`` is called with
+    ``(scale, results)`` after each scale is measured.
+    """
+    client = Client()
+    results = {}
+    current = Device.objects.count()
+    check_scales(scales, current)
+    for scale in sorted(scales):
+        if scale > current:
+            generate_inventory(scale - current, seed=seed)
+            current = Device.objects.count()
+        results[scale] = {label: measure(client, url, repeat) for label, url in benchmark_targets()}
+        if on_scale:
+            on_scale(scale, results[scale])
+    return results
+
+
+def query_growth(results):
+    """Return ``[(label, smallest_scale_queries, scale, queries), ...]`` where cold query counts grew."""
+    scales = sorted(results)
+    if len(scales) < 2:
+        return []
+    baseline = results[scales[0]]
+    growth = []
+    for scale in scales[1:]:
+        for label, metrics in results[scale].items():
+            if metrics['cold_queries'] > baseline[label]['cold_queries']:
+                growth.append((label, baseline[label]['cold_queries'], scale, metrics['cold_queries']))
+    return growth
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmarks import BENCHMARK_REPEAT, BENCHMARK_SCALES, check_scales, query_growth, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the main views against synthetic inventories of increasing size, in a '
+        'throwaway test database. Fails if any view issues more queries as the data grows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default=','.join(str(scale) for scale in BENCHMARK_SCALES),
+            help='Comma-separated device counts (default: %(default)s)',
+        )
+        parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT, help='Warm requests per view')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted(int(scale) for scale in options['scales'].split(','))
+        except ValueError:
+            raise CommandError('--scales must be comma-separated integers')
+        try:
+            # The throwaway database starts empty.
+            check_scales(scales)
+        except ValueError as exc:
+            raise CommandError(f'--scales: {exc}')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(scales, options['repeat'], options['seed'], on_scale=self.report)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        growth = query_growth(results)
+        if growth:
+            for label, before, scale, after in growth:
+                self.stderr.write(f'{label}: {before} queries at {scales[0]} devices, {after} at {scale}')
+            raise CommandError('Query counts grow with data size.')
+        self.stdout.write(self.style.SUCCESS('Query counts are independent of data size.'))
+
+    def report(self, scale, results):
+        self.stdout.write(f'\n{scale} devices')
+        self.stdout.write(f"  {'view':<24}{'status':>7}{'queries':>9}{'cold ms':>10}{'warm ms':>10}")
+        for label, metrics in results.items():
+            self.stdout.write(
+                f"  {label:<24}{metrics['status']:>7}{metrics['cold_queries']:>9}"
+                f"{metrics['cold_ms']:>10}{metrics['warm_ms']:>10}"
+            )
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.stats import recompute_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard counters from scratch (needed after QuerySet.update or raw SQL writes).'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = recompute_counters()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {written} counters in {time.perf_counter() - started:.1f}s'))
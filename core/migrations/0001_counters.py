@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:03
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def initial_counters(apps, schema_editor):
+    """Count the existing inventory once; signals keep it up to date from here."""
+    Device = apps.get_model('inventory', 'Device')
+    Diagram = apps.get_model('visualization', 'Diagram')
+    Article = apps.get_model('blog', 'Article')
+    Counter = apps.get_model('core', 'Counter')
+    counters = [
+        Counter(name='devices.active', value=Device.objects.filter(is_active=True).count()),
+        Counter(name='interfaces', value=apps.get_model('inventory', 'Interface').objects.count()),
+        Counter(name='diagrams.published', value=Diagram.objects.filter(is_published=True).count()),
+        Counter(name='articles.published', value=Article.objects.filter(is_published=True).count()),
+    ]
+    counters += [
+        Counter(name=f'devices.type.{device_type}', value=count)
+        for device_type, count in Device.objects.values_list('device_type').annotate(count=Count('id')).order_by()
+    ]
+    counters += [
+        Counter(name='diagram.devices', object_id=diagram_id, value=count)
+        for diagram_id, count in Diagram.objects.values_list('id').annotate(count=Count('devices')).order_by()
+    ]
+    Counter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('blog', '0002_initial'),
+        ('inventory', '0009_journal_previous'),
+        ('visualization', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('object_id', models.PositiveBigIntegerField(default=0)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name', 'object_id'],
+                'constraints': [models.UniqueConstraint(fields=('name', 'object_id'), name='core_counter_unique')],
+            },
+        ),
+        migrations.RunPython(initial_counters, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,25 @@
 from django.db import models
 
-# Create your models here.
+
+class Counter(models.Model):
+    """
+    A maintained total for the dashboard (see ``core.stats``).
+
+    Site-wide counters use ``object_id`` 0; per-object counters (devices per
+    diagram) store the object's primary key.
+    """
+
+    name = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name', 'object_id']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'object_id'], name='core_counter_unique'),
+        ]
+
+    def __str__(self):
+        if self.object_id:
+            return f"{self.name}[{self.object_id}] = {self.value}"
+        return f"{self.name} = {self.value}"
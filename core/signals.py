@@ -0,0 +1,82 @@
+from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from blog.models import Article
+from inventory.models import Device, Interface
+from visualization.models import Diagram
+
+from .models import Counter
+from .stats import COUNTED_FIELDS, DIAGRAM_DEVICES, INTERFACES, adjust, counted_names, recount_diagrams
+
+
+@receiver(pre_save, sender=Device)
+@receiver(pre_save, sender=Diagram)
+@receiver(pre_save, sender=Article)
+def counters_before_save(sender, instance, **kwargs):
+    """Note which counters the stored row counts towards, so a save can move it."""
+    stored = None
+    if instance.pk is not None:
+        stored = sender.objects.only(*COUNTED_FIELDS[sender]).filter(pk=instance.pk).first()
+    instance._counted_before = counted_names(stored) if stored is not None else []
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=Diagram)
+@receiver(post_save, sender=Article)
+def counters_saved(sender, instance, **kwargs):
+    deltas = {}
+    for name in getattr(instance, '_counted_before', []):
+        deltas[name] = deltas.get(name, 0) - 1
+    for name in counted_names(instance):
+        deltas[name] = deltas.get(name, 0) + 1
+    adjust(deltas)
+
+
+@receiver(post_delete, sender=Device)
+@receiver(post_delete, sender=Diagram)
+@receiver(post_delete, sender=Article)
+def counters_deleted(sender, instance, **kwargs):
+    adjust({name: -1 for name in counted_names(instance)})
+
+
+@receiver(post_save, sender=Interface)
+def interface_counted(sender, instance, created, **kwargs):
+    if created:
+        adjust({INTERFACES: 1})
+
+
+@receiver(post_delete, sender=Interface)
+def interface_uncounted(sender, instance, **kwargs):
+    adjust({INTERFACES: -1})
+
+
+@receiver(pre_delete, sender=Device)
+def device_diagrams_before_delete(sender, instance, **kwargs):
+    """Deleting a device drops its diagram memberships without an m2m_changed signal."""
+    instance._counted_diagrams = list(
+        Diagram.devices.through.objects.filter(device_id=instance.pk).values_list('diagram_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Device)
+def device_diagrams_deleted(sender, instance, **kwargs):
+    recount_diagrams(getattr(instance, '_counted_diagrams', ()))
+
+
+@receiver(post_delete, sender=Diagram)
+def diagram_counter_deleted(sender, instance, **kwargs):
+    Counter.objects.filter(name=DIAGRAM_DEVICES, object_id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=Diagram.devices.through)
+def diagram_devices_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recount the diagrams whose device set changed."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            recount_diagrams([instance.pk])
+    elif action == 'pre_clear':
+        instance._counted_diagrams = list(instance.diagrams.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        recount_diagrams(getattr(instance, '_counted_diagrams', ()))
+    elif action in ('post_add', 'post_remove'):
+        recount_diagrams(pk_set or ())
@@ -0,0 +1,135 @@
+"""
+Dashboard counters kept in the ``Counter`` table.
+
+The home page totals (active devices, interfaces, published diagrams and
+articles), the device type distribution and each diagram's device count
+are maintained by signal handlers (see ``core.signals``) as atomic
+``F()`` increments, so the page reads them back in one query instead of
+counting and grouping the inventory on every hit. Bulk writers, which
+send no signals, call ``recompute_counters`` when they finish, and the
+``repair_counters`` command does the same for any other drift.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from blog.models import Article
+from inventory.models import Device, Interface
+from visualization.models import Diagram
+
+from .models import Counter
+
+
+ACTIVE_DEVICES = 'devices.active'
+INTERFACES = 'interfaces'
+PUBLISHED_DIAGRAMS = 'diagrams.published'
+PUBLISHED_ARTICLES = 'articles.published'
+DEVICE_TYPE_PREFIX = 'devices.type.'
+# Per diagram, keyed by ``object_id``.
+DIAGRAM_DEVICES = 'diagram.devices'
+
+# The fields that decide which counters a row counts towards.
+COUNTED_FIELDS = {
+    Device: ('device_type', 'is_active'),
+    Diagram: ('is_published',),
+    Article: ('is_published',),
+}
+
+
+def counted_names(instance):
+    """Names of the site-wide counters ``instance`` contributes one to."""
+    if isinstance(instance, Device):
+        names = [DEVICE_TYPE_PREFIX + instance.device_type]
+        if instance.is_active:
+            names.append(ACTIVE_DEVICES)
+        return names
+    if isinstance(instance, Diagram):
+        return [PUBLISHED_DIAGRAMS] if instance.is_published else []
+    if isinstance(instance, Article):
+        return [PUBLISHED_ARTICLES] if instance.is_published else []
+    return []
+
+
+def adjust(deltas, object_id=0):
+    """Add ``{name: delta}`` to the counters, creating missing ones."""
+    with transaction.atomic():
+        for name, delta in deltas.items():
+            if not delta:
+                continue
+            counters = Counter.objects.filter(name=name, object_id=object_id)
+            if counters.update(value=F('value') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    Counter.objects.create(name=name, object_id=object_id, value=delta)
+            except IntegrityError:
+                # Created concurrently since the update.
+                counters.update(value=F('value') + delta)
+
+
+def recount_diagrams(diagram_ids):
+    """Set the device counts of ``diagram_ids`` from their memberships."""
+    diagram_ids = set(diagram_ids)
+    if not diagram_ids:
+        return
+    counts = dict(
+        Diagram.devices.through.objects.filter(diagram_id__in=diagram_ids)
+        .values_list('diagram_id').annotate(count=Count('device_id')).order_by()
+    )
+    with transaction.atomic():
+        for diagram_id in diagram_ids:
+            Counter.objects.update_or_create(
+                name=DIAGRAM_DEVICES, object_id=diagram_id,
+                defaults={'value': counts.get(diagram_id, 0)},
+            )
+
+
+def compute_counters():
+    """Return ``[(name, object_id, value), ...]`` counted from scratch."""
+    counters = [
+        (ACTIVE_DEVICES, 0, Device.objects.filter(is_active=True).count()),
+        (INTERFACES, 0, Interface.objects.count()),
+        (PUBLISHED_DIAGRAMS, 0, Diagram.objects.filter(is_published=True).count()),
+        (PUBLISHED_ARTICLES, 0, Article.objects.filter(is_published=True).count()),
+    ]
+    counters += [
+        (DEVICE_TYPE_PREFIX + device_type, 0, count)
+        for device_type, count in Device.objects.values_list('device_type')
+        .annotate(count=Count('id')).order_by()
+    ]
+    counters += [
+        (DIAGRAM_DEVICES, diagram_id, count)
+        for diagram_id, count in Diagram.objects.values_list('id').annotate(count=Count('devices')).order_by()
+    ]
+    return counters
+
+
+def recompute_counters():
+    """Replace every counter with a fresh count; returns how many were written."""
+    counters = compute_counters()
+    with transaction.atomic():
+        Counter.objects.all().delete()
+        Counter.objects.bulk_create([
+            Counter(name=name, object_id=object_id, value=value)
+            for name, object_id, value in counters
+        ])
+    return len(counters)
+
+
+def get_dashboard_counters():
+    """Return the home page totals and device type distribution in one query."""
+    values = dict(Counter.objects.filter(object_id=0).values_list('name', 'value'))
+    device_types = sorted(
+        (
+            {'device_type': name[len(DEVICE_TYPE_PREFIX):], 'count': count}
+            for name, count in values.items()
+            if name.startswith(DEVICE_TYPE_PREFIX) and count > 0
+        ),
+        key=lambda row: (-row['count'], row['device_type']),
+    )
+    return {
+        'total_devices': values.get(ACTIVE_DEVICES, 0),
+        'total_interfaces': values.get(INTERFACES, 0),
+        'total_diagrams': values.get(PUBLISHED_DIAGRAMS, 0),
+        'total_articles': values.get(PUBLISHED_ARTICLES, 0),
+        'device_types': device_types,
+    }
@@ -0,0 +1,264 @@
+"""
+Synthetic inventory for load testing.
+
+Devices are generated one site at a time. Each site is a three-tier
+network: a core pair and firewall, distribution pairs, access switches
+dual-homed to their distribution pair, and endpoints on access ports.
+Servers and storage are racked; every site also gets a network diagram, a
+rack diagram and a runbook article with embeds. Everything is written with
+``bulk_create``, so each site is indexed for search explicitly, and the
+topology version is bumped and a journal checkpoint taken once at the end.
+"""
+import ipaddress
+import math
+import random
+
+from django.db import transaction
+
+from blog.models import Article, ArticleEmbed
+from inventory.addressing import format_mac, pack_ip
+from inventory.journal import take_checkpoint
+from inventory.models import Device, Interface, Connection
+from inventory.search import index_devices
+from inventory.topology import bump_topology_version
+from visualization.models import Diagram
+
+from .stats import recompute_counters
+
+
+SITE_SIZE = 1000
+MIN_SITE_SIZE = 10
+SITE_PREFIX = 'Site '
+ACCESS_PORTS = 48
+ACCESS_UPLINKS = 2
+# Access switches per distribution pair, and endpoints per access switch.
+ACCESS_PER_BLOCK = 8
+ENDPOINTS_PER_ACCESS = 24
+RACK_UNITS = 40
+BATCH_SIZE = 2000
+# Each site numbers its devices from its own block of 10.0.0.0/8.
+SYNTHETIC_NETWORK = ipaddress.ip_network('10.0.0.0/8')
+SITE_BLOCK = 4096
+# Locally administered MACs: this prefix, then the site and a per-site counter.
+SYNTHETIC_MAC_BASE = 0x02_00_00_00_00_00
+
+# Endpoint mix: (device_type, os_type, share, nic count range, rack height or None)
+ENDPOINT_MIX = [
+    ('server', 'linux', 0.30, (2, 4), 1),
+    ('server', 'windows', 0.10, (2, 2), 2),
+    ('storage', 'linux', 0.05, (4, 4), 4),
+    ('workstation', 'windows', 0.45, (1, 1), None),
+    ('printer', 'other', 0.05, (1, 1), None),
+    ('other', 'other', 0.05, (1, 2), None),
+]
+
+
+def site_location(site):
+    return f'{SITE_PREFIX}{site:03d}'
+
+
+def next_site_number():
+    """First site number not used by previously generated data."""
+    return Device.objects.filter(location__startswith=SITE_PREFIX).values('location').distinct().count()
+
+
+def site_sizes(total):
+    """Split ``total`` devices into sites of roughly ``SITE_SIZE``."""
+    if total < MIN_SITE_SIZE:
+        raise ValueError(f'generate at least {MIN_SITE_SIZE} devices')
+    sites = max(1, round(total / SITE_SIZE))
+    base, extra = divmod(total, sites)
+    return [base + (1 if i < extra else 0) for i in range(sites)]
+
+
+class SiteBuilder:
+    """Accumulates one site's rows before they are written."""
+
+    def __init__(self, site, size, rng):
+        self.site = site
+        self.location = site_location(site)
+        self.prefix = f's{site:03d}'
+        self.rng = rng
+        self.devices = []
+        self.interfaces = {}
+        self.links = []
+        self.racks = {}
+        self.plan(size)
+
+    def add_device(self, role, number, device_type, os_type, ports, rack_height=None):
+        name = f'{self.prefix}-{role}-{number:04d}'
+        index = len(self.devices)
+        ip = str(SYNTHETIC_NETWORK[self.site * SITE_BLOCK + index + 1])
+        device = Device(
+            name=name,
+            slug=name,
+            device_type=device_type,
+            os_type=os_type,
+            ip_address=ip,
+            ip_packed=pack_ip(ip),
+            location=self.location,
+            serial_number=f'SN{self.site:03d}{index:05d}',
+            rack_unit_height=rack_height or 1,
+        )
+        if rack_height:
+            self.rack(device, rack_height)
+        self.devices.append(device)
+        self.interfaces[name] = list(ports)
+        return name
+
+    def rack(self, device, height):
+        """Place ``device`` in the first rack of this site with room, bottom up."""
+        for rack_id, used in self.racks.items():
+            if used + height <= RACK_UNITS:
+                break
+        else:
+            rack_id = f'{self.prefix.upper()}-R{len(self.racks) + 1:02d}'
+            used = 0
+        device.rack_id = rack_id
+        device.rack_unit_start = used + 1
+        self.racks[rack_id] = used + height
+
+    def link(self, src, src_port, dst, dst_port, connection_type='physical'):
+        self.links.append((src, src_port, dst, dst_port, connection_type))
+
+    def plan(self, size):
+        rng = self.rng
+        switch_ports = [f'Gi1/0/{p}' for p in range(1, ACCESS_PORTS + 1)]
+        uplinks = [f'Te1/1/{p}' for p in range(1, ACCESS_UPLINKS + 1)]
+
+        access_count = max(1, size // (ENDPOINTS_PER_ACCESS + 2))
+        distribution_count = 2 * math.ceil(access_count / ACCESS_PER_BLOCK)
+        endpoint_count = size - 3 - distribution_count - access_count
+        while endpoint_count < 0 and access_count > 1:
+            access_count -= 1
+            distribution_count = 2 * math.ceil(access_count / ACCESS_PER_BLOCK)
+            endpoint_count = size - 3 - distribution_count - access_count
+
+        cores = [self.add_device('core', i, 'switch', 'cisco', switch_ports + uplinks, 2) for i in (1, 2)]
+        firewall = self.add_device('fw', 1, 'firewall', 'paloalto', [f'eth{p}' for p in range(8)], 2)
+        self.core_names = cores + [firewall]
+        self.link(cores[0], uplinks[0], cores[1], uplinks[0], 'vlan')
+        self.link(firewall, 'eth0', cores[0], uplinks[1])
+        self.link(firewall, 'eth1', cores[1], uplinks[1])
+        core_port = 0
+
+        distributions = []
+        for i in range(0, distribution_count, 2):
+            pair = [
+                self.add_device('dist', i + 1, 'switch', 'junos', switch_ports + uplinks, 1),
+                self.add_device('dist', i + 2, 'switch', 'junos', switch_ports + uplinks, 1),
+            ]
+            self.link(pair[0], uplinks[1], pair[1], uplinks[1], 'vlan')
+            for dist_index, dist in enumerate(pair):
+                self.link(dist, uplinks[0], cores[dist_index], switch_ports[core_port], 'vlan')
+            core_port += 1
+            distributions.append(pair)
+
+        access = []
+        for i in range(access_count):
+            switch = self.add_device('access', i + 1, 'switch', 'cisco', switch_ports + uplinks)
+            pair = distributions[i // ACCESS_PER_BLOCK]
+            for dist_index, dist in enumerate(pair):
+                self.link(switch, uplinks[dist_index], dist, switch_ports[i % ACCESS_PER_BLOCK], 'vlan')
+            access.append(switch)
+
+        weights = [share for _, _, share, _, _ in ENDPOINT_MIX]
+        counters = {}
+        for i in range(endpoint_count):
+            device_type, os_type, _, nics, height = rng.choices(ENDPOINT_MIX, weights)[0]
+            counters[device_type] = counters.get(device_type, 0) + 1
+            wireless = device_type == 'workstation' and rng.random() < 0.1
+            ports = ['wlan0'] if wireless else [f'eth{p}' for p in range(rng.randint(*nics))]
+            name = self.add_device(device_type, counters[device_type], device_type, os_type, ports, height)
+            switch = access[i % access_count]
+            port = switch_ports[(i // access_count) % ACCESS_PORTS]
+            self.link(name, ports[0], switch, port, 'wireless' if wireless else 'physical')
+
+    def write(self):
+        """Write the site's devices, interfaces, connections, diagrams and article."""
+        Device.objects.bulk_create(self.devices, batch_size=BATCH_SIZE)
+        device_ids = dict(Device.objects.filter(location=self.location).values_list('name', 'id'))
+
+        interfaces = []
+        for name, ports in self.interfaces.items():
+            for port in ports:
+                interface_type = 'wifi' if port.startswith('wlan') else \
+                    'optical' if port.startswith('Te') else 'ethernet'
+                mac = SYNTHETIC_MAC_BASE | self.site << 24 | len(interfaces)
+                interfaces.append(Interface(
+                    device_id=device_ids[name], name=port, interface_type=interface_type,
+                    mac_address=format_mac(mac), mac_value=mac,
+                ))
+        Interface.objects.bulk_create(interfaces, batch_size=BATCH_SIZE)
+        interface_ids = {
+            (name, port): interface_id
+            for name, port, interface_id in Interface.objects.filter(
+                device__location=self.location,
+            ).values_list('device__name', 'name', 'id')
+        }
+
+        Connection.objects.bulk_create([
+            Connection(
+                source_interface_id=interface_ids[src, src_port],
+                destination_interface_id=interface_ids[dst, dst_port],
+                connection_type=connection_type,
+            )
+            for src, src_port, dst, dst_port, connection_type in self.links
+        ], batch_size=BATCH_SIZE)
+
+        network = Diagram.objects.create(
+            name=f'{self.location} Core Network',
+            diagram_type='network',
+            description=f'Core and distribution layer of {self.location}.',
+            mermaid_code='graph TD\n' + '\n'.join(
+                f'    {src} --- {dst}' for src, _, dst, _, _ in self.links[:20]
+            ),
+        )
+        racks = Diagram.objects.create(name=f'{self.location} Racks', diagram_type='rack')
+        through = Diagram.devices.through
+        core_layer = [name for name in device_ids if '-core-' in name or '-fw-' in name or '-dist-' in name]
+        racked = [device.name for device in self.devices if device.rack_id][:200]
+        through.objects.bulk_create(
+            [through(diagram_id=network.id, device_id=device_ids[name]) for name in core_layer]
+            + [through(diagram_id=racks.id, device_id=device_ids[name]) for name in racked]
+        )
+
+        article = Article.objects.create(
+            title=f'{self.location} Runbook',
+            content=f'<p>Operational notes for {self.location}.</p>' * 20,
+            description=f'How {self.location} is wired.',
+            is_published=True,
+        )
+        ArticleEmbed.objects.bulk_create([
+            ArticleEmbed(article=article, embed_type='diagram', diagram=network, order=0, caption='Core network'),
+            ArticleEmbed(article=article, embed_type='device', device_id=device_ids[self.core_names[0]], order=1),
+            ArticleEmbed(article=article, embed_type='mermaid', order=2,
+                         mermaid_code=f'graph LR\n    WAN --> {self.core_names[2]}'),
+        ])
+        index_devices(device_ids.values())
+        return len(self.devices), len(interfaces), len(self.links)
+
+
+def generate_inventory(total, seed=0, first_site=None):
+    """
+    Generate ``total`` devices across new sites and return row counts.
+
+    Sites are numbered from ``first_site`` (default: after existing
+    synthetic sites), so repeated calls grow the same inventory.
+    """
+    if first_site is None:
+        first_site = next_site_number()
+    counts = {'sites': 0, 'devices': 0, 'interfaces': 0, 'connections': 0}
+    for offset, size in enumerate(site_sizes(total)):
+        site = first_site + offset
+        builder = SiteBuilder(site, size, random.Random(f'{seed}:{site}'))
+        with transaction.atomic():
+            devices, interfaces, connections = builder.write()
+        counts['sites'] += 1
+        counts['devices'] += devices
+        counts['interfaces'] += interfaces
+        counts['connections'] += connections
+    bump_topology_version()
+    take_checkpoint(bulk=True)
+    recompute_counters()
+    return counts
@@ -1,3 +1,130 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
 from django.test import TestCase
+from django.urls import reverse
+
+from blog.models import Article
+from inventory.models import Device, Interface, Connection
+from visualization.models import Diagram
+
+from .benchmarks import check_scales, query_growth, run_benchmarks
+from .models import Counter
+from .stats import compute_counters, get_dashboard_counters
+from .synthetic import generate_inventory, site_sizes
+
+
+class SyntheticInventoryTest(TestCase):
+    def test_generates_three_tier_sites(self):
+        counts = generate_inventory(120, seed=1)
+        self.assertEqual(counts['devices'], 120)
+        self.assertEqual(Device.objects.count(), 120)
+        self.assertEqual(Interface.objects.count(), counts['interfaces'])
+        self.assertEqual(Connection.objects.count(), counts['connections'])
+        self.assertEqual(Diagram.objects.count(), 2)
+        self.assertEqual(Article.objects.get().embeds.count(), 3)
+
+        # Every access switch is dual-homed to distribution.
+        for switch in Device.objects.filter(name__contains='-access-'):
+            uplinks = Connection.objects.filter(source_interface__device=switch, source_interface__name__startswith='Te')
+            self.assertEqual(uplinks.count(), 2)
+        self.assertTrue(Device.objects.filter(rack_id__isnull=False).exists())
+
+        # A second run adds a new site rather than colliding with the first.
+        generate_inventory(30)
+        self.assertEqual(Device.objects.values('location').distinct().count(), 2)
+
+    def test_site_sizes(self):
+        self.assertEqual(site_sizes(2500), [1250, 1250])
+        self.assertEqual(sum(site_sizes(100000)), 100000)
+        with self.assertRaises(ValueError):
+            site_sizes(5)
+
+
+class QueryScalingTest(TestCase):
+    def test_query_counts_do_not_grow_with_data(self):
+        cache.clear()
+        results = run_benchmarks(scales=(100, 400), repeat=1)
+        for metrics in results[400].values():
+            self.assertEqual(metrics['status'], 200)
+        self.assertEqual(query_growth(results), [])
+
+    def test_query_growth_is_reported(self):
+        results = {
+            10: {'View': {'cold_queries': 3}},
+            100: {'View': {'cold_queries': 7}},
+        }
+        self.assertEqual(query_growth(results), [('View', 3, 100, 7)])
+
+    def test_small_scale_steps_are_rejected_up_front(self):
+        check_scales((100, 100, 400))
+        for scales in ((5, 100), (100, 105)):
+            with self.assertRaises(ValueError):
+                check_scales(scales)
+        with self.assertRaises(ValueError):
+            run_benchmarks(scales=(100, 105), repeat=1)
+        self.assertEqual(Device.objects.count(), 0)
+        with self.assertRaisesMessage(CommandError, 'each step must add at least'):
+            call_command('benchmark_views', '--scales', '100,105', stdout=io.StringIO())
+
+
+class DashboardCounterTest(TestCase):
+    def assertCountersFresh(self):
+        maintained = set(Counter.objects.exclude(value=0).values_list('name', 'object_id', 'value'))
+        fresh = {row for row in compute_counters() if row[2]}
+        self.assertEqual(maintained, fresh)
+
+    def test_signals_keep_counters_fresh(self):
+        router = Device.objects.create(name='r1', device_type='router')
+        switch = Device.objects.create(name='s1', device_type='switch', is_active=False)
+        Interface.objects.create(device=router, name='eth0', interface_type='ethernet')
+        Interface.objects.create(device=switch, name='eth0', interface_type='ethernet')
+        diagram = Diagram.objects.create(name='Core', diagram_type='network')
+        diagram.devices.add(router, switch)
+        other = Diagram.objects.create(name='Draft', diagram_type='network', is_published=False)
+        switch.diagrams.add(other)
+        Article.objects.create(title='Runbook', content='x', is_published=True)
+        self.assertCountersFresh()
+        self.assertEqual(get_dashboard_counters()['device_types'], [
+            {'device_type': 'router', 'count': 1},
+            {'device_type': 'switch', 'count': 1},
+        ])
+
+        switch.is_active = True
+        switch.device_type = 'router'
+        switch.save()
+        other.is_published = True
+        other.save()
+        diagram.devices.remove(router)
+        self.assertCountersFresh()
+
+        switch.diagrams.clear()
+        router.delete()
+        diagram.devices.add(switch)
+        other.delete()
+        self.assertCountersFresh()
+        self.assertEqual(get_dashboard_counters()['total_interfaces'], 1)
+
+    def test_home_page_reads_counters(self):
+        generate_inventory(60, seed=2)
+        self.assertCountersFresh()
+        url = reverse('core:home')
+        # Counters, recent devices, recent diagrams (with their counters) and recent articles.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_devices'], Device.objects.filter(is_active=True).count())
+        self.assertEqual(response.context['total_interfaces'], Interface.objects.count())
+        for diagram in response.context['recent_diagrams']:
+            self.assertEqual(diagram.device_count, diagram.devices.count())
 
-# Create your tests here.
+    def test_repair_command(self):
+        Device.objects.create(name='r1', device_type='router')
+        Device.objects.update(is_active=False)
+        Counter.objects.filter(name='interfaces').update(value=F('value') + 5)
+        out = io.StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('Recomputed', out.getvalue())
+        self.assertCountersFresh()
+        self.assertEqual(get_dashboard_counters()['total_devices'], 0)
@@ -3,7 +3,11 @@ from django.views.generic import TemplateView
 from inventory.models import Device
 from visualization.models import Diagram
 from blog.models import Article
-from django.db.models import Count
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Counter
+from .stats import DIAGRAM_DEVICES, get_dashboard_counters
 
 
 class HomeView(TemplateView):
@@ -12,20 +16,19 @@ class HomeView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get statistics
-        context['total_devices'] = Device.objects.filter(is_active=True).count()
-        context['total_interfaces'] = Device.objects.aggregate(
-            count=Count('interfaces')
-        )['count'] or 0
-        context['total_diagrams'] = Diagram.objects.filter(is_published=True).count()
-        context['total_articles'] = Article.objects.filter(is_published=True).count()
+        # Totals and the device type distribution come from the maintained counters
+        context.update(get_dashboard_counters())
         
         # Get recent items for dashboard
         context['recent_devices'] = Device.objects.filter(is_active=True).order_by('-updated_at')[:5]
-        context['recent_diagrams'] = Diagram.objects.filter(is_published=True).order_by('-updated_at')[:5]
-        context['recent_articles'] = Article.objects.filter(is_published=True).order_by('-created_at')[:5]
-        
-        # Get device type distribution
-        context['device_types'] = Device.objects.values('device_type').annotate(count=Count('id')).order_by('-count')
+        device_count = Counter.objects.filter(name=DIAGRAM_DEVICES, object_id=OuterRef('pk')).values('value')
+        context['recent_diagrams'] = (
+            Diagram.objects.filter(is_published=True)
+            .annotate(device_count=Coalesce(Subquery(device_count), Value(0)))
+            .order_by('-updated_at')[:5]
+        )
+        context['recent_articles'] = (
+            Article.objects.filter(is_published=True).select_related('author').order_by('-created_at')[:5]
+        )
         
         return context
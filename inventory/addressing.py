@@ -0,0 +1,79 @@
+"""
+Fixed-width binary encoding of IP addresses for indexed range queries.
+
+Every address is stored as 16 packed bytes: IPv6 as-is and IPv4 in its
+IPv4-mapped form (``::ffff:a.b.c.d``). Byte-wise comparison of the packed
+values matches numeric address order, so a subnet is one contiguous key
+range and containment, range and nearest-address lookups are all index
+range scans.
+
+MAC addresses are stored as their 48-bit integer value, so every notation
+(colons, dashes, Cisco dotted, bare hex) lands on the same indexed key.
+"""
+import ipaddress
+import re
+
+
+PACKED_LENGTH = 16
+MAC_HEX = re.compile(r'[0-9a-f]{12}')
+MAC_SEPARATORS = re.compile(r'[\s:.\-]')
+
+
+def pack_ip(address):
+    """Return the 16-byte key for ``address``, or ``None`` if it is empty or invalid."""
+    if not address:
+        return None
+    try:
+        ip = ipaddress.ip_address(str(address).strip())
+    except ValueError:
+        return None
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b'\x00' * 10 + b'\xff\xff' + ip.packed)
+    return ip.packed
+
+
+def unpack_ip(packed):
+    """Inverse of ``pack_ip``; IPv4-mapped keys come back as IPv4 addresses."""
+    ip = ipaddress.IPv6Address(bytes(packed))
+    return ip.ipv4_mapped or ip
+
+
+def parse_network(cidr):
+    """Parse ``cidr`` (host bits allowed), raising ``ValueError`` if it is not a network."""
+    return ipaddress.ip_network(str(cidr).strip(), strict=False)
+
+
+def network_bounds(network):
+    """Return the inclusive ``(low, high)`` key range covering every address in ``network``."""
+    if isinstance(network, str):
+        network = parse_network(network)
+    return pack_ip(network.network_address), pack_ip(network.broadcast_address)
+
+
+def common_prefix_length(a, b):
+    """Number of leading bits two packed keys share (0-128)."""
+    diff = int.from_bytes(bytes(a), 'big') ^ int.from_bytes(bytes(b), 'big')
+    return PACKED_LENGTH * 8 - diff.bit_length()
+
+
+def prefix_length(packed, shared_bits):
+    """Express ``shared_bits`` of the 128-bit key in the address's own family."""
+    if unpack_ip(packed).version == 4:
+        return max(shared_bits - 96, 0)
+    return shared_bits
+
+
+def parse_mac(value):
+    """Return the 48-bit integer of MAC ``value`` in any common notation, or ``None`` if invalid."""
+    if not value:
+        return None
+    digits = MAC_SEPARATORS.sub('', str(value).lower())
+    if not MAC_HEX.fullmatch(digits):
+        return None
+    return int(digits, 16)
+
+
+def format_mac(number):
+    """Inverse of ``parse_mac``, as lower-case colon-separated octets."""
+    digits = f'{number:012x}'
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
@@ -0,0 +1,301 @@
+"""
+Failure analysis over the cached connection graph.
+
+Everything here runs against a ``TopologyIndex``; structural results
+(articulation points, bridges, centrality, baseline reachability) are
+memoized on the index, so they are computed once per topology version and
+any number of what-if scenarios can be evaluated against them.
+"""
+import heapq
+import random
+from collections import deque
+
+
+# Above this many devices betweenness is estimated from a sample of sources.
+CENTRALITY_EXACT_LIMIT = 1000
+CENTRALITY_SAMPLES = 64
+
+
+def _pair(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def cut_structure(index):
+    """
+    Return ``(articulation_points, bridges)`` for the whole graph.
+
+    ``articulation_points`` is a set of device ids whose loss splits their
+    component; ``bridges`` a set of unordered device pairs whose links (all
+    of them, if there are parallel ones) do the same. Uses an iterative
+    Tarjan DFS, so deep chains do not hit the recursion limit.
+    """
+    points, bridges, _ = _cut_structure(index)
+    return points, bridges
+
+
+def separating_pairs(index):
+    """
+    Return the device pairs whose loss of every link between them splits their component.
+
+    These are the bridges of the graph with parallel links collapsed; unlike
+    ``cut_structure``'s bridges they include pairs joined by several links.
+    """
+    return _cut_structure(index)[2]
+
+
+def _cut_structure(index):
+    def compute():
+        adjacency = index.adjacency
+        disc = {}
+        low = {}
+        points = set()
+        bridges = set()
+        separating = set()
+        clock = 0
+
+        for root in adjacency:
+            if root in disc:
+                continue
+            disc[root] = low[root] = clock
+            clock += 1
+            root_children = 0
+            stack = [(root, None, iter(adjacency[root]))]
+            while stack:
+                node, parent, neighbours = stack[-1]
+                for neighbour in neighbours:
+                    if neighbour == parent:
+                        continue
+                    if neighbour in disc:
+                        low[node] = min(low[node], disc[neighbour])
+                    else:
+                        disc[neighbour] = low[neighbour] = clock
+                        clock += 1
+                        stack.append((neighbour, node, iter(adjacency[neighbour])))
+                        break
+                else:
+                    stack.pop()
+                    if parent is None:
+                        continue
+                    low[parent] = min(low[parent], low[node])
+                    if low[node] > disc[parent]:
+                        separating.add(_pair(node, parent))
+                        if index.multiplicity[_pair(node, parent)] == 1:
+                            bridges.add(_pair(node, parent))
+                    if parent == root:
+                        root_children += 1
+                    elif low[node] >= disc[parent]:
+                        points.add(parent)
+            if root_children > 1:
+                points.add(root)
+        return points, bridges, separating
+
+    return index.memoize('cut_structure', compute)
+
+
+def compact_graph(index):
+    """
+    Return ``(ids, adjacency)`` with devices renumbered ``0..n-1``.
+
+    ``adjacency[i]`` is a list of neighbour positions. Plain lists indexed by
+    int are several times faster than the id-keyed dicts for whole-graph
+    traversals.
+    """
+    def compute():
+        ids = list(index.adjacency)
+        position = {device_id: i for i, device_id in enumerate(ids)}
+        adjacency = [
+            [position[neighbour] for neighbour in index.adjacency[device_id]]
+            for device_id in ids
+        ]
+        return ids, adjacency
+
+    return index.memoize('compact', compute)
+
+
+def betweenness_centrality(index):
+    """
+    Return ``{device_id: score}`` with normalized betweenness centrality in ``[0, 1]``.
+
+    Exact (Brandes) up to ``CENTRALITY_EXACT_LIMIT`` devices; beyond that the
+    score is estimated from ``CENTRALITY_SAMPLES`` deterministic random
+    sources, which ranks the critical devices the same way at a fraction of
+    the cost.
+    """
+    def compute():
+        ids, adjacency = compact_graph(index)
+        n = len(ids)
+        if n < 3:
+            return dict.fromkeys(ids, 0.0)
+
+        sources = range(n)
+        if n > CENTRALITY_EXACT_LIMIT:
+            sources = random.Random(index.version).sample(range(n), CENTRALITY_SAMPLES)
+
+        scores = [0.0] * n
+        for source in sources:
+            # Single-source shortest paths (unweighted BFS) ...
+            distance = [-1] * n
+            sigma = [0] * n
+            distance[source] = 0
+            sigma[source] = 1
+            order = [source]
+            for node in order:
+                next_distance = distance[node] + 1
+                for neighbour in adjacency[node]:
+                    if distance[neighbour] < 0:
+                        distance[neighbour] = next_distance
+                        order.append(neighbour)
+                    if distance[neighbour] == next_distance:
+                        sigma[neighbour] += sigma[node]
+            # ... then accumulate dependencies back towards the source. A
+            # predecessor is any neighbour exactly one step closer.
+            delta = [0.0] * n
+            for node in reversed(order):
+                coefficient = (1 + delta[node]) / sigma[node]
+                previous_distance = distance[node] - 1
+                for neighbour in adjacency[node]:
+                    if distance[neighbour] == previous_distance:
+                        delta[neighbour] += sigma[neighbour] * coefficient
+                if node != source:
+                    scores[node] += delta[node]
+
+        scale = 1.0 / ((n - 1) * (n - 2)) * (n / len(sources))
+        return {device_id: scores[i] * scale for i, device_id in enumerate(ids)}
+
+    return index.memoize('betweenness', compute)
+
+
+def reachable_from(index, core_id):
+    """Return the set of device ids reachable from ``core_id``."""
+    seen = {core_id}
+    queue = deque([core_id])
+    while queue:
+        for neighbour in index.adjacency[queue.popleft()]:
+            if neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return seen
+
+
+def failure_impact(index, core_id, failed_devices=(), failed_connections=()):
+    """
+    Return the device ids that lose reachability to ``core_id`` in a failure scenario.
+
+    Failed devices themselves are not included. A device pair only loses its
+    link once every parallel connection between them has failed.
+
+    Rather than re-walking the whole graph, searches start from every device
+    next to a failure and always advance the smallest region first. Regions
+    that run out of devices without meeting the core are lost; once the only
+    region still growing must be the core's, the search stops. The work is
+    therefore proportional to the size of the cut-off regions, not the
+    network. A single failure that is neither an articulation point nor a
+    separating pair is answered from the memoized cut structure directly.
+    """
+    adjacency = index.adjacency
+    failed_devices = {d for d in failed_devices if d in adjacency}
+    remaining = {}
+    for connection_id in failed_connections:
+        pair = index.connections.get(connection_id)
+        if pair is not None:
+            remaining[pair] = remaining.get(pair, index.multiplicity[pair]) - 1
+    cut_pairs = {pair for pair, left in remaining.items() if left <= 0}
+
+    if core_id in failed_devices:
+        baseline = index.memoize(('reachable', core_id), lambda: reachable_from(index, core_id))
+        return baseline - failed_devices
+
+    # Compare cut pairs against separating pairs, not bridges: losing every
+    # one of several parallel links splits the graph just like a bridge.
+    points, _, separating = _cut_structure(index)
+    if len(failed_devices) + len(cut_pairs) <= 1 and not (
+        failed_devices & points or cut_pairs & separating
+    ):
+        return set()
+
+    seeds = {
+        neighbour
+        for device_id in failed_devices
+        for neighbour in adjacency[device_id]
+        if neighbour not in failed_devices
+    }
+    seeds.update(device_id for pair in cut_pairs for device_id in pair if device_id not in failed_devices)
+    # Only devices that could reach the core to begin with can lose it.
+    baseline = index.memoize(('reachable', core_id), lambda: reachable_from(index, core_id))
+    seeds &= baseline
+
+    # One region per seed; regions merge when their searches meet.
+    owner = {}
+    merged_into = {}
+    members = {}
+    frontier = {}
+    for seed in seeds:
+        owner[seed] = seed
+        merged_into[seed] = seed
+        members[seed] = [seed]
+        frontier[seed] = deque([seed])
+
+    def find(region):
+        while merged_into[region] != region:
+            merged_into[region] = merged_into[merged_into[region]]
+            region = merged_into[region]
+        return region
+
+    core_region = core_id if core_id in seeds else None
+    growing = set(seeds) - {core_region}
+    # Lazy min-heap of (size, region); stale sizes are refreshed on pop.
+    queue = [(1, region) for region in growing]
+    heapq.heapify(queue)
+    lost = set()
+
+    while growing:
+        if core_region is None and len(growing) == 1:
+            # Every other region is exhausted and none held the core.
+            break
+        size, region = heapq.heappop(queue)
+        if region not in growing:
+            continue
+        if size != len(members[region]):
+            heapq.heappush(queue, (len(members[region]), region))
+            continue
+        node = frontier[region].popleft()
+        for neighbour in adjacency[node]:
+            if neighbour in failed_devices or _pair(node, neighbour) in cut_pairs:
+                continue
+            other = owner.get(neighbour)
+            if other is None:
+                owner[neighbour] = region
+                members[region].append(neighbour)
+                frontier[region].append(neighbour)
+                if neighbour == core_id:
+                    core_region = region
+                continue
+            other = find(other)
+            if other == region:
+                continue
+            # Two searches met: fold the smaller region into the larger one.
+            big, small = (region, other) if len(members[region]) >= len(members[other]) else (other, region)
+            merged_into[small] = big
+            members[big].extend(members.pop(small))
+            frontier[big].extend(frontier.pop(small))
+            growing.discard(small)
+            if core_region in (big, small):
+                core_region = big
+            region = big
+        if region == core_region:
+            growing.discard(region)
+        elif not frontier[region]:
+            growing.discard(region)
+            lost.update(members[region])
+        else:
+            heapq.heappush(queue, (len(members[region]), region))
+
+    return lost
+
+
+def annotate_criticality(topology, index):
+    """Set each node's Vis.js ``value`` to its betweenness so it is drawn by importance."""
+    scores = betweenness_centrality(index)
+    for node in topology['nodes']:
+        node['value'] = round(scores.get(int(node['id']), 0.0), 6)
+    return topology
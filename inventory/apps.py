@@ -5,3 +5,7 @@ class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
     verbose_name = 'Inventory Management'
+    
+    def ready(self):
+        """Import signal handlers when app is ready."""
+        import inventory.signals
@@ -0,0 +1,185 @@
+"""
+Aggregated topology views that collapse devices into cluster super-nodes.
+
+Devices are grouped by a hierarchy of fields (for example location, then
+rack), and links between groups become weighted edges. Each view is built
+from two grouped queries regardless of how many devices are involved: one
+for the nodes of the current level and one for the links touching it.
+"""
+import json
+
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Coalesce
+
+from .layout import compute_layout
+from .models import Device, Connection
+from .topology import make_node, position
+
+
+CLUSTER_FIELDS = ('location', 'rack_id', 'device_type')
+CLUSTER_COLOR = '#556270'
+EXTERNAL_CLUSTER_COLOR = '#C7CCD1'
+
+ENDPOINTS = {
+    'src': 'source_interface__device__',
+    'dst': 'destination_interface__device__',
+}
+
+
+def cluster_id(path):
+    """Node id for the cluster at ``path`` (a sequence of group values)."""
+    return 'cluster:' + json.dumps(list(path))
+
+
+def cluster_label(field, value):
+    if not value:
+        return 'Unassigned'
+    if field == 'device_type':
+        return dict(Device.DEVICE_TYPES).get(value, value)
+    return value
+
+
+def _scope_q(fields, path, prefix=''):
+    """Match devices (optionally through ``prefix``) that sit inside cluster ``path``."""
+    q = Q()
+    for field, value in zip(fields, path):
+        if value:
+            q &= Q(**{prefix + field: value})
+        else:
+            q &= Q(**{prefix + field + '__isnull': True}) | Q(**{prefix + field: ''})
+    return q
+
+
+def _group_key(lookup):
+    # NULL and '' both mean "unassigned"; fold them so they group together.
+    return Coalesce(F(lookup), Value(''))
+
+
+def validate_cluster_path(fields, path):
+    """Raise ``ValueError`` unless ``path`` is a valid position in hierarchy ``fields``."""
+    if not fields or len(set(fields)) != len(fields) or not set(fields) <= set(CLUSTER_FIELDS):
+        raise ValueError(f"cluster fields must be distinct values from {', '.join(CLUSTER_FIELDS)}")
+    if len(path) > len(fields):
+        raise ValueError('cluster path is deeper than the cluster hierarchy')
+
+
+def build_clustered_topology(fields, path=()):
+    """
+    Build the graph for one level of the cluster hierarchy ``fields``.
+
+    With an empty ``path`` every active device is grouped by ``fields[0]``.
+    Each value in ``path`` expands one level: the view then contains only the
+    members of that cluster, grouped by the next field (or as individual
+    devices once every field is fixed), plus the clusters they link out to.
+    Edge ``value`` is the number of parallel links a super-edge stands for.
+    """
+    fields = tuple(fields)
+    path = tuple(path)
+    validate_cluster_path(fields, path)
+
+    depth = len(path)
+    leaf = depth == len(fields)
+    scope = Q(is_active=True) & _scope_q(fields, path)
+
+    nodes = {}
+    if leaf:
+        for device_id, name, device_type in (
+            Device.objects.filter(scope).values_list('id', 'name', 'device_type')
+        ):
+            nodes[str(device_id)] = make_node(device_id, name, device_type)
+    else:
+        field = fields[depth]
+        groups = (
+            Device.objects.filter(scope)
+            .annotate(group=_group_key(field))
+            .values('group')
+            .annotate(size=Count('id'))
+            .order_by('group')
+        )
+        for row in groups:
+            node_path = path + (row['group'],)
+            label = cluster_label(field, row['group'])
+            nodes[cluster_id(node_path)] = {
+                'id': cluster_id(node_path),
+                'label': f"{label} ({row['size']})",
+                'title': f"{field}: {label} ({row['size']} devices)",
+                'color': CLUSTER_COLOR,
+                'shape': 'dot',
+                'value': row['size'],
+                'path': list(node_path),
+                'internal_links': 0,
+            }
+
+    # Group levels needed to place each endpoint: everything up to the
+    # current level, plus the device id once we are down to devices.
+    levels = min(depth + 1, len(fields))
+    annotations = {}
+    for side, prefix in ENDPOINTS.items():
+        for i in range(levels):
+            annotations[f'{side}{i}'] = _group_key(prefix + fields[i])
+    if leaf:
+        annotations['src_device'] = F('source_interface__device_id')
+        annotations['dst_device'] = F('destination_interface__device_id')
+
+    connections = Connection.objects.filter(
+        is_active=True,
+        source_interface__device__is_active=True,
+        destination_interface__device__is_active=True,
+    )
+    if path:
+        connections = connections.filter(
+            _scope_q(fields, path, ENDPOINTS['src'])
+            | _scope_q(fields, path, ENDPOINTS['dst'])
+        )
+    grouped = (
+        connections.annotate(**annotations)
+        .values(*annotations)
+        .annotate(links=Count('id'))
+        .order_by()
+    )
+
+    def endpoint(row, side):
+        values = tuple(row[f'{side}{i}'] for i in range(levels))
+        for i, value in enumerate(path):
+            if values[i] != value:
+                # Outside the expanded cluster: show the sibling it belongs to.
+                node_id = cluster_id(values[:i + 1])
+                if node_id not in nodes:
+                    label = cluster_label(fields[i], values[i])
+                    nodes[node_id] = {
+                        'id': node_id,
+                        'label': label,
+                        'title': f"{fields[i]}: {label}",
+                        'color': EXTERNAL_CLUSTER_COLOR,
+                        'shape': 'dot',
+                        'path': list(values[:i + 1]),
+                        'external': True,
+                    }
+                return node_id
+        if leaf:
+            return str(row[f'{side}_device'])
+        return cluster_id(values)
+
+    weights = {}
+    for row in grouped:
+        src = endpoint(row, 'src')
+        dst = endpoint(row, 'dst')
+        if src == dst:
+            if 'internal_links' in nodes[src]:
+                nodes[src]['internal_links'] += row['links']
+            continue
+        key = (src, dst) if src < dst else (dst, src)
+        weights[key] = weights.get(key, 0) + row['links']
+
+    edges = [
+        {'from': src, 'to': dst, 'value': links, 'label': str(links) if links > 1 else ''}
+        for (src, dst), links in sorted(weights.items())
+    ]
+
+    positions = compute_layout(list(nodes), list(weights))
+    node_list = []
+    for node_id, node in nodes.items():
+        node.update(position(positions, node_id))
+        node_list.append(node)
+
+    return {'nodes': node_list, 'edges': edges}
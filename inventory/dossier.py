@@ -0,0 +1,125 @@
+"""
+Device dossier: everything the device page shows, loaded in a fixed number
+of queries.
+
+``load_dossier`` reads the device, its interfaces, the connections on them
+(with the peer interface and device), the diagrams it appears in and the
+published articles embedding it: five queries whatever the port count. The
+result is plain JSON-ready data, so the detail template and the JSON
+endpoint share it and it can be cached. ``get_dossier`` caches it per
+topology version, which covers device, interface and connection changes,
+and per dossier generation, which diagram and article changes bump.
+"""
+from django.core.cache import cache
+from django.db.models import CharField, Value
+from django.urls import reverse
+
+from blog.models import Article
+from visualization.models import Diagram
+
+from .models import Connection, Device, Interface
+from .topology import SNAPSHOT_TIMEOUT, get_topology_version
+
+
+DOSSIER_CACHE_KEY = 'inventory:dossier:{slug}:v{version}:g{generation}'
+GENERATION_CACHE_KEY = 'inventory:dossier:generation'
+
+DEVICE_FIELDS = (
+    'id', 'name', 'slug', 'description', 'device_type', 'os_type', 'ip_address',
+    'mac_address', 'serial_number', 'location', 'rack_id', 'rack_unit_start',
+    'rack_unit_height', 'is_active',
+)
+INTERFACE_FIELDS = (
+    'id', 'name', 'interface_type', 'ip_address', 'mac_address', 'vlan_id',
+    'description', 'is_active',
+)
+LINK_FIELDS = (
+    'direction', 'interface_id', 'connection_type', 'is_active',
+    'peer_interface', 'peer_device', 'peer_slug',
+)
+
+
+def get_dossier_generation():
+    return cache.get(GENERATION_CACHE_KEY, 0)
+
+
+def bump_dossier_generation():
+    """Invalidate every cached dossier after a diagram or article change."""
+    cache.add(GENERATION_CACHE_KEY, 0, None)
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+
+
+def _links(device_id):
+    """Connections on the device's interfaces, both directions in one query."""
+    def side(direction, local, peer):
+        return Connection.objects.filter(**{f'{local}__device_id': device_id}).annotate(
+            direction=Value(direction, output_field=CharField()),
+        ).values_list(
+            'direction', f'{local}_id', 'connection_type', 'is_active',
+            f'{peer}__name', f'{peer}__device__name', f'{peer}__device__slug',
+        ).order_by()
+
+    outgoing = side('out', 'source_interface', 'destination_interface')
+    incoming = side('in', 'destination_interface', 'source_interface')
+    return [dict(zip(LINK_FIELDS, row)) for row in outgoing.union(incoming, all=True)]
+
+
+def load_dossier(slug):
+    """Return the dossier of the device ``slug``, or ``None`` if there is none."""
+    device = Device.objects.filter(slug=slug).values(*DEVICE_FIELDS).first()
+    if device is None:
+        return None
+    device_id = device['id']
+    device['device_type_display'] = dict(Device.DEVICE_TYPES).get(device['device_type'], device['device_type'])
+    device['os_type_display'] = dict(Device.OS_TYPES).get(device['os_type'], device['os_type'])
+    device['url'] = reverse('inventory:device-detail', kwargs={'slug': slug})
+
+    interface_types = dict(Interface.INTERFACE_TYPES)
+    interfaces = list(Interface.objects.filter(device_id=device_id).order_by('name').values(*INTERFACE_FIELDS))
+    by_id = {}
+    for interface in interfaces:
+        interface['interface_type_display'] = interface_types.get(interface['interface_type'], interface['interface_type'])
+        interface['links'] = []
+        by_id[interface.pop('id')] = interface
+
+    links = _links(device_id)
+    # A link between two ports of this device shows on both, but is one connection.
+    connection_count = sum(1 for link in links if link['direction'] == 'out' or link['peer_slug'] != slug)
+    for link in sorted(links, key=lambda link: (link['peer_device'], link['peer_interface'])):
+        by_id[link.pop('interface_id')]['links'].append(link)
+        link['peer_url'] = reverse('inventory:device-detail', kwargs={'slug': link.pop('peer_slug')})
+
+    diagrams = [
+        {'name': name, 'diagram_type': diagram_type, 'url': reverse('visualization:diagram-detail', kwargs={'slug': diagram_slug})}
+        for name, diagram_slug, diagram_type in Diagram.objects.filter(devices=device_id)
+        .order_by('name').values_list('name', 'slug', 'diagram_type')
+    ]
+    articles = [
+        {'title': title, 'url': reverse('blog:article-detail', kwargs={'slug': article_slug})}
+        for title, article_slug in Article.objects.filter(is_published=True, embeds__device=device_id)
+        .distinct().order_by('-created_at').values_list('title', 'slug')
+    ]
+
+    return {
+        'device': device,
+        'interfaces': interfaces,
+        'interface_count': len(interfaces),
+        'connection_count': connection_count,
+        'diagrams': diagrams,
+        'articles': articles,
+    }
+
+
+def get_dossier(slug):
+    """``load_dossier`` through the cache."""
+    key = DOSSIER_CACHE_KEY.format(slug=slug, version=get_topology_version(), generation=get_dossier_generation())
+    dossier = cache.get(key)
+    if dossier is None:
+        dossier = load_dossier(slug)
+        if dossier is not None:
+            cache.set(key, dossier, SNAPSHOT_TIMEOUT)
+    return dossier
@@ -0,0 +1,209 @@
+"""
+Live change events for open pages, served as server-sent events over ASGI.
+
+Each worker process runs one ``ChangeBroadcaster``. While anyone is
+subscribed it reads the change journal (see ``journal``) once per
+``EVENT_WINDOW``, coalesces the records of that window per object and
+hands each subscriber the part that touches the devices it follows. The
+journal is the shared source, so changes made by any process reach every
+worker; an idle subscriber is only a parked coroutine and a small queue.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+
+from .models import ChangeRecord, Interface
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_WINDOW = 0.25
+KEEPALIVE_INTERVAL = 15
+SUBSCRIBER_QUEUE_SIZE = 50
+# Records read per window; a larger backlog is drained over several windows.
+MAX_WINDOW_RECORDS = 5000
+
+
+def coalesce(records, interface_devices):
+    """
+    Merge one window's ``(pk, model, object_id, action, changes, previous)`` records.
+
+    Returns ``[{'model', 'id', 'action', 'devices'}, ...]`` with one entry per
+    object: a create followed by updates stays a create, anything followed
+    by a delete is a delete, and a create followed by a delete is dropped.
+    ``devices`` lists the ids of the devices the change touches, resolving
+    interfaces through ``interface_devices`` and the records themselves.
+    """
+    merged = {}
+    for _, model, object_id, action, changes, previous in records:
+        key = (model, object_id)
+        values = dict(previous or {}, **(changes or {}))
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = {'model': model, 'id': object_id, 'action': action, 'values': values}
+            continue
+        entry['values'].update(values)
+        if action == 'delete':
+            entry['action'] = None if entry['action'] == 'create' else 'delete'
+        elif entry['action'] is None:
+            entry['action'] = 'create'
+
+    # Interfaces deleted or moved in this window are resolved from their records.
+    interface_devices = dict(interface_devices)
+    for (model, object_id), entry in merged.items():
+        if model == 'interface' and 'device_id' in entry['values']:
+            interface_devices.setdefault(object_id, entry['values']['device_id'])
+
+    events = []
+    for (model, object_id), entry in merged.items():
+        if entry['action'] is None:
+            continue
+        values = entry.pop('values')
+        if model == 'device':
+            devices = {object_id}
+        elif model == 'interface':
+            devices = {values.get('device_id'), interface_devices.get(object_id)}
+        else:
+            devices = {
+                interface_devices.get(values.get('source_interface_id')),
+                interface_devices.get(values.get('destination_interface_id')),
+            }
+        entry['devices'] = sorted(device for device in devices if device is not None)
+        events.append(entry)
+    return events
+
+
+def read_window(after, upto=None):
+    """Return ``(last_pk, version, events)`` for the journal records after ``after`` (up to ``upto``)."""
+    records = ChangeRecord.objects.filter(pk__gt=after).order_by('pk')
+    if upto is not None:
+        records = records.filter(pk__lte=upto)
+    records = list(
+        records.values_list('pk', 'model', 'object_id', 'action', 'changes', 'previous', 'version')
+        [:MAX_WINDOW_RECORDS]
+    )
+    if not records:
+        return after, None, []
+    interface_ids = set()
+    for _, model, object_id, _, changes, previous, _ in records:
+        if model == 'interface':
+            interface_ids.add(object_id)
+        elif model == 'connection':
+            for values in (changes, previous):
+                interface_ids.update(
+                    values[field] for field in ('source_interface_id', 'destination_interface_id')
+                    if values and values.get(field) is not None
+                )
+    interface_devices = dict(Interface.objects.filter(pk__in=interface_ids).values_list('pk', 'device_id'))
+    events = coalesce([record[:6] for record in records], interface_devices)
+    return records[-1][0], records[-1][6], events
+
+
+def latest_record_id():
+    return ChangeRecord.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+class Subscription:
+    """One open stream: the devices it follows (``None`` for all) and its pending messages."""
+
+    def __init__(self, device_ids=None):
+        self.device_ids = set(device_ids) if device_ids is not None else None
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, last_id, version, events):
+        if self.device_ids is not None:
+            events = [event for event in events if self.device_ids.intersection(event['devices'])]
+        if not events:
+            return
+        message = {'id': last_id, 'version': version, 'changes': events}
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind should refetch rather than replay.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'id': last_id, 'version': version, 'reset': True})
+
+
+class ChangeBroadcaster:
+    """Polls the journal on behalf of every subscriber in this process."""
+
+    def __init__(self, window=EVENT_WINDOW):
+        self.window = window
+        self.subscriptions = set()
+        self.last_id = 0
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, device_ids=None, after=None):
+        """
+        Register a subscription and return it.
+
+        Events start at the current end of the journal, or after record
+        ``after`` (a client's ``Last-Event-ID``) when resuming; a backlog too
+        long to replay gets a ``reset`` instead.
+        """
+        subscription = Subscription(device_ids)
+        async with self._lock:
+            if self._task is None or self._task.done():
+                self.last_id = await sync_to_async(latest_record_id)()
+                self._task = asyncio.create_task(self._run())
+            if after is not None and after < self.last_id:
+                last_id, version, events = await sync_to_async(read_window)(after, self.last_id)
+                if last_id < self.last_id:
+                    subscription.queue.put_nowait({'id': self.last_id, 'version': version, 'reset': True})
+                else:
+                    subscription.offer(last_id, version, events)
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    async def poll(self):
+        """Read one window of the journal and fan it out."""
+        last_id, version, events = await sync_to_async(read_window)(self.last_id)
+        self.last_id = last_id
+        for subscription in list(self.subscriptions):
+            subscription.offer(last_id, version, events)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window)
+            async with self._lock:
+                if not self.subscriptions:
+                    # Nobody is listening: stop reading until the next subscriber.
+                    self._task = None
+                    return
+                try:
+                    await self.poll()
+                except Exception:
+                    # E.g. "database is locked"; the next window reads from the same record.
+                    logger.exception('Reading the change journal failed')
+
+
+broadcaster = ChangeBroadcaster()
+
+
+def format_event(message):
+    """Encode ``message`` as one server-sent event."""
+    kind = 'reset' if message.get('reset') else 'change'
+    return f"id: {message['id']}\nevent: {kind}\ndata: {json.dumps(message)}\n\n"
+
+
+async def event_stream(subscription, hub=None, keepalive=KEEPALIVE_INTERVAL):
+    """Yield server-sent events for ``subscription`` until the client goes away."""
+    hub = hub or broadcaster
+    try:
+        yield 'retry: 2000\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(message)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,179 @@
+"""
+Faceted filtering for the device list.
+
+Facet counts follow the usual disjunctive rule: the counts shown for one
+facet apply every *other* active filter, so picking a value never hides
+its siblings. All of them come from one grouped query over the facet
+columns, which yields the count of every combination of facet values.
+That table is cached per inventory (topology) version, and the counts
+derived from it are cached per filter signature and version, so repeated
+filter combinations cost no queries at all.
+"""
+import hashlib
+import json
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Device
+from .topology import SNAPSHOT_TIMEOUT, get_topology_version
+
+
+FACET_FIELDS = ('device_type', 'os_type', 'location', 'rack_id', 'is_active')
+FACET_LABELS = {
+    'device_type': 'Type',
+    'os_type': 'OS',
+    'location': 'Location',
+    'rack_id': 'Rack',
+    'is_active': 'Status',
+}
+# Values listed per facet, besides any that are selected.
+FACET_LIMIT = 12
+COMBINATIONS_CACHE_KEY = 'inventory:facets:combinations:v{version}'
+FACET_CACHE_KEY = 'inventory:facets:{signature}:v{version}'
+
+CHOICE_LABELS = {
+    'device_type': dict(Device.DEVICE_TYPES),
+    'os_type': dict(Device.OS_TYPES),
+    'is_active': {'true': 'Active', 'false': 'Inactive'},
+}
+
+
+def _normalize(field, value):
+    """Facet values travel as strings; NULL and '' both mean "not set"."""
+    if field == 'is_active':
+        return 'true' if value else 'false'
+    return value or ''
+
+
+def parse_filters(params):
+    """
+    Return ``{field: [value, ...]}`` for the facet parameters in ``params``.
+
+    Each facet may be repeated (``?location=DC1&location=DC2``) and matches
+    any of its values; different facets must all match. ``?type=`` is still
+    accepted for ``device_type``.
+    """
+    filters = {}
+    for field in FACET_FIELDS:
+        values = params.getlist(field)
+        if field == 'device_type':
+            values = values + params.getlist('type')
+        values = sorted({value for value in values if field != 'is_active' or value in ('true', 'false')})
+        if values:
+            filters[field] = values
+    return filters
+
+
+def filter_signature(filters):
+    return hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def filter_devices(queryset, filters):
+    """Apply ``filters`` to a Device queryset."""
+    for field, values in filters.items():
+        if field == 'is_active':
+            queryset = queryset.filter(is_active__in=[value == 'true' for value in values])
+            continue
+        q = Q(**{f'{field}__in': [value for value in values if value]})
+        if '' in values:
+            q |= Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+        queryset = queryset.filter(q)
+    return queryset
+
+
+def get_combinations(version=None):
+    """Return ``[(values_tuple, count), ...]`` for every combination of facet values."""
+    if version is None:
+        version = get_topology_version()
+    key = COMBINATIONS_CACHE_KEY.format(version=version)
+    combinations = cache.get(key)
+    if combinations is None:
+        rows = Device.objects.values_list(*FACET_FIELDS).annotate(count=Count('id')).order_by()
+        merged = {}
+        for *values, count in rows:
+            values = tuple(_normalize(field, value) for field, value in zip(FACET_FIELDS, values))
+            merged[values] = merged.get(values, 0) + count
+        combinations = list(merged.items())
+        cache.set(key, combinations, SNAPSHOT_TIMEOUT)
+    return combinations
+
+
+def facet_counts(filters):
+    """
+    Return ``(total, {field: {value: count}})`` for the current ``filters``.
+
+    ``total`` is the number of devices matching every filter; each facet's
+    counts ignore that facet's own filter.
+    """
+    version = get_topology_version()
+    key = FACET_CACHE_KEY.format(signature=filter_signature(filters), version=version)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    selected = [
+        (position, set(filters[field]))
+        for position, field in enumerate(FACET_FIELDS)
+        if field in filters
+    ]
+    total = 0
+    counts = {field: {} for field in FACET_FIELDS}
+    for values, count in get_combinations(version):
+        failed = [position for position, allowed in selected if values[position] not in allowed]
+        if not failed:
+            total += count
+            for position, field in enumerate(FACET_FIELDS):
+                field_counts = counts[field]
+                field_counts[values[position]] = field_counts.get(values[position], 0) + count
+        elif len(failed) == 1:
+            # Matches everything but this one facet, so it counts towards
+            # that facet's alternatives only.
+            position = failed[0]
+            field_counts = counts[FACET_FIELDS[position]]
+            field_counts[values[position]] = field_counts.get(values[position], 0) + count
+
+    result = (total, counts)
+    cache.set(key, result, SNAPSHOT_TIMEOUT)
+    return result
+
+
+def facet_label(field, value):
+    if not value:
+        return 'Not set'
+    return CHOICE_LABELS.get(field, {}).get(value, value)
+
+
+def toggle_url(filters, field, value):
+    """Query string for ``filters`` with ``value`` of ``field`` switched on or off (back to page 1)."""
+    values = set(filters.get(field, ()))
+    values.symmetric_difference_update([value])
+    toggled = dict(filters, **{field: sorted(values)})
+    return '?' + urlencode([(name, v) for name in FACET_FIELDS for v in toggled.get(name, ())])
+
+
+def build_facets(filters, counts):
+    """Shape ``counts`` for display: the biggest values first, selected ones always kept."""
+    facets = []
+    for field in FACET_FIELDS:
+        active = set(filters.get(field, ()))
+        values = sorted(counts[field].items(), key=lambda item: (-item[1], item[0]))
+        shown = values[:FACET_LIMIT] + [item for item in values[FACET_LIMIT:] if item[0] in active]
+        shown += [(value, 0) for value in sorted(active - set(counts[field]))]
+        facets.append({
+            'field': field,
+            'label': FACET_LABELS[field],
+            'values': [
+                {
+                    'value': value,
+                    'label': facet_label(field, value),
+                    'count': count,
+                    'selected': value in active,
+                    'url': toggle_url(filters, field, value),
+                }
+                for value, count in shown
+            ],
+            'hidden': max(len(values) - FACET_LIMIT, 0),
+        })
+    return facets
@@ -0,0 +1,221 @@
+"""
+In-memory adjacency index over the active connection graph.
+
+The index is built once per topology version (two queries) and kept in
+process memory, so path queries against it cost no database round trips.
+"""
+import heapq
+import threading
+from itertools import count
+
+from django.db import transaction
+
+from .models import Device, Connection
+from .topology import get_topology_version
+
+
+# Relative cost of traversing one link of each type in weighted path searches.
+CONNECTION_WEIGHTS = {
+    'physical': 1,
+    'vlan': 1,
+    'logical': 2,
+    'wireless': 4,
+}
+MAX_PATHS = 10
+
+_index_lock = threading.Lock()
+_index = None
+
+
+class TopologyIndex:
+    """
+    Undirected device-level graph of active devices and active connections.
+
+    ``adjacency`` maps a device id to ``{neighbour_id: connection_type}``; of
+    several parallel links the cheapest type is kept.
+    """
+
+    def __init__(self, version, devices, links):
+        self.version = version
+        self.devices = {}
+        self.slugs = {}
+        self.adjacency = {}
+        # Number of parallel links per unordered device pair, and the pair
+        # each connection id belongs to.
+        self.multiplicity = {}
+        self.connections = {}
+        self._memo = {}
+        for device_id, name, slug in devices:
+            self.devices[device_id] = (name, slug)
+            self.slugs[slug] = device_id
+            self.adjacency[device_id] = {}
+        for connection_id, src_id, dst_id, connection_type in links:
+            if src_id == dst_id or src_id not in self.adjacency or dst_id not in self.adjacency:
+                continue
+            pair = (src_id, dst_id) if src_id < dst_id else (dst_id, src_id)
+            self.connections[connection_id] = pair
+            self.multiplicity[pair] = self.multiplicity.get(pair, 0) + 1
+            current = self.adjacency[src_id].get(dst_id)
+            if current is None or CONNECTION_WEIGHTS[connection_type] < CONNECTION_WEIGHTS[current]:
+                self.adjacency[src_id][dst_id] = connection_type
+                self.adjacency[dst_id][src_id] = connection_type
+
+    @classmethod
+    def load(cls, version):
+        devices = Device.objects.filter(is_active=True).values_list('id', 'name', 'slug')
+        links = (
+            Connection.objects.filter(
+                is_active=True,
+                source_interface__device__is_active=True,
+                destination_interface__device__is_active=True,
+            )
+            .values_list(
+                'id',
+                'source_interface__device_id',
+                'destination_interface__device_id',
+                'connection_type',
+            )
+            .order_by()
+        )
+        return cls(version, devices, links)
+
+    def memoize(self, key, compute):
+        """Compute ``key`` once for this index; results live as long as the index does."""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def describe_device(self, device_id):
+        name, slug = self.devices[device_id]
+        return {'id': device_id, 'name': name, 'slug': slug}
+
+    def edge_cost(self, src_id, dst_id, weighted):
+        if not weighted:
+            return 1
+        return CONNECTION_WEIGHTS[self.adjacency[src_id][dst_id]]
+
+    def shortest_path(self, src_id, dst_id, weighted=False, banned_nodes=(), banned_edges=()):
+        """
+        Return ``(cost, [device_id, ...])`` for the cheapest path, or ``None``.
+
+        Runs a bidirectional Dijkstra search, always growing the smaller of
+        the two frontiers, so on large graphs only a small ball around each
+        endpoint is explored. ``banned_nodes`` and ``banned_edges`` (``(a, b)``
+        tuples, both directions listed) are skipped during the search.
+        """
+        if src_id in banned_nodes or dst_id in banned_nodes:
+            return None
+        if src_id == dst_id:
+            return 0, [src_id]
+
+        tie = count()
+        dist = ({src_id: 0}, {dst_id: 0})
+        previous = ({src_id: None}, {dst_id: None})
+        heaps = ([(0, next(tie), src_id)], [(0, next(tie), dst_id)])
+        best = None
+        meeting = None
+
+        while heaps[0] and heaps[1]:
+            if best is not None and heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            cost, _, node = heapq.heappop(heaps[side])
+            if cost > dist[side][node]:
+                continue
+            other = 1 - side
+            for neighbour in self.adjacency[node]:
+                if neighbour in banned_nodes or (node, neighbour) in banned_edges:
+                    continue
+                new_cost = cost + self.edge_cost(node, neighbour, weighted)
+                if new_cost < dist[side].get(neighbour, new_cost + 1):
+                    dist[side][neighbour] = new_cost
+                    previous[side][neighbour] = node
+                    heapq.heappush(heaps[side], (new_cost, next(tie), neighbour))
+                if neighbour in dist[other]:
+                    total = dist[side][neighbour] + dist[other][neighbour]
+                    if best is None or total < best:
+                        best = total
+                        meeting = neighbour
+
+        if meeting is None:
+            return None
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = previous[0][node]
+        path.reverse()
+        node = previous[1][meeting]
+        while node is not None:
+            path.append(node)
+            node = previous[1][node]
+        return best, path
+
+    def k_shortest_paths(self, src_id, dst_id, k=1, weighted=False):
+        """Return up to ``k`` loopless paths in order of cost (Yen's algorithm)."""
+        first = self.shortest_path(src_id, dst_id, weighted)
+        if first is None:
+            return []
+        paths = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        tie = count()
+
+        while len(paths) < k:
+            _, last = paths[-1]
+            for i in range(len(last) - 1):
+                spur = last[i]
+                root = last[:i + 1]
+                banned_edges = set()
+                for _, path in paths:
+                    if path[:i + 1] == root:
+                        banned_edges.add((path[i], path[i + 1]))
+                        banned_edges.add((path[i + 1], path[i]))
+                found = self.shortest_path(
+                    spur, dst_id, weighted,
+                    banned_nodes=set(root[:-1]), banned_edges=banned_edges,
+                )
+                if found is None:
+                    continue
+                candidate = root[:-1] + found[1]
+                if tuple(candidate) in seen:
+                    continue
+                seen.add(tuple(candidate))
+                cost = sum(
+                    self.edge_cost(a, b, weighted) for a, b in zip(candidate, candidate[1:])
+                )
+                heapq.heappush(candidates, (cost, next(tie), candidate))
+            if not candidates:
+                break
+            cost, _, path = heapq.heappop(candidates)
+            paths.append((cost, path))
+        return paths
+
+    def describe_path(self, cost, path):
+        """Serialize a path for the JSON API."""
+        return {
+            'cost': cost,
+            'hops': len(path) - 1,
+            'devices': [self.describe_device(device_id) for device_id in path],
+            'links': [self.adjacency[a][b] for a, b in zip(path, path[1:])],
+        }
+
+
+def get_topology_index():
+    """
+    Return the index for the current topology version, rebuilding it if stale.
+
+    As with the version itself, an index built inside an atomic block is not
+    kept, since a rollback could reuse its version number for other data.
+    """
+    global _index
+    version = get_topology_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    if transaction.get_connection().in_atomic_block:
+        return TopologyIndex.load(version)
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = TopologyIndex.load(version)
+        return _index
@@ -0,0 +1,355 @@
+"""
+Batched upsert of devices, interfaces and connections from CSV or JSONL.
+
+Records are streamed from the input and buffered per kind; each full buffer
+is written with one ``bulk_create(update_conflicts=True)`` inside its own
+transaction. Devices are matched on ``name``, interfaces on
+``(device, name)`` and connections on their two interfaces. References are
+resolved through in-memory ``name -> id`` maps that are filled as batches
+are written, so a reference to a row imported earlier in the same run never
+costs a query; unseen names are looked up once per batch.
+
+Bulk writes bypass ``save()`` and the model signals, so the importer fills
+in ``slug``, ``ip_packed`` and ``mac_value`` itself, and at the end
+reindexes the touched devices for search, bumps the topology version once
+and takes a change-journal checkpoint.
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+from core.stats import recompute_counters
+
+from .addressing import pack_ip, parse_mac
+from .models import Device, Interface, Connection
+from .journal import take_checkpoint
+from .search import index_devices
+from .topology import bump_topology_version
+
+
+IMPORT_BATCH_SIZE = 1000
+# Row errors beyond this many are counted but not kept.
+MAX_REPORTED_ERRORS = 100
+IMPORT_KINDS = ('devices', 'interfaces', 'connections')
+
+DEVICE_FIELDS = (
+    'name', 'description', 'device_type', 'os_type', 'ip_address', 'mac_address',
+    'serial_number', 'location', 'rack_id', 'rack_unit_start', 'rack_unit_height', 'is_active',
+)
+INTERFACE_FIELDS = (
+    'device', 'name', 'interface_type', 'ip_address', 'mac_address', 'vlan_id',
+    'description', 'is_active',
+)
+CONNECTION_FIELDS = (
+    'source_device', 'source_interface', 'destination_device', 'destination_interface',
+    'connection_type', 'description', 'is_active',
+)
+REQUIRED_FIELDS = {
+    'devices': ('name', 'device_type'),
+    'interfaces': ('device', 'name', 'interface_type'),
+    'connections': ('source_device', 'source_interface', 'destination_device', 'destination_interface'),
+}
+TRUE_STRINGS = {'1', 't', 'true', 'y', 'yes'}
+FALSE_STRINGS = {'0', 'f', 'false', 'n', 'no'}
+# Columns that name other rows rather than hold model values.
+REFERENCE_FIELDS = {'device', 'source_device', 'source_interface', 'destination_device', 'destination_interface'}
+
+
+class ImportStats:
+    """Per-kind row counts and timing for one import run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.written = dict.fromkeys(IMPORT_KINDS, 0)
+        self.skipped = dict.fromkeys(IMPORT_KINDS, 0)
+        self.errors = []
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def total(self):
+        return sum(self.written.values())
+
+    def rate(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+
+def read_records(stream, fmt, kind=None):
+    """
+    Yield ``(line_number, kind, record)`` from an open text stream.
+
+    CSV files hold a single ``kind``. JSONL records may carry their own
+    ``"kind"`` key, so one file can mix all three, with ``kind`` as the
+    default for records that do not.
+    """
+    if fmt == 'csv':
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, kind, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, {'_error': f'invalid JSON: {exc}'}
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, {'_error': 'record is not a JSON object'}
+            continue
+        yield line_number, record.pop('kind', kind), record
+
+
+class InventoryImporter:
+    """
+    Upserts streamed inventory records in batches.
+
+    Feed records with ``add()`` and call ``finish()`` once at the end, which
+    returns the run's ``ImportStats``. ``progress`` is called with the stats
+    after every written batch.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = ImportStats()
+        self.device_ids = {}
+        self.device_slugs = {}
+        self.interface_ids = {}
+        # Devices whose search rows need rewriting once everything is written.
+        self.touched_devices = set()
+        # Buffers keyed by (kind, columns): rows in one bulk upsert must
+        # update the same columns, or absent ones would be overwritten.
+        self.buffers = defaultdict(list)
+        self.fields = {
+            'devices': (Device, DEVICE_FIELDS),
+            'interfaces': (Interface, INTERFACE_FIELDS),
+            'connections': (Connection, CONNECTION_FIELDS),
+        }
+
+    def error(self, kind, line_number, message):
+        if kind in self.stats.skipped:
+            self.stats.skipped[kind] += 1
+        if len(self.stats.errors) < MAX_REPORTED_ERRORS:
+            self.stats.errors.append((line_number, message))
+
+    def add(self, line_number, kind, record):
+        if '_error' in record:
+            self.error(kind, line_number, record['_error'])
+            return
+        if kind not in self.fields:
+            self.error(kind, line_number, f'unknown kind {kind!r}')
+            return
+        model, allowed = self.fields[kind]
+        values = {}
+        for field in allowed:
+            if field not in record:
+                continue
+            value = record[field]
+            if isinstance(value, str):
+                value = value.strip()
+            if field in REFERENCE_FIELDS:
+                values[field] = value
+                continue
+            model_field = model._meta.get_field(field)
+            if value in ('', None):
+                value = None if model_field.null else model_field.get_default()
+            elif isinstance(value, str) and model_field.get_internal_type() == 'BooleanField':
+                # Spreadsheet exports spell booleans many ways.
+                lowered = value.lower()
+                value = True if lowered in TRUE_STRINGS else False if lowered in FALSE_STRINGS else value
+            try:
+                values[field] = model_field.to_python(value)
+            except ValidationError as exc:
+                self.error(kind, line_number, f'{field}: {" ".join(exc.messages)}')
+                return
+        missing = [field for field in REQUIRED_FIELDS[kind] if not values.get(field)]
+        if missing:
+            self.error(kind, line_number, f"missing {', '.join(missing)}")
+            return
+
+        buffer = self.buffers[kind, tuple(sorted(values))]
+        buffer.append((line_number, values))
+        if len(buffer) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind):
+        """Write every buffered ``kind`` row, and first any rows it may refer to."""
+        order = IMPORT_KINDS[:IMPORT_KINDS.index(kind) + 1]
+        for pending in order:
+            for key in [key for key in self.buffers if key[0] == pending]:
+                rows = self.buffers.pop(key)
+                skipped = self.stats.skipped[pending]
+                try:
+                    with transaction.atomic():
+                        getattr(self, f'_write_{pending}')(key[1], rows)
+                except IntegrityError as exc:
+                    # The batch is rolled back; report its rows and carry on.
+                    self.stats.skipped[pending] = skipped + len(rows)
+                    if len(self.stats.errors) < MAX_REPORTED_ERRORS:
+                        self.stats.errors.append((
+                            rows[0][0],
+                            f'{pending} batch of {len(rows)} rows (lines {rows[0][0]}-{rows[-1][0]}) rejected: {exc}',
+                        ))
+                if self.progress:
+                    self.progress(self.stats)
+
+    def finish(self):
+        """Write all remaining rows, then ``finalize()`` even if that fails."""
+        try:
+            self.flush(IMPORT_KINDS[-1])
+        finally:
+            self.finalize()
+        return self.stats
+
+    def finalize(self):
+        """
+        Reindex touched devices, invalidate cached topology, checkpoint the
+        journal and recount the dashboard for everything written so far.
+
+        Batches commit one by one, so this must run even when a run stops
+        early; callers that abandon a run call it themselves.
+        """
+        if self.touched_devices:
+            index_devices(sorted(self.touched_devices))
+        if self.stats.total:
+            bump_topology_version()
+            take_checkpoint(bulk=True)
+            recompute_counters()
+
+    def _resolve_devices(self, names):
+        missing = set(names) - self.device_ids.keys()
+        if missing:
+            for device_id, name, slug in Device.objects.filter(name__in=missing).values_list('id', 'name', 'slug'):
+                self.device_ids[name] = device_id
+                self.device_slugs[name] = slug
+
+    def _resolve_interfaces(self, keys):
+        missing = set(keys) - self.interface_ids.keys()
+        if missing:
+            rows = Interface.objects.filter(
+                device__name__in={device for device, _ in missing},
+                name__in={name for _, name in missing},
+            ).values_list('device__name', 'name', 'id')
+            for device, name, interface_id in rows:
+                self.interface_ids[device, name] = interface_id
+
+    def _assign_slugs(self, names):
+        """Give each new device name a unique slug with one query for the whole batch."""
+        new = [name for name in names if name not in self.device_slugs]
+        if not new:
+            return
+        bases = {name: slugify(name) or 'device' for name in new}
+        taken = set(
+            Device.objects.filter(slug__in=set(bases.values())).values_list('slug', flat=True)
+        )
+        for name, base in bases.items():
+            slug = base
+            suffix = 2
+            while slug in taken:
+                slug = f'{base}-{suffix}'
+                suffix += 1
+            if slug != base:
+                # Suffixed slugs are rare; confirm this one is free too.
+                while Device.objects.filter(slug=slug).exists():
+                    slug = f'{base}-{suffix}'
+                    suffix += 1
+            taken.add(slug)
+            self.device_slugs[name] = slug
+
+    def _upsert(self, model, objects, unique_fields, columns):
+        update_fields = [field for field in columns if field not in unique_fields] + ['updated_at']
+        model.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields,
+        )
+
+    def _write_devices(self, columns, rows):
+        # Last occurrence of a name in the batch wins.
+        latest = {values['name']: values for _, values in rows}
+        names = list(latest)
+        self._resolve_devices(names)
+        self._assign_slugs(names)
+        objects = []
+        for name, values in latest.items():
+            device = Device(slug=self.device_slugs[name], **values)
+            device.ip_packed = pack_ip(device.ip_address)
+            device.mac_value = parse_mac(device.mac_address)
+            objects.append(device)
+        update = list(columns)
+        if 'ip_address' in columns:
+            update.append('ip_packed')
+        if 'mac_address' in columns:
+            update.append('mac_value')
+        self._upsert(Device, objects, ['name'], update)
+
+        new = [name for name in names if name not in self.device_ids]
+        for device_id, name in Device.objects.filter(name__in=new).values_list('id', 'name'):
+            self.device_ids[name] = device_id
+        self.touched_devices.update(self.device_ids[name] for name in names)
+        self.stats.written['devices'] += len(objects)
+
+    def _write_interfaces(self, columns, rows):
+        self._resolve_devices(values['device'] for _, values in rows)
+        latest = {}
+        for line_number, values in rows:
+            device_id = self.device_ids.get(values['device'])
+            if device_id is None:
+                self.error('interfaces', line_number, f"unknown device {values['device']!r}")
+                continue
+            latest[values['device'], values['name']] = (device_id, values)
+
+        objects = []
+        for device_id, values in latest.values():
+            fields = {field: value for field, value in values.items() if field != 'device'}
+            interface = Interface(device_id=device_id, **fields)
+            interface.ip_packed = pack_ip(interface.ip_address)
+            interface.mac_value = parse_mac(interface.mac_address)
+            objects.append(interface)
+        update = [field for field in columns if field != 'device']
+        if 'ip_address' in columns:
+            update.append('ip_packed')
+        if 'mac_address' in columns:
+            update.append('mac_value')
+        if objects:
+            self._upsert(Interface, objects, ['device', 'name'], update)
+            self.touched_devices.update(device_id for device_id, _ in latest.values())
+
+        self._resolve_interfaces(latest)
+        self.stats.written['interfaces'] += len(objects)
+
+    def _write_connections(self, columns, rows):
+        endpoints = set()
+        for _, values in rows:
+            endpoints.add((values['source_device'], values['source_interface']))
+            endpoints.add((values['destination_device'], values['destination_interface']))
+        self._resolve_interfaces(endpoints)
+
+        latest = {}
+        for line_number, values in rows:
+            source = self.interface_ids.get((values['source_device'], values['source_interface']))
+            destination = self.interface_ids.get((values['destination_device'], values['destination_interface']))
+            if source is None or destination is None:
+                self.error('connections', line_number, 'unknown source or destination interface')
+                continue
+            fields = {field: value for field, value in values.items() if field not in REFERENCE_FIELDS}
+            latest[source, destination] = fields
+
+        objects = [
+            Connection(source_interface_id=source, destination_interface_id=destination, **fields)
+            for (source, destination), fields in latest.items()
+        ]
+        update = [field for field in columns if field not in REFERENCE_FIELDS]
+        if objects:
+            self._upsert(Connection, objects, ['source_interface', 'destination_interface'], update)
+        self.stats.written['connections'] += len(objects)
@@ -0,0 +1,125 @@
+"""
+Address lookups over Device and Interface IPs.
+
+All queries filter and order on the indexed ``ip_packed`` column (see
+``addressing``), so each one is an index range scan per model; results from
+the two models are merged in address order.
+"""
+import heapq
+import ipaddress
+
+from .addressing import (
+    common_prefix_length,
+    network_bounds,
+    pack_ip,
+    prefix_length,
+)
+from .models import Device, Interface
+
+
+MAX_ADDRESS_RESULTS = 1000
+# Every IPv4 address lives in this block of the packed key space.
+IPV4_MAPPED_NETWORK = ipaddress.ip_network('::ffff:0:0/96')
+ALL_ADDRESSES_NETWORK = ipaddress.ip_network('::/0')
+
+
+def _sources():
+    """Yield ``(kind, queryset, fields)`` for each model that carries addresses."""
+    yield 'device', Device.objects.all(), ('id', 'name', 'slug', 'ip_address', 'ip_packed')
+    yield 'interface', Interface.objects.all(), (
+        'id', 'name', 'device__name', 'device__slug', 'ip_address', 'ip_packed',
+    )
+
+
+def _describe(kind, row):
+    if kind == 'device':
+        return {
+            'kind': kind,
+            'id': row['id'],
+            'name': row['name'],
+            'device': row['slug'],
+            'ip_address': row['ip_address'],
+        }
+    return {
+        'kind': kind,
+        'id': row['id'],
+        'name': f"{row['device__name']} - {row['name']}",
+        'device': row['device__slug'],
+        'ip_address': row['ip_address'],
+    }
+
+
+def addresses_in_range(low, high, limit=MAX_ADDRESS_RESULTS):
+    """
+    Return ``(entries, truncated)`` for every address with ``low <= key <= high``.
+
+    ``low`` and ``high`` are packed keys. Entries are sorted by address, with
+    devices before interfaces on equal addresses.
+    """
+    streams = []
+    for kind, queryset, fields in _sources():
+        rows = (
+            queryset.filter(ip_packed__gte=low, ip_packed__lte=high)
+            .order_by('ip_packed', 'id')
+            .values(*fields)[:limit + 1]
+        )
+        streams.append([(bytes(row['ip_packed']), kind, row) for row in rows])
+    merged = heapq.merge(*streams, key=lambda item: item[0])
+    entries = []
+    for _, kind, row in merged:
+        if len(entries) == limit:
+            return entries, True
+        entries.append(_describe(kind, row))
+    return entries, False
+
+
+def addresses_in_network(network, limit=MAX_ADDRESS_RESULTS):
+    """Return ``(entries, truncated)`` for every address inside ``network`` (CIDR or network object)."""
+    low, high = network_bounds(network)
+    return addresses_in_range(low, high, limit)
+
+
+def addresses_between(start, end, limit=MAX_ADDRESS_RESULTS):
+    """Return ``(entries, truncated)`` for addresses from ``start`` to ``end`` inclusive."""
+    low, high = pack_ip(start), pack_ip(end)
+    if low is None or high is None:
+        raise ValueError('start and end must be IP addresses')
+    if low > high:
+        low, high = high, low
+    return addresses_in_range(low, high, limit)
+
+
+def longest_prefix_match(address):
+    """
+    Return ``(prefix_length, entries)`` for the known addresses closest to ``address``.
+
+    The closest entries are those sharing the longest leading bit prefix with
+    ``address``; in sorted order they are always the immediate predecessor or
+    successor, so two single-row index seeks per model find them, plus one
+    lookup per winning address to collect every row holding it. The search
+    stays within the address family. Returns ``(None, [])`` if nothing is
+    recorded in that family.
+    """
+    key = pack_ip(address)
+    if key is None:
+        raise ValueError('address must be an IP address')
+    family = IPV4_MAPPED_NETWORK if ipaddress.IPv6Address(key) in IPV4_MAPPED_NETWORK else ALL_ADDRESSES_NETWORK
+    low, high = network_bounds(family)
+
+    nearest = set()
+    for _, queryset, _ in _sources():
+        in_family = queryset.filter(ip_packed__gte=low, ip_packed__lte=high)
+        below = in_family.filter(ip_packed__lte=key).order_by('-ip_packed')
+        above = in_family.filter(ip_packed__gt=key).order_by('ip_packed')
+        for neighbours in (below, above):
+            nearest.update(bytes(packed) for packed in neighbours.values_list('ip_packed', flat=True)[:1])
+    if not nearest:
+        return None, []
+
+    shared = {packed: common_prefix_length(key, packed) for packed in nearest}
+    best = max(shared.values())
+    # Several rows can hold the winning address (a device and its interfaces).
+    entries = []
+    for packed in sorted(packed for packed, bits in shared.items() if bits == best):
+        entries.extend(addresses_in_range(packed, packed)[0])
+    return prefix_length(key, best), entries
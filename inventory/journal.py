@@ -0,0 +1,342 @@
+"""
+Append-only change journal for devices, interfaces and connections.
+
+Every save or delete appends a ``ChangeRecord`` carrying only the fields
+that changed, stamped with the time and the topology version it produced.
+Every ``CHECKPOINT_INTERVAL`` records, and after each bulk write (which
+bypasses the signals), a ``TopologyCheckpoint`` stores every tracked row,
+column-wise and zlib-compressed. ``topology_as_of`` rebuilds the graph at
+any moment by replaying the records after the nearest earlier checkpoint,
+so no reconstruction reads more than one checkpoint interval of deltas.
+"""
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ChangeRecord, Connection, Device, Interface, TopologyCheckpoint
+from .topology import get_topology_version, make_edge, make_node, pair_id, unique_edges
+
+
+# Records between checkpoints: a few checkpoints a day at ~50k changes/day,
+# and the most deltas a reconstruction ever replays.
+CHECKPOINT_INTERVAL = 20000
+# Beyond this many records a diff is no cheaper than reloading the topology.
+MAX_DIFF_RECORDS = 5000
+
+# Journaled models and the fields whose history is kept. Derived columns
+# (ip_packed, mac_value) and timestamps are left out.
+TRACKED_FIELDS = {
+    'device': (
+        'name', 'slug', 'description', 'device_type', 'os_type', 'ip_address',
+        'mac_address', 'serial_number', 'location', 'rack_id', 'rack_unit_start',
+        'rack_unit_height', 'is_active',
+    ),
+    'interface': (
+        'device_id', 'name', 'interface_type', 'ip_address', 'mac_address', 'vlan_id',
+        'description', 'is_active',
+    ),
+    'connection': (
+        'source_interface_id', 'destination_interface_id', 'connection_type',
+        'description', 'is_active',
+    ),
+}
+JOURNALED_MODELS = {Device: 'device', Interface: 'interface', Connection: 'connection'}
+
+
+def tracked_values(instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS[JOURNALED_MODELS[type(instance)]]}
+
+
+def _as_json(values):
+    return json.loads(json.dumps(values, cls=DjangoJSONEncoder))
+
+
+def stored_values(instance):
+    """The tracked fields of ``instance`` as currently stored, or ``None`` if it is new."""
+    if instance.pk is None or instance._state.adding:
+        return None
+    fields = TRACKED_FIELDS[JOURNALED_MODELS[type(instance)]]
+    return type(instance)._default_manager.filter(pk=instance.pk).values(*fields).first()
+
+
+def record_change(instance, action, before=None):
+    """
+    Append the journal entry for ``instance``; returns it, or ``None`` if nothing tracked changed.
+
+    ``before`` is the ``stored_values`` read ahead of an update.
+    """
+    model = JOURNALED_MODELS[type(instance)]
+    # Round-trip through JSON so unsaved Python values compare like stored ones.
+    after = _as_json(tracked_values(instance))
+    if action == 'delete':
+        changes, previous = {}, after
+    elif before is None:
+        action, changes, previous = 'create', after, {}
+    else:
+        before = _as_json(before)
+        changes = {field: value for field, value in after.items() if before.get(field) != value}
+        if not changes:
+            return None
+        previous = {field: before.get(field) for field in changes}
+    record = ChangeRecord.objects.create(
+        version=get_topology_version(), model=model, object_id=instance.pk, action=action,
+        changes=changes, previous=previous,
+    )
+    if record.pk % CHECKPOINT_INTERVAL == 0:
+        transaction.on_commit(take_checkpoint)
+    return record
+
+
+def capture_state(device_model=Device, interface_model=Interface, connection_model=Connection):
+    """
+    Return ``{model: {'fields': [...], 'rows': [[id, ...], ...]}}`` for every tracked row.
+
+    Migration 0008 writes its initial checkpoint in this same format.
+    """
+    state = {}
+    for model, model_class in (('device', device_model), ('interface', interface_model),
+                               ('connection', connection_model)):
+        fields = TRACKED_FIELDS[model]
+        rows = model_class._default_manager.order_by('pk').values_list('pk', *fields)
+        state[model] = {'fields': list(fields), 'rows': [list(row) for row in rows]}
+    return state
+
+
+def pack_state(state):
+    return zlib.compress(json.dumps(state, cls=DjangoJSONEncoder, separators=(',', ':')).encode(), 6)
+
+
+def unpack_state(data):
+    """Inverse of ``pack_state``, as ``{model: {id: {field: value}}}``."""
+    state = json.loads(zlib.decompress(bytes(data)))
+    return {
+        model: {row[0]: dict(zip(table['fields'], row[1:])) for row in table['rows']}
+        for model, table in state.items()
+    }
+
+
+def take_checkpoint(bulk=False):
+    """
+    Store a checkpoint of the current state and return it.
+
+    Pass ``bulk=True`` after writes that bypassed the journal.
+    """
+    with transaction.atomic():
+        last = ChangeRecord.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        return TopologyCheckpoint.objects.create(
+            version=get_topology_version(), last_change_id=last, bulk=bulk, state=pack_state(capture_state()),
+        )
+
+
+def state_as_of(at):
+    """
+    Return ``(state, version, checkpoint, replayed)`` for the inventory at time ``at``.
+
+    Raises ``ValueError`` if ``at`` predates the first checkpoint.
+    """
+    checkpoint = TopologyCheckpoint.objects.filter(timestamp__lte=at).order_by('-timestamp', '-pk').first()
+    if checkpoint is None:
+        raise ValueError(f'no journal history before {at.isoformat()}')
+    state = unpack_state(checkpoint.state)
+    version = checkpoint.version
+    records = ChangeRecord.objects.filter(pk__gt=checkpoint.last_change_id, timestamp__lte=at).order_by('pk')
+    replayed = 0
+    for model, object_id, action, changes, version in records.values_list(
+        'model', 'object_id', 'action', 'changes', 'version',
+    ).iterator():
+        rows = state[model]
+        if action == 'delete':
+            rows.pop(object_id, None)
+        else:
+            rows.setdefault(object_id, {}).update(changes)
+        replayed += 1
+    return state, version, checkpoint, replayed
+
+
+def topology_as_of(at):
+    """The network topology (same shape as ``build_network_topology``) as it was at ``at``."""
+    state, version, checkpoint, replayed = state_as_of(at)
+    devices = {
+        device_id: row for device_id, row in state['device'].items() if row.get('is_active')
+    }
+    interface_devices = {
+        interface_id: row.get('device_id') for interface_id, row in state['interface'].items()
+    }
+    edge_rows = []
+    for _, row in sorted(state['connection'].items()):
+        src = interface_devices.get(row.get('source_interface_id'))
+        dst = interface_devices.get(row.get('destination_interface_id'))
+        # As in build_network_topology, any active link is drawn.
+        if row.get('is_active') and src is not None and dst is not None:
+            edge_rows.append((src, dst, row.get('connection_type'), row.get('description')))
+    return {
+        'as_of': at.isoformat(),
+        'version': version,
+        'checkpoint': checkpoint.timestamp.isoformat(),
+        'replayed': replayed,
+        'nodes': [
+            make_node(device_id, row['name'], row['device_type'])
+            for device_id, row in sorted(devices.items(), key=lambda item: item[1]['name'])
+        ],
+        'edges': [
+            make_edge(src_id, dst_id, connection_type, edge_id=pair_id(src_id, dst_id))
+            for src_id, dst_id, connection_type, _ in unique_edges(edge_rows)
+        ],
+    }
+
+
+def _rows(queryset, fields):
+    return {row[0]: dict(zip(fields, row[1:])) for row in queryset.values_list('pk', *fields)}
+
+
+def _undo(rows, records):
+    """Roll ``rows`` (``{id: values or None}``) back past ``records`` (oldest first)."""
+    before = {object_id: dict(values) if values else values for object_id, values in rows.items()}
+    for object_id, action, previous in reversed(records):
+        if action == 'create':
+            before[object_id] = None
+        elif action == 'delete':
+            before[object_id] = dict(previous)
+        else:
+            before[object_id] = dict(before.get(object_id) or {}, **previous)
+    return before
+
+
+def _graph(devices, interfaces, connections, node_ids, pairs):
+    """Nodes for ``node_ids`` and edges for the device ``pairs``, as they are in one state."""
+    nodes = {}
+    for device_id in node_ids:
+        row = devices.get(device_id)
+        if row and row['is_active']:
+            nodes[str(device_id)] = make_node(device_id, row['name'], row['device_type'])
+    edges = {}
+    for connection_id, row in sorted(connections.items()):
+        if not row or not row['is_active']:
+            continue
+        src = (interfaces.get(row['source_interface_id']) or {}).get('device_id')
+        dst = (interfaces.get(row['destination_interface_id']) or {}).get('device_id')
+        key = pair_id(src, dst) if src is not None and dst is not None else None
+        if key in pairs and key not in edges:
+            edges[key] = make_edge(src, dst, row['connection_type'], edge_id=key)
+    return nodes, edges
+
+
+def _compare(before, after):
+    return {
+        'added': [after[key] for key in sorted(after) if key not in before],
+        'removed': sorted(key for key in before if key not in after),
+        'changed': [after[key] for key in sorted(after) if key in before and before[key] != after[key]],
+    }
+
+
+def topology_diff(since):
+    """
+    Return the network topology changes after version ``since``.
+
+    Only the objects named in the journal since then are read, with the
+    links on the devices and interfaces involved, and rolled back through
+    their records' ``previous`` values to compare before and after. Node
+    ids and edge ids (``pair_id``) match ``build_network_topology``, so a
+    client applies ``added``/``changed`` with ``DataSet.update`` and
+    ``removed`` with ``DataSet.remove``.
+
+    ``reset`` is set instead when the journal cannot tell: ``since`` predates
+    it, a bulk write happened since, or more than ``MAX_DIFF_RECORDS`` records
+    would be replayed. The client should then reload the full topology.
+    """
+    version = get_topology_version()
+    result = {'since': since, 'version': version, 'reset': False}
+    if since >= version:
+        empty = {'added': [], 'removed': [], 'changed': []}
+        return dict(result, nodes=empty, edges=empty)
+
+    first = TopologyCheckpoint.objects.order_by('version').values_list('version', flat=True).first()
+    records = list(
+        ChangeRecord.objects.filter(version__gt=since).order_by('pk')
+        .values_list('model', 'object_id', 'action', 'previous')[:MAX_DIFF_RECORDS + 1]
+    )
+    if (first is None or since < first or len(records) > MAX_DIFF_RECORDS
+            or TopologyCheckpoint.objects.filter(bulk=True, version__gt=since).exists()):
+        return dict(result, reset=True)
+
+    history = {'device': [], 'interface': [], 'connection': []}
+    for model, object_id, action, previous in records:
+        history[model].append((object_id, action, previous))
+    touched = {model: {row[0] for row in rows} for model, rows in history.items()}
+
+    # Connections named in the journal or on a touched interface, now and before.
+    connection_fields = ('source_interface_id', 'destination_interface_id', 'connection_type', 'is_active')
+    connections = dict.fromkeys(touched['connection'])
+    connections.update(_rows(
+        Connection.objects.filter(
+            Q(pk__in=touched['connection'])
+            | Q(source_interface_id__in=touched['interface'])
+            | Q(destination_interface_id__in=touched['interface'])
+        ),
+        connection_fields,
+    ))
+    connections_before = _undo(connections, history['connection'])
+    changed_links = set(connections)
+
+    def interface_ids(*states):
+        return {
+            row[field] for state in states for row in state.values() if row
+            for field in ('source_interface_id', 'destination_interface_id')
+        }
+
+    interfaces = dict.fromkeys(touched['interface'])
+    interfaces.update(_rows(
+        Interface.objects.filter(pk__in=touched['interface'] | interface_ids(connections, connections_before)),
+        ('device_id',),
+    ))
+    interfaces_before = _undo(interfaces, history['interface'])
+
+    # Every current link on the devices involved, so each affected device
+    # pair is seen with all of its parallel links.
+    involved = touched['device'] | {
+        row['device_id'] for state in (interfaces, interfaces_before) for row in state.values() if row
+    }
+    links = _rows(
+        Connection.objects.filter(
+            Q(source_interface__device_id__in=involved) | Q(destination_interface__device_id__in=involved)
+        ),
+        connection_fields,
+    )
+    for connection_id, row in links.items():
+        connections.setdefault(connection_id, row)
+        connections_before.setdefault(connection_id, row)
+    missing = interface_ids(connections, connections_before) - set(interfaces)
+    for interface_id, row in _rows(Interface.objects.filter(pk__in=missing), ('device_id',)).items():
+        interfaces[interface_id] = interfaces_before[interface_id] = row
+
+    device_ids = touched['device'] | {
+        row['device_id'] for state in (interfaces, interfaces_before) for row in state.values() if row
+    }
+    devices = dict.fromkeys(touched['device'])
+    devices.update(_rows(Device.objects.filter(pk__in=device_ids), ('name', 'device_type', 'is_active')))
+    devices_before = _undo(devices, history['device'])
+
+    # Pairs whose edge may differ: those of changed links, and every pair on
+    # a changed device.
+    pairs = set()
+    for state, mapping in ((connections, interfaces), (connections_before, interfaces_before)):
+        for connection_id, row in state.items():
+            if not row:
+                continue
+            src = (mapping.get(row['source_interface_id']) or {}).get('device_id')
+            dst = (mapping.get(row['destination_interface_id']) or {}).get('device_id')
+            if src is not None and dst is not None and (
+                connection_id in changed_links or src in touched['device'] or dst in touched['device']
+            ):
+                pairs.add(pair_id(src, dst))
+
+    nodes_before, edges_before = _graph(devices_before, interfaces_before, connections_before, touched['device'], pairs)
+    nodes_after, edges_after = _graph(devices, interfaces, connections, touched['device'], pairs)
+    return dict(
+        result,
+        nodes=_compare(nodes_before, nodes_after),
+        edges=_compare(edges_before, edges_after),
+    )
@@ -0,0 +1,91 @@
+"""
+Server-side graph layout for the topology views.
+
+Coordinates are computed with a vectorized Fruchterman-Reingold simulation so
+the browser can render the graph with physics disabled. NumPy is optional:
+without it ``compute_layout`` returns no positions and Vis.js falls back to
+laying the graph out itself.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+LAYOUT_ITERATIONS = 60
+LAYOUT_MAX_NODES = 5000
+# Rows of the pairwise repulsion matrix computed at once; bounds memory to
+# roughly ``LAYOUT_BLOCK_SIZE * n`` floats instead of ``n * n``.
+LAYOUT_BLOCK_SIZE = 256
+# Average distance between neighbouring nodes in the output, in Vis.js pixels.
+NODE_SPACING = 120
+
+
+def compute_layout(node_ids, edge_pairs, iterations=LAYOUT_ITERATIONS, seed=0):
+    """
+    Return ``{node_id: (x, y)}`` for the graph given by ``node_ids`` and ``edge_pairs``.
+
+    The result is deterministic for a given graph and ``seed``. An empty dict
+    is returned when NumPy is unavailable or the graph has more than
+    ``LAYOUT_MAX_NODES`` nodes.
+    """
+    node_ids = list(node_ids)
+    n = len(node_ids)
+    if np is None or n == 0 or n > LAYOUT_MAX_NODES:
+        return {}
+    if n == 1:
+        return {node_ids[0]: (0.0, 0.0)}
+
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = [
+        (index[src], index[dst]) for src, dst in edge_pairs
+        if src in index and dst in index and src != dst
+    ]
+    src = np.fromiter((p[0] for p in pairs), dtype=np.intp, count=len(pairs))
+    dst = np.fromiter((p[1] for p in pairs), dtype=np.intp, count=len(pairs))
+
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2)) - 0.5
+    k = 1.0 / math.sqrt(n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        disp = np.zeros((n, 2))
+
+        # Repulsion between every pair of nodes: k^2 / d along the separating
+        # vector. Expanding |p_i - p_j|^2 and sum_j w_ij (p_i - p_j) turns both
+        # into matrix products, which keeps the inner loop in BLAS.
+        sq = (pos ** 2).sum(axis=1)
+        for start in range(0, n, LAYOUT_BLOCK_SIZE):
+            block = pos[start:start + LAYOUT_BLOCK_SIZE]
+            dist2 = sq[start:start + LAYOUT_BLOCK_SIZE, None] + sq[None, :] - 2.0 * (block @ pos.T)
+            np.maximum(dist2, 1e-6, out=dist2)
+            weight = np.divide(k * k, dist2, out=dist2)
+            disp[start:start + LAYOUT_BLOCK_SIZE] += block * weight.sum(axis=1)[:, None] - weight @ pos
+
+        # Attraction along edges: d^2 / k.
+        if len(pairs):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt(np.maximum((delta ** 2).sum(axis=1), 1e-12))
+            force = delta * (dist / k)[:, None]
+            np.add.at(disp, src, -force)
+            np.add.at(disp, dst, force)
+
+        # Weak gravity keeps disconnected components from drifting apart.
+        disp -= pos * (k * 0.5)
+
+        length = np.sqrt(np.maximum((disp ** 2).sum(axis=1), 1e-12))
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    extent = np.abs(pos).max() or 1.0
+    pos *= NODE_SPACING * math.sqrt(n) / 2 / extent
+
+    return {
+        node_id: (round(float(x), 1), round(float(y), 1))
+        for node_id, (x, y) in zip(node_ids, pos)
+    }
@@ -0,0 +1,83 @@
+"""
+MAC address lookups over Device and Interface MACs.
+
+Lookups match the indexed ``mac_value`` column (see ``addressing``), so any
+notation finds the same rows. ``lookup_macs`` takes a whole CAM table at
+once and resolves it in chunks: per chunk one query per model plus one per
+connection direction for the peer ports, however many MACs it holds.
+"""
+from .addressing import format_mac, parse_mac
+from .models import Connection, Device, Interface
+
+
+MAX_MAC_LOOKUP = 10000
+MAC_LOOKUP_CHUNK = 500
+
+
+def _peers(interface_ids):
+    """Return ``{interface_id: [peer, ...]}`` for the connections on ``interface_ids``."""
+    peers = {}
+    for local, remote in (('source_interface', 'destination_interface'),
+                          ('destination_interface', 'source_interface')):
+        rows = Connection.objects.filter(**{f'{local}_id__in': interface_ids}).values_list(
+            f'{local}_id', f'{remote}__name', f'{remote}__device__name', f'{remote}__device__slug',
+            'connection_type', 'is_active',
+        )
+        for interface_id, name, device_name, device_slug, connection_type, is_active in rows:
+            peers.setdefault(interface_id, []).append({
+                'device': device_slug,
+                'name': f'{device_name} - {name}',
+                'connection_type': connection_type,
+                'is_active': is_active,
+            })
+    return peers
+
+
+def lookup_macs(macs):
+    """
+    Resolve MAC addresses to their owners.
+
+    Returns ``(results, unknown, invalid)``: ``results`` maps each found MAC
+    (normalized to ``aa:bb:cc:dd:ee:ff``) to its owners, an interface with
+    the ports it is connected to or a device with its own MAC; ``unknown``
+    lists valid MACs nobody owns and ``invalid`` the inputs that are not MACs.
+    """
+    values = {}
+    invalid = []
+    for mac in macs:
+        value = parse_mac(mac)
+        if value is None:
+            invalid.append(mac)
+        else:
+            values.setdefault(value, format_mac(value))
+
+    results = {}
+    keys = list(values)
+    for start in range(0, len(keys), MAC_LOOKUP_CHUNK):
+        chunk = keys[start:start + MAC_LOOKUP_CHUNK]
+        interfaces = list(
+            Interface.objects.filter(mac_value__in=chunk)
+            .order_by('device__name', 'name')
+            .values('id', 'name', 'mac_value', 'device__name', 'device__slug')
+        )
+        peers = _peers([row['id'] for row in interfaces])
+        for row in interfaces:
+            results.setdefault(values[row['mac_value']], []).append({
+                'kind': 'interface',
+                'id': row['id'],
+                'name': f"{row['device__name']} - {row['name']}",
+                'device': row['device__slug'],
+                'peers': peers.get(row['id'], []),
+            })
+        devices = Device.objects.filter(mac_value__in=chunk).order_by('name').values('id', 'name', 'slug', 'mac_value')
+        for row in devices:
+            results.setdefault(values[row['mac_value']], []).append({
+                'kind': 'device',
+                'id': row['id'],
+                'name': row['name'],
+                'device': row['slug'],
+                'peers': [],
+            })
+
+    unknown = [mac for mac in values.values() if mac not in results]
+    return results, unknown, invalid
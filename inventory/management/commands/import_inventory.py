@@ -0,0 +1,73 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import IMPORT_BATCH_SIZE, IMPORT_KINDS, InventoryImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream devices, interfaces and connections from CSV or JSONL and upsert them in batches. '
+        'Devices match on name, interfaces on (device, name), connections on their interfaces.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file, or '-' for stdin")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Input format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--kind', choices=IMPORT_KINDS,
+            help="Record kind; required for CSV, default for JSONL records without a 'kind' key",
+        )
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            suffix = Path(path).suffix.lower()
+            fmt = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(suffix)
+            if fmt is None:
+                raise CommandError('Cannot tell the format from the file name; pass --format.')
+        if fmt == 'csv' and not options['kind']:
+            raise CommandError('--kind is required for CSV input.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        importer = InventoryImporter(batch_size=options['batch_size'], progress=self.report_progress)
+        if path == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(f'Cannot open {path}: {exc}')
+        try:
+            try:
+                for line_number, kind, record in read_records(stream, fmt, options['kind']):
+                    importer.add(line_number, kind, record)
+            except BaseException:
+                # Batches written so far are committed; keep caches, search and journal in step.
+                importer.finalize()
+                raise
+            stats = importer.finish()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line_number, message in stats.errors:
+            self.stderr.write(f'line {line_number}: {message}')
+        for kind in IMPORT_KINDS:
+            if stats.written[kind] or stats.skipped[kind]:
+                self.stdout.write(f'{kind}: {stats.written[kind]} upserted, {stats.skipped[kind]} skipped')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.total} rows in {stats.elapsed:.1f}s ({stats.rate():.0f} rows/s)'
+        ))
+
+    def report_progress(self, stats):
+        if self.verbosity >= 2:
+            self.stdout.write(f'  {stats.total} rows, {stats.rate():.0f} rows/s')
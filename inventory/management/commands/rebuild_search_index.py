@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.search import rebuild_search_index, search_index_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text device search index (needed after QuerySet.update or raw SQL writes).'
+
+    def handle(self, *args, **options):
+        if not search_index_available():
+            self.stdout.write('No search index on this database; search uses icontains lookups.')
+            return
+        started = time.perf_counter()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt in {time.perf_counter() - started:.1f}s'))
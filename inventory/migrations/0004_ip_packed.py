@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:19
+
+import ipaddress
+
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def pack_ip(address):
+    """Frozen copy of ``inventory.addressing.pack_ip`` as of this migration."""
+    if not address:
+        return None
+    try:
+        ip = ipaddress.ip_address(str(address).strip())
+    except ValueError:
+        return None
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b'\x00' * 10 + b'\xff\xff' + ip.packed)
+    return ip.packed
+
+
+def backfill_ip_packed(apps, schema_editor):
+    for model_name in ('Device', 'Interface'):
+        model = apps.get_model('inventory', model_name)
+        rows = model.objects.exclude(ip_address__isnull=True).only('id', 'ip_address')
+        batch = []
+        for obj in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+            obj.ip_packed = pack_ip(obj.ip_address)
+            batch.append(obj)
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                model.objects.bulk_update(batch, ['ip_packed'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['ip_packed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_topologyversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='ip_packed',
+            field=models.BinaryField(blank=True, help_text='ip_address as 16 sortable bytes, kept in sync on save', max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='interface',
+            name='ip_packed',
+            field=models.BinaryField(blank=True, help_text='ip_address as 16 sortable bytes, kept in sync on save', max_length=16, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['ip_packed'], name='inventory_d_ip_pack_da45c8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interface',
+            index=models.Index(fields=['ip_packed'], name='inventory_i_ip_pack_085b29_idx'),
+        ),
+        migrations.RunPython(backfill_ip_packed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+from django.db import OperationalError, migrations
+
+
+# Frozen copies of inventory.search's SQL as of this migration.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_device_search USING fts5("
+    "name, description, location, serial_number, addresses, macs, interfaces, "
+    "prefix='2 3', tokenize=\"unicode61 tokenchars '.:'\")"
+)
+POPULATE_SQL = """
+    INSERT INTO inventory_device_search (rowid, name, description, location, serial_number, addresses, macs, interfaces)
+    SELECT d.id, d.name, COALESCE(d.description, ''), COALESCE(d.location, ''),
+           COALESCE(d.serial_number, ''),
+           TRIM(COALESCE(d.ip_address, '') || ' ' || COALESCE(group_concat(i.ip_address, ' '), '')),
+           TRIM(COALESCE(d.mac_address, '') || ' ' || COALESCE(group_concat(i.mac_address, ' '), '')),
+           COALESCE(group_concat(i.name, ' '), '')
+    FROM inventory_device d
+    LEFT JOIN inventory_interface i ON i.device_id = d.id
+    GROUP BY d.id
+"""
+DROP_SQL = 'DROP TABLE IF EXISTS inventory_device_search'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_SQL)
+        except OperationalError:
+            # No FTS5 in this SQLite build; search falls back to icontains.
+            return
+        cursor.execute('DELETE FROM inventory_device_search')
+        cursor.execute(POPULATE_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_ip_packed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
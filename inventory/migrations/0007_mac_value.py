@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:51
+
+import re
+
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 1000
+MAC_HEX = re.compile(r'[0-9a-f]{12}')
+MAC_SEPARATORS = re.compile(r'[\s:.\-]')
+
+
+def parse_mac(value):
+    """Frozen copy of ``inventory.addressing.parse_mac`` as of this migration."""
+    if not value:
+        return None
+    digits = MAC_SEPARATORS.sub('', str(value).lower())
+    if not MAC_HEX.fullmatch(digits):
+        return None
+    return int(digits, 16)
+
+
+def backfill_mac_value(apps, schema_editor):
+    for model_name in ('Device', 'Interface'):
+        model = apps.get_model('inventory', model_name)
+        rows = model.objects.exclude(mac_address__isnull=True).exclude(mac_address='').only('id', 'mac_address')
+        batch = []
+        for obj in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+            obj.mac_value = parse_mac(obj.mac_address)
+            batch.append(obj)
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                model.objects.bulk_update(batch, ['mac_value'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['mac_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='mac_value',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='mac_address as a 48-bit integer, kept in sync on save', null=True),
+        ),
+        migrations.AddField(
+            model_name='interface',
+            name='mac_value',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='mac_address as a 48-bit integer, kept in sync on save', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['mac_value'], name='inventory_d_mac_val_00fd2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interface',
+            index=models.Index(fields=['mac_value'], name='inventory_i_mac_val_b239da_idx'),
+        ),
+        migrations.RunPython(backfill_mac_value, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import json
+import zlib
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+# Frozen copy of inventory.journal.TRACKED_FIELDS as of this migration; the
+# checkpoint format is the one inventory.journal.unpack_state reads.
+TRACKED_FIELDS = {
+    'device': (
+        'name', 'slug', 'description', 'device_type', 'os_type', 'ip_address',
+        'mac_address', 'serial_number', 'location', 'rack_id', 'rack_unit_start',
+        'rack_unit_height', 'is_active',
+    ),
+    'interface': (
+        'device_id', 'name', 'interface_type', 'ip_address', 'mac_address', 'vlan_id',
+        'description', 'is_active',
+    ),
+    'connection': (
+        'source_interface_id', 'destination_interface_id', 'connection_type',
+        'description', 'is_active',
+    ),
+}
+
+
+def initial_checkpoint(apps, schema_editor):
+    """History starts here: checkpoint the inventory as it stands."""
+    def model(name):
+        return apps.get_model('inventory', name)
+    state = {}
+    for name, fields in TRACKED_FIELDS.items():
+        rows = model(name.capitalize()).objects.order_by('pk').values_list('pk', *fields)
+        state[name] = {'fields': list(fields), 'rows': [list(row) for row in rows]}
+    version = model('TopologyVersion').objects.filter(pk=1).values_list('version', flat=True).first() or 0
+    model('TopologyCheckpoint').objects.create(
+        version=version,
+        state=zlib.compress(json.dumps(state, cls=DjangoJSONEncoder, separators=(',', ':')).encode(), 6),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_mac_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('version', models.PositiveBigIntegerField(help_text='Topology version after this change')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Created'), ('update', 'Updated'), ('delete', 'Deleted')], max_length=10)),
+                ('changes', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TopologyCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('version', models.PositiveBigIntegerField()),
+                ('last_change_id', models.PositiveBigIntegerField(default=0)),
+                ('state', models.BinaryField()),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changerecord',
+            index=models.Index(fields=['timestamp'], name='inventory_c_timesta_acad67_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changerecord',
+            index=models.Index(fields=['version'], name='inventory_c_version_780e3d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changerecord',
+            index=models.Index(fields=['model', 'object_id'], name='inventory_c_model_3633a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topologycheckpoint',
+            index=models.Index(fields=['timestamp'], name='inventory_t_timesta_8366b9_idx'),
+        ),
+        migrations.RunPython(initial_checkpoint, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:56
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_change_journal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changerecord',
+            name='previous',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddField(
+            model_name='topologycheckpoint',
+            name='bulk',
+            field=models.BooleanField(default=False),
+        ),
+    ]
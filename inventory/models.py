@@ -1,7 +1,19 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 
+from .addressing import pack_ip, parse_mac
+
+
+def _also_update(kwargs, field, derived):
+    """Add ``derived`` to a save's ``update_fields`` when ``field`` is among them."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and field in update_fields:
+        kwargs['update_fields'] = {*update_fields, derived}
+
 
 class Device(models.Model):
     """Represents a network device (Server, Switch, Firewall, Printer, etc.)"""
@@ -35,7 +47,11 @@ class Device(models.Model):
     
     # Network details
     ip_address = models.GenericIPAddressField(unique=True, blank=True, null=True)
+    ip_packed = models.BinaryField(max_length=16, blank=True, null=True, editable=False,
+                                   help_text="ip_address as 16 sortable bytes, kept in sync on save")
     mac_address = models.CharField(max_length=17, blank=True, null=True)
+    mac_value = models.BigIntegerField(blank=True, null=True, editable=False,
+                                       help_text="mac_address as a 48-bit integer, kept in sync on save")
     
     # Physical details
     serial_number = models.CharField(max_length=255, blank=True, null=True)
@@ -54,12 +70,39 @@ class Device(models.Model):
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['device_type']),
+            models.Index(fields=['os_type']),
+            models.Index(fields=['location']),
+            models.Index(fields=['rack_id']),
             models.Index(fields=['ip_address']),
+            models.Index(fields=['ip_packed']),
+            models.Index(fields=['mac_value']),
         ]
     
+    def clean(self):
+        """Reject rack placements that overlap another device in the same rack."""
+        super().clean()
+        if not (self.rack_id and self.rack_unit_start and self.rack_unit_height):
+            return
+        end = self.rack_unit_start + self.rack_unit_height - 1
+        clashes = (
+            Device.objects.filter(rack_id=self.rack_id, rack_unit_start__lte=end)
+            .exclude(pk=self.pk)
+            .values_list('name', 'rack_unit_start', 'rack_unit_height')
+        )
+        for name, start, height in clashes:
+            if start + height - 1 >= self.rack_unit_start:
+                raise ValidationError({
+                    'rack_unit_start': f"U{self.rack_unit_start}-U{end} overlaps {name} "
+                                       f"(U{start}-U{start + height - 1}) in {self.rack_id}."
+                })
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.ip_packed = pack_ip(self.ip_address)
+        self.mac_value = parse_mac(self.mac_address)
+        _also_update(kwargs, 'ip_address', 'ip_packed')
+        _also_update(kwargs, 'mac_address', 'mac_value')
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -88,7 +131,11 @@ class Interface(models.Model):
     
     # Network settings
     ip_address = models.GenericIPAddressField(blank=True, null=True)
+    ip_packed = models.BinaryField(max_length=16, blank=True, null=True, editable=False,
+                                   help_text="ip_address as 16 sortable bytes, kept in sync on save")
     mac_address = models.CharField(max_length=17, blank=True, null=True)
+    mac_value = models.BigIntegerField(blank=True, null=True, editable=False,
+                                       help_text="mac_address as a 48-bit integer, kept in sync on save")
     vlan_id = models.PositiveIntegerField(blank=True, null=True)
     
     description = models.CharField(max_length=255, blank=True, null=True)
@@ -103,8 +150,17 @@ class Interface(models.Model):
         indexes = [
             models.Index(fields=['device']),
             models.Index(fields=['ip_address']),
+            models.Index(fields=['ip_packed']),
+            models.Index(fields=['mac_value']),
         ]
     
+    def save(self, *args, **kwargs):
+        self.ip_packed = pack_ip(self.ip_address)
+        self.mac_value = parse_mac(self.mac_address)
+        _also_update(kwargs, 'ip_address', 'ip_packed')
+        _also_update(kwargs, 'mac_address', 'mac_value')
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.device.name} - {self.name}"
 
@@ -112,6 +168,13 @@ class Interface(models.Model):
 class Connection(models.Model):
     """Represents a connection between two interfaces"""
     
+    CONNECTION_TYPES = [
+        ('physical', 'Physical Cable'),
+        ('logical', 'Logical Link'),
+        ('vlan', 'VLAN Trunk'),
+        ('wireless', 'Wireless'),
+    ]
+    
     source_interface = models.ForeignKey(
         Interface,
         on_delete=models.CASCADE,
@@ -125,12 +188,7 @@ class Connection(models.Model):
     
     connection_type = models.CharField(
         max_length=50,
-        choices=[
-            ('physical', 'Physical Cable'),
-            ('logical', 'Logical Link'),
-            ('vlan', 'VLAN Trunk'),
-            ('wireless', 'Wireless'),
-        ],
+        choices=CONNECTION_TYPES,
         default='physical'
     )
     
@@ -150,3 +208,78 @@ class Connection(models.Model):
     
     def __str__(self):
         return f"{self.source_interface} → {self.destination_interface}"
+
+
+class TopologyVersion(models.Model):
+    """
+    Single-row counter bumped on every Device, Interface or Connection change.
+    
+    Cached topology snapshots and ETags are keyed on this value, so it only
+    ever grows and survives cache flushes.
+    """
+    
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Topology v{self.version}"
+
+
+class ChangeRecord(models.Model):
+    """
+    One entry of the append-only change journal (see ``inventory.journal``).
+    
+    Creates store every tracked field in ``changes``; updates store the new
+    values of the fields that changed there and their old values in
+    ``previous``; deletes store the last values in ``previous``.
+    """
+    
+    ACTIONS = [
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    ]
+    
+    timestamp = models.DateTimeField(default=timezone.now)
+    version = models.PositiveBigIntegerField(help_text="Topology version after this change")
+    model = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    changes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    previous = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['version']),
+            models.Index(fields=['model', 'object_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_action_display()} {self.model} #{self.object_id} (v{self.version})"
+
+
+class TopologyCheckpoint(models.Model):
+    """
+    Full copy of every journaled row, the starting point for replaying deltas.
+    
+    ``state`` is zlib-compressed JSON; ``last_change_id`` is the newest
+    ChangeRecord already contained in it. ``bulk`` checkpoints follow writes
+    that bypassed the journal, so deltas cannot be replayed across them.
+    """
+    
+    timestamp = models.DateTimeField(default=timezone.now)
+    version = models.PositiveBigIntegerField()
+    last_change_id = models.PositiveBigIntegerField(default=0)
+    bulk = models.BooleanField(default=False)
+    state = models.BinaryField()
+    
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp']),
+        ]
+    
+    def __str__(self):
+        return f"Checkpoint v{self.version} at {self.timestamp:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,168 @@
+"""
+Keyset (cursor) pagination over ``(name, id)``.
+
+A page is fetched with an index seek past the previous page's last key
+instead of an OFFSET, so page 5000 costs the same as page 1. Cursors are
+opaque tokens carrying the boundary key, the direction and the page number
+they lead to. The navigator shows a small window of neighbouring pages
+whose cursors come from one key-only query in each direction; the total,
+needed only for the "Last" link, is cached per topology version.
+"""
+import base64
+import json
+import math
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .topology import SNAPSHOT_TIMEOUT, get_topology_version
+
+
+PAGE_WINDOW = 2
+COUNT_CACHE_KEY = 'inventory:devices:count:{digest}:v{version}'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, key, page):
+    raw = json.dumps([direction, key, page], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(direction, key, page)``; raises ``InvalidCursor`` on anything malformed."""
+    if token == 'last':
+        return 'last', None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, key, page = json.loads(raw)
+        name, pk = key
+        if direction not in ('after', 'before') or not isinstance(pk, int) or not isinstance(page, int):
+            raise ValueError
+        return direction, (str(name), pk), max(page, 1)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+
+def _after(key):
+    name, pk = key
+    return Q(name__gt=name) | Q(name=name, pk__gt=pk)
+
+
+def _before(key):
+    name, pk = key
+    return Q(name__lt=name) | Q(name=name, pk__lt=pk)
+
+
+class KeysetPage:
+    """One page of results plus the links of a windowed page navigator."""
+
+    def __init__(self, object_list, number, num_pages, links):
+        self.object_list = object_list
+        self.number = number
+        self.num_pages = num_pages
+        self.first = links.get('first')
+        self.previous = links.get('previous')
+        self.next = links.get('next')
+        self.last = links.get('last')
+        self.window = links.get('window', [])
+
+    @property
+    def has_other_pages(self):
+        return bool(self.previous or self.next)
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``(name, id)``.
+
+    ``url_for(token)`` turns a cursor token (or ``None`` for page 1) into
+    the link for that page, so callers keep their other query parameters.
+    """
+
+    def __init__(self, queryset, per_page, url_for, count_key=''):
+        self.queryset = queryset.order_by('name', 'pk')
+        self.per_page = per_page
+        self.url_for = url_for
+        self.count_key = count_key
+
+    def count(self):
+        key = COUNT_CACHE_KEY.format(digest=self.count_key, version=get_topology_version())
+        total = cache.get(key)
+        if total is None:
+            total = self.queryset.order_by().count()
+            cache.set(key, total, SNAPSHOT_TIMEOUT)
+        return total
+
+    def page(self, token=None):
+        """Return the ``KeysetPage`` for ``token``; raises ``InvalidCursor`` for a bad token."""
+        direction, key, number = decode_cursor(token) if token else ('first', None, 1)
+        size = self.per_page
+        num_pages = None
+
+        if direction == 'first':
+            rows = list(self.queryset[:size])
+        elif direction == 'after':
+            rows = list(self.queryset.filter(_after(key))[:size])
+        elif direction == 'before':
+            rows = list(self.queryset.filter(_before(key)).order_by('-name', '-pk')[:size])
+            rows.reverse()
+        else:
+            # Keep the last page aligned with pages counted from the start.
+            total = self.count()
+            num_pages = max(1, math.ceil(total / size))
+            number = num_pages
+            remainder = total - (num_pages - 1) * size
+            rows = list(self.queryset.order_by('-name', '-pk')[:remainder or size])
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, 1, num_pages, {})
+        links = self._links(rows, number, num_pages)
+        return KeysetPage(rows, number, num_pages, links)
+
+    def _keys(self, queryset):
+        return list(queryset.values_list('name', 'pk')[:self.per_page * PAGE_WINDOW])
+
+    def _links(self, rows, number, num_pages):
+        size = self.per_page
+        first_key = (rows[0].name, rows[0].pk)
+        last_key = (rows[-1].name, rows[-1].pk)
+        behind = self._keys(self.queryset.filter(_before(first_key)).order_by('-name', '-pk'))
+        ahead = self._keys(self.queryset.filter(_after(last_key)))
+
+        # Pages before this one, nearest first; page -j holds the rows just
+        # before the first row of page -(j-1).
+        earlier = []
+        for j in range(1, PAGE_WINDOW + 1):
+            if len(behind) <= size * (j - 1) or number - j < 1:
+                break
+            if number - j == 1:
+                earlier.append((1, None))
+                break
+            boundary = first_key if j == 1 else behind[size * (j - 1) - 1]
+            earlier.append((number - j, encode_cursor('before', list(boundary), number - j)))
+        later = []
+        for j in range(1, PAGE_WINDOW + 1):
+            if len(ahead) <= size * (j - 1):
+                break
+            boundary = last_key if j == 1 else ahead[size * (j - 1) - 1]
+            later.append((number + j, encode_cursor('after', list(boundary), number + j)))
+
+        window = [
+            {'number': page, 'url': self.url_for(token), 'current': False}
+            for page, token in reversed(earlier)
+        ]
+        window.append({'number': number, 'url': None, 'current': True})
+        window.extend({'number': page, 'url': self.url_for(token), 'current': False} for page, token in later)
+
+        links = {'window': window}
+        if earlier:
+            links['first'] = self.url_for(None)
+            links['previous'] = window[len(earlier) - 1]['url']
+        if later:
+            links['next'] = window[len(earlier) + 1]['url']
+            links['last'] = self.url_for('last')
+        return links
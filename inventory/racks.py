@@ -0,0 +1,207 @@
+"""
+Rack elevation engine built on Device.rack_id / rack_unit_start / rack_unit_height.
+
+All racked devices are read in one ordered query and grouped into ``Rack``
+objects in a single pass. Each rack keeps its devices sorted by starting U,
+which doubles as an interval index: overlap detection is a sweep over that
+order, and point lookups are a bisect. The whole index is cached per
+topology version, which every Device save already bumps.
+"""
+import heapq
+from bisect import bisect_right
+from collections import Counter
+from itertools import groupby
+
+from django.core.cache import cache
+
+from .models import Device
+from .topology import SNAPSHOT_TIMEOUT, get_topology_version
+
+
+DEFAULT_RACK_UNITS = 42
+RACKS_CACHE_KEY = 'inventory:racks:v{version}'
+
+
+class RackDevice:
+    """A device mounted in a rack, occupying units ``start`` through ``end``."""
+
+    def __init__(self, device_id, name, slug, device_type, start, height):
+        self.id = device_id
+        self.name = name
+        self.slug = slug
+        self.device_type = device_type
+        self.start = start
+        self.height = height
+        self.end = start + height - 1
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+            'device_type': self.device_type,
+            'start': self.start,
+            'height': self.height,
+        }
+
+
+class Rack:
+    """Occupancy of one rack, with derived free space, conflicts and elevation rows."""
+
+    def __init__(self, rack_id, location, devices, unplaced=()):
+        self.rack_id = rack_id
+        self.location = location
+        self.devices = sorted(devices, key=lambda d: (d.start, d.end))
+        self.unplaced = list(unplaced)
+        self.units = max([DEFAULT_RACK_UNITS] + [d.end for d in self.devices])
+        self._starts = [d.start for d in self.devices]
+        # Highest unit reached by any device up to each position in start order.
+        self._reach = []
+        for device in self.devices:
+            self._reach.append(max(device.end, self._reach[-1] if self._reach else 0))
+        self.conflicts = self._find_overlaps()
+        self.used_units = self._count_used_units()
+        self.free_runs = self._find_free_runs()
+        self.max_free_run = max((length for _, length in self.free_runs), default=0)
+
+    def _find_overlaps(self):
+        """
+        Return every pair of devices whose U ranges intersect.
+
+        Sweeps devices in start order while a min-heap holds the ranges still
+        open; anything left in the heap when a device starts overlaps it.
+        """
+        overlaps = []
+        active = []
+        for index, device in enumerate(self.devices):
+            while active and active[0][0] < device.start:
+                heapq.heappop(active)
+            for _, other_index in active:
+                overlaps.append((self.devices[other_index], device))
+            heapq.heappush(active, (device.end, index))
+        return overlaps
+
+    def _count_used_units(self):
+        used = 0
+        covered_to = 0
+        for device in self.devices:
+            if device.end > covered_to:
+                used += device.end - max(device.start, covered_to + 1) + 1
+                covered_to = device.end
+        return used
+
+    def _find_free_runs(self):
+        """Return ``(first_unit, length)`` for each contiguous block of empty units."""
+        runs = []
+        next_free = 1
+        for device in self.devices:
+            if device.start > next_free:
+                runs.append((next_free, device.start - next_free))
+            next_free = max(next_free, device.end + 1)
+        if next_free <= self.units:
+            runs.append((next_free, self.units - next_free + 1))
+        return runs
+
+    def device_at(self, unit):
+        """Return the device occupying ``unit``, or ``None``."""
+        # Candidates start at or below ``unit``; walk back only while some
+        # earlier device still reaches this high.
+        for index in range(bisect_right(self._starts, unit) - 1, -1, -1):
+            if self._reach[index] < unit:
+                break
+            if self.devices[index].end >= unit:
+                return self.devices[index]
+        return None
+
+    def has_space(self, units):
+        return self.max_free_run >= units
+
+    def elevation(self):
+        """
+        Return one row per unit, from the top of the rack down.
+
+        Each row is ``{'unit': u, 'device': RackDevice or None, 'rowspan': n,
+        'covered': bool}``. A device appears on its top row with ``rowspan``
+        set to its height; the rows beneath it are ``covered``. Overlapping
+        devices are drawn once, at the first one found.
+        """
+        rows = []
+        unit = self.units
+        while unit >= 1:
+            device = self.device_at(unit)
+            if device is None:
+                rows.append({'unit': unit, 'device': None, 'rowspan': 1, 'covered': False})
+                unit -= 1
+                continue
+            bottom = max(device.start, 1)
+            rows.append({'unit': unit, 'device': device, 'rowspan': unit - bottom + 1, 'covered': False})
+            for covered in range(unit - 1, bottom - 1, -1):
+                rows.append({'unit': covered, 'device': None, 'rowspan': 1, 'covered': True})
+            unit = bottom - 1
+        return rows
+
+    def as_dict(self):
+        return {
+            'rack_id': self.rack_id,
+            'location': self.location,
+            'units': self.units,
+            'used_units': self.used_units,
+            'utilization': round(self.used_units / self.units, 3),
+            'max_free_run': self.max_free_run,
+            'free_runs': [{'start': start, 'length': length} for start, length in self.free_runs],
+            'devices': [d.as_dict() for d in self.devices],
+            'unplaced': [d.as_dict() for d in self.unplaced],
+            'conflicts': [[a.slug, b.slug] for a, b in self.conflicts],
+        }
+
+
+def build_racks():
+    """Build ``{rack_id: Rack}`` for every rack in a single query."""
+    rows = (
+        Device.objects.exclude(rack_id__isnull=True).exclude(rack_id='')
+        .order_by('rack_id', 'rack_unit_start')
+        .values_list(
+            'rack_id', 'location', 'id', 'name', 'slug', 'device_type',
+            'rack_unit_start', 'rack_unit_height',
+        )
+    )
+    racks = {}
+    for rack_id, group in groupby(rows, key=lambda row: row[0]):
+        locations = Counter()
+        placed = []
+        unplaced = []
+        for _, location, device_id, name, slug, device_type, start, height in group:
+            if location:
+                locations[location] += 1
+            device = RackDevice(device_id, name, slug, device_type, start or 0, height or 1)
+            (placed if start else unplaced).append(device)
+        location = locations.most_common(1)[0][0] if locations else None
+        racks[rack_id] = Rack(rack_id, location, placed, unplaced)
+    return racks
+
+
+def get_racks():
+    """Return the rack index for the current topology version."""
+    key = RACKS_CACHE_KEY.format(version=get_topology_version())
+    racks = cache.get(key)
+    if racks is None:
+        racks = build_racks()
+        cache.set(key, racks, SNAPSHOT_TIMEOUT)
+    return racks
+
+
+def find_rack_space(units, location=None):
+    """Return racks (optionally in ``location``) that have ``units`` contiguous free U."""
+    return [
+        rack for rack in get_racks().values()
+        if rack.has_space(units) and (location is None or rack.location == location)
+    ]
+
+
+def rack_conflicts():
+    """Return ``(rack, device_a, device_b)`` for every overlapping placement across all racks."""
+    return [
+        (rack, a, b)
+        for rack in get_racks().values()
+        for a, b in rack.conflicts
+    ]
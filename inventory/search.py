@@ -0,0 +1,175 @@
+"""
+Full-text device search.
+
+On SQLite an FTS5 table holds one row per device (``rowid`` = device id)
+with its name, description, location and serial, plus every IP, MAC and
+interface name on the device. Rows are refreshed from model signals, and
+bulk writers call ``index_devices`` themselves. Queries are ranked with
+BM25 and name matches weigh most.
+
+Other databases have no index table; ``search_devices`` falls back to
+``icontains`` lookups there.
+"""
+import re
+
+from django.db import OperationalError, connection
+from django.db.models import Q
+
+from .models import Device
+
+
+SEARCH_TABLE = 'inventory_device_search'
+# (column, BM25 weight)
+SEARCH_COLUMNS = (
+    ('name', 10.0),
+    ('description', 1.0),
+    ('location', 2.0),
+    ('serial_number', 5.0),
+    ('addresses', 5.0),
+    ('macs', 5.0),
+    ('interfaces', 1.0),
+)
+MAX_SEARCH_RESULTS = 100
+MAX_SEARCH_TERMS = 8
+INDEX_BATCH_SIZE = 500
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    + ', '.join(column for column, _ in SEARCH_COLUMNS)
+    # Dots and colons stay inside tokens so an IP or MAC is one token and
+    # "10.20." is a plain prefix lookup; prefix indexes speed up short ones.
+    + ", prefix='2 3', tokenize=\"unicode61 tokenchars '.:'\")"
+)
+DROP_SQL = f'DROP TABLE IF EXISTS {SEARCH_TABLE}'
+
+# One row per device, with its interfaces' values aggregated.
+POPULATE_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(column for column, _ in SEARCH_COLUMNS)})
+    SELECT d.id, d.name, COALESCE(d.description, ''), COALESCE(d.location, ''),
+           COALESCE(d.serial_number, ''),
+           TRIM(COALESCE(d.ip_address, '') || ' ' || COALESCE(group_concat(i.ip_address, ' '), '')),
+           TRIM(COALESCE(d.mac_address, '') || ' ' || COALESCE(group_concat(i.mac_address, ' '), '')),
+           COALESCE(group_concat(i.name, ' '), '')
+    FROM inventory_device d
+    LEFT JOIN inventory_interface i ON i.device_id = d.id
+    {{where}}
+    GROUP BY d.id
+"""
+
+_index_available = None
+
+
+def create_search_index(cursor):
+    """Create and fill the FTS5 table; returns ``False`` if SQLite lacks FTS5."""
+    try:
+        cursor.execute(CREATE_SQL)
+    except OperationalError:
+        return False
+    cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    cursor.execute(POPULATE_SQL.format(where=''))
+    return True
+
+
+def search_index_available():
+    """Whether this database has the FTS5 table (checked once per process)."""
+    global _index_available
+    if _index_available is None:
+        _index_available = connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+    return _index_available
+
+
+def index_devices(device_ids):
+    """Rewrite the index rows of ``device_ids``; missing devices are dropped from the index."""
+    if not search_index_available():
+        return
+    device_ids = list(device_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(device_ids), INDEX_BATCH_SIZE):
+            batch = device_ids[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(POPULATE_SQL.format(where=f'WHERE d.id IN ({placeholders})'), batch)
+
+
+def rebuild_search_index():
+    """Rebuild the whole index from scratch."""
+    if not search_index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(POPULATE_SQL.format(where=''))
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query, or ``''`` if it has no searchable terms.
+
+    Each whitespace-separated term becomes a phrase of its tokens with a
+    prefix match on the last one, so ``10.20.`` matches every address in
+    10.20/16, ``gi1/0`` matches ``Gi1/0/24`` and ``core-sw`` matches
+    ``Core-Switch-01``. All terms must match.
+    """
+    phrases = []
+    for term in text.split()[:MAX_SEARCH_TERMS]:
+        # Same token rule as the index: word characters, dots and colons.
+        tokens = re.findall(r'[\w.:]+', term.lower())
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"*')
+    return ' '.join(phrases)
+
+
+def _describe(device_id, name, slug, device_type, location, ip_address, score=None):
+    return {
+        'id': device_id,
+        'name': name,
+        'slug': slug,
+        'device_type': device_type,
+        'location': location,
+        'ip_address': ip_address,
+        'score': None if score is None else round(-score, 3),
+    }
+
+
+def search_devices(text, limit=20):
+    """Return up to ``limit`` matching devices, best first, as dicts."""
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    if search_index_available():
+        match = build_match_query(text)
+        if not match:
+            return []
+        weights = ', '.join(str(weight) for _, weight in SEARCH_COLUMNS)
+        with connection.cursor() as cursor:
+            # Pick the best ``limit`` hits inside the index before joining,
+            # so a broad term ("eth0") that matches every device only joins
+            # the rows it returns; ORDER BY ... LIMIT keeps just the top
+            # ``limit`` scores while SQLite scans the matches.
+            cursor.execute(
+                f"""
+                SELECT d.id, d.name, d.slug, d.device_type, d.location, d.ip_address, hits.score
+                FROM (
+                    SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS score
+                    FROM {SEARCH_TABLE}
+                    WHERE {SEARCH_TABLE} MATCH %s
+                    ORDER BY score
+                    LIMIT %s
+                ) AS hits
+                JOIN inventory_device d ON d.id = hits.rowid
+                ORDER BY hits.score
+                """,
+                [match, limit],
+            )
+            return [_describe(*row) for row in cursor.fetchall()]
+
+    terms = text.split()[:MAX_SEARCH_TERMS]
+    if not terms:
+        return []
+    queryset = Device.objects.all()
+    for term in terms:
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term)
+            | Q(serial_number__icontains=term) | Q(ip_address__icontains=term)
+            | Q(mac_address__icontains=term) | Q(interfaces__name__icontains=term)
+            | Q(interfaces__ip_address__icontains=term) | Q(interfaces__mac_address__icontains=term)
+        )
+    rows = queryset.distinct().values_list('id', 'name', 'slug', 'device_type', 'location', 'ip_address')[:limit]
+    return [_describe(*row) for row in rows]
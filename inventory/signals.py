@@ -0,0 +1,77 @@
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from blog.models import Article, ArticleEmbed
+from visualization.models import Diagram
+
+from .dossier import bump_dossier_generation
+from .journal import record_change, stored_values
+from .models import Device, Interface, Connection
+from .search import index_devices
+from .topology import bump_topology_version
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=Interface)
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Device)
+@receiver(post_delete, sender=Interface)
+@receiver(post_delete, sender=Connection)
+def topology_changed(sender, **kwargs):
+    """
+    Invalidate cached topology snapshots whenever the graph may have changed.
+    
+    Bulk operations (``bulk_create``, ``QuerySet.update``) do not send these
+    signals and must call ``bump_topology_version``, ``index_devices``,
+    ``journal.take_checkpoint`` and ``core.stats.recompute_counters``
+    themselves.
+    """
+    bump_topology_version()
+
+
+@receiver(pre_save, sender=Device)
+@receiver(pre_save, sender=Interface)
+@receiver(pre_save, sender=Connection)
+def journal_before_save(sender, instance, **kwargs):
+    """Read the stored row so the journal can record only what changed."""
+    instance._journal_before = stored_values(instance)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=Interface)
+@receiver(post_save, sender=Connection)
+def journal_saved(sender, instance, created, **kwargs):
+    record_change(instance, 'create' if created else 'update', getattr(instance, '_journal_before', None))
+
+
+@receiver(post_delete, sender=Device)
+@receiver(post_delete, sender=Interface)
+@receiver(post_delete, sender=Connection)
+def journal_deleted(sender, instance, **kwargs):
+    record_change(instance, 'delete')
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def device_search_changed(sender, instance, **kwargs):
+    """Keep the device's full-text search row in step with it."""
+    index_devices([instance.pk])
+
+
+@receiver(post_save, sender=Interface)
+@receiver(post_delete, sender=Interface)
+def interface_search_changed(sender, instance, **kwargs):
+    """Interface names, IPs and MACs are searchable on their device."""
+    index_devices([instance.device_id])
+
+
+@receiver(post_save, sender=Diagram)
+@receiver(post_delete, sender=Diagram)
+@receiver(m2m_changed, sender=Diagram.devices.through)
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=ArticleEmbed)
+@receiver(post_delete, sender=ArticleEmbed)
+def dossier_changed(sender, **kwargs):
+    """Device dossiers list diagrams and articles, which the topology version does not cover."""
+    bump_dossier_generation()
@@ -1,5 +1,47 @@
-from django.test import TestCase
-from .models import Device, Interface, Connection
+import asyncio
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from unittest import mock, skipIf
+
+from django.db import OperationalError, connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Article, ArticleEmbed
+from core.stats import get_dashboard_counters
+from visualization.models import Diagram
+
+from .addressing import format_mac, pack_ip, parse_mac, unpack_ip
+from .analysis import betweenness_centrality, cut_structure, failure_impact, separating_pairs
+from .clusters import build_clustered_topology, cluster_id
+from .dossier import load_dossier
+from .events import ChangeBroadcaster, coalesce, event_stream, format_event, read_window
+from .facets import facet_counts, filter_devices
+from .graph import TopologyIndex
+from .ipam import addresses_between, addresses_in_network, longest_prefix_match
+from .journal import take_checkpoint, topology_as_of, topology_diff
+from .layout import compute_layout, np
+from .macs import MAC_LOOKUP_CHUNK, lookup_macs
+from .models import ChangeRecord, Device, Interface, Connection, TopologyCheckpoint
+from .racks import build_racks, find_rack_space, rack_conflicts
+from .search import build_match_query, search_devices
+from .topology import (
+    build_device_topology,
+    build_network_topology,
+    get_topology_version,
+    stream_network_topology,
+    topology_etag,
+)
 
 
 class DeviceModelTest(TestCase):
@@ -63,3 +105,1187 @@ class ConnectionModelTest(TestCase):
     def test_connection_creation(self):
         self.assertEqual(self.connection.source_interface, self.iface1)
         self.assertEqual(self.connection.destination_interface, self.iface2)
+
+
+def build_chain(count, prefix='Node'):
+    """Create ``count`` devices wired in a line, one connection per hop."""
+    devices = []
+    interfaces = []
+    for i in range(count):
+        device = Device.objects.create(name=f'{prefix}-{i:03d}', device_type='switch')
+        devices.append(device)
+        interfaces.append((
+            Interface.objects.create(device=device, name='up', interface_type='ethernet'),
+            Interface.objects.create(device=device, name='down', interface_type='ethernet'),
+        ))
+    for i in range(count - 1):
+        Connection.objects.create(
+            source_interface=interfaces[i][1],
+            destination_interface=interfaces[i + 1][0],
+        )
+    return devices
+
+
+class TopologyBuilderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_network_topology_query_count_is_flat(self):
+        # Devices, edges, and the topology version keying the layout cache.
+        build_chain(3, prefix='Small')
+        with self.assertNumQueries(3):
+            small = build_network_topology()
+        build_chain(30, prefix='Large')
+        with self.assertNumQueries(3):
+            large = build_network_topology()
+        self.assertEqual(len(small['nodes']), 3)
+        self.assertEqual(len(small['edges']), 2)
+        self.assertEqual(len(large['nodes']), 33)
+        self.assertEqual(len(large['edges']), 31)
+
+    def test_device_topology_query_count_is_flat(self):
+        devices = build_chain(3)
+        with self.assertNumQueries(3):
+            data = build_device_topology(devices[1])
+        self.assertEqual(len(data['nodes']), 3)
+        self.assertEqual(len(data['edges']), 2)
+
+        hub = devices[0]
+        for i in range(20):
+            leaf = Device.objects.create(name=f'Leaf-{i:03d}', device_type='server')
+            Connection.objects.create(
+                source_interface=Interface.objects.create(
+                    device=hub, name=f'port{i}', interface_type='ethernet'
+                ),
+                destination_interface=Interface.objects.create(
+                    device=leaf, name='eth0', interface_type='ethernet'
+                ),
+            )
+        with self.assertNumQueries(3):
+            data = build_device_topology(hub)
+        self.assertEqual(len(data['nodes']), 22)
+
+    def test_device_topology_depth(self):
+        devices = build_chain(6)
+        # One query per hop, one for the outer ring, one for the devices.
+        with self.assertNumQueries(5):
+            data = build_device_topology(devices[0], depth=3)
+        levels = {node['label']: node['level'] for node in data['nodes']}
+        self.assertEqual(levels, {'Node-000': 0, 'Node-001': 1, 'Node-002': 2, 'Node-003': 3})
+        self.assertEqual(len(data['edges']), 3)
+        self.assertFalse(data['truncated'])
+
+    def test_device_topology_node_cap_and_types(self):
+        devices = build_chain(6)
+        data = build_device_topology(devices[0], depth=5, max_nodes=3)
+        self.assertEqual(len(data['nodes']), 3)
+        self.assertTrue(data['truncated'])
+
+        Connection.objects.filter(source_interface__device=devices[1]).update(connection_type='vlan')
+        data = build_device_topology(devices[0], depth=5, types=['physical'])
+        self.assertEqual(len(data['nodes']), 2)
+
+    def test_device_topology_endpoint_parameters(self):
+        devices = build_chain(4)
+        url = reverse('inventory:device-topology-json', kwargs={'slug': devices[0].slug})
+        self.assertEqual(len(self.client.get(url, {'depth': 2}).json()['nodes']), 3)
+        self.assertEqual(self.client.get(url, {'depth': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'depth': 99}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'types': 'bogus'}).status_code, 400)
+
+    def test_parallel_links_collapse_into_one_edge(self):
+        a, b = build_chain(2)
+        Connection.objects.create(
+            source_interface=b.interfaces.get(name='down'),
+            destination_interface=a.interfaces.get(name='up'),
+            connection_type='logical',
+        )
+        data = build_network_topology()
+        self.assertEqual(len(data['edges']), 1)
+        self.assertEqual(data['edges'][0]['label'], 'physical')
+
+    def test_streamed_topology_matches_built_topology(self):
+        devices = build_chain(7)
+        Connection.objects.create(
+            source_interface=devices[1].interfaces.get(name='up'),
+            destination_interface=devices[0].interfaces.get(name='down'),
+            connection_type='logical',
+        )
+        built = build_network_topology()
+        streamed = json.loads(''.join(stream_network_topology(chunk_size=2)))
+        self.assertEqual(streamed['nodes'], built['nodes'])
+        key = lambda edge: (edge['from'], edge['to'])
+        self.assertEqual(sorted(streamed['edges'], key=key), sorted(built['edges'], key=key))
+
+    def test_streamed_topology_endpoint(self):
+        build_chain(3)
+        response = self.client.get(reverse('inventory:network-topology-json'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data['nodes']), 3)
+        self.assertEqual(len(data['edges']), 2)
+
+    def test_network_topology_endpoint(self):
+        build_chain(2)
+        response = self.client.get(reverse('inventory:network-topology-json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['nodes']), 2)
+
+
+class TopologyVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.devices = build_chain(2)
+        self.url = reverse('inventory:network-topology-json')
+
+    def test_version_bumps_on_save_and_delete(self):
+        version = get_topology_version()
+        self.devices[0].save()
+        self.assertEqual(get_topology_version(), version + 1)
+        Connection.objects.get().delete()
+        self.assertEqual(get_topology_version(), version + 2)
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'v{get_topology_version()}', etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Interface.objects.create(device=self.devices[0], name='mgmt', interface_type='ethernet')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_device_is_404_even_with_matching_etag(self):
+        url = reverse('inventory:device-topology-json', kwargs={'slug': self.devices[0].slug})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        missing = reverse('inventory:device-topology-json', kwargs={'slug': 'missing'})
+        etag = f'"{topology_etag("device-missing-d1-all")}"'
+        self.assertEqual(self.client.get(missing, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_snapshot_is_served_from_cache(self):
+        self.client.get(self.url)
+        # Only the version lookup remains; the graph itself comes from the cache.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['nodes']), 2)
+
+    def test_device_snapshot_follows_changes(self):
+        url = reverse('inventory:device-topology-json', kwargs={'slug': self.devices[0].slug})
+        self.assertEqual(len(self.client.get(url).json()['nodes']), 2)
+        Connection.objects.all().delete()
+        self.assertEqual(len(self.client.get(url).json()['nodes']), 1)
+
+
+@skipIf(np is None, 'NumPy is not installed')
+class LayoutTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_compute_layout_is_deterministic_and_spread_out(self):
+        pairs = [(i, i + 1) for i in range(9)]
+        positions = compute_layout(range(10), pairs)
+        self.assertEqual(positions, compute_layout(range(10), pairs))
+        self.assertEqual(len(set(positions.values())), 10)
+
+    def test_topology_nodes_carry_coordinates(self):
+        devices = build_chain(4)
+        for data in (build_network_topology(), build_device_topology(devices[0], depth=2)):
+            for node in data['nodes']:
+                self.assertIn('x', node)
+                self.assertIn('y', node)
+
+    def test_network_layout_is_cached_per_version(self):
+        devices = build_chain(3)
+        first = build_network_topology()
+        with mock.patch('inventory.topology.compute_layout') as compute:
+            self.assertEqual(build_network_topology(), first)
+            compute.assert_not_called()
+            devices[0].save()
+            compute.return_value = {}
+            build_network_topology()
+            compute.assert_called_once()
+
+
+class ClusteredTopologyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Two racks in DC1 and one in DC2, chained together across racks.
+        self.devices = build_chain(6)
+        placement = [
+            ('DC1', 'R1'), ('DC1', 'R1'), ('DC1', 'R2'),
+            ('DC1', 'R2'), ('DC2', 'R3'), ('DC2', None),
+        ]
+        for device, (location, rack) in zip(self.devices, placement):
+            Device.objects.filter(pk=device.pk).update(location=location, rack_id=rack)
+
+    def test_top_level_groups_with_weighted_edges(self):
+        with self.assertNumQueries(2):
+            data = build_clustered_topology(['location'])
+        nodes = {node['id']: node for node in data['nodes']}
+        self.assertEqual(nodes[cluster_id(['DC1'])]['value'], 4)
+        self.assertEqual(nodes[cluster_id(['DC1'])]['internal_links'], 3)
+        self.assertEqual(nodes[cluster_id(['DC2'])]['value'], 2)
+        self.assertEqual(len(data['edges']), 1)
+        self.assertEqual(data['edges'][0]['value'], 1)
+
+    def test_expanding_a_cluster(self):
+        with self.assertNumQueries(2):
+            data = build_clustered_topology(['location', 'rack_id'], ['DC2'])
+        ids = {node['id'] for node in data['nodes']}
+        self.assertEqual(ids, {
+            cluster_id(['DC2', 'R3']), cluster_id(['DC2', '']), cluster_id(['DC1']),
+        })
+        self.assertEqual(len(data['edges']), 2)
+
+        data = build_clustered_topology(['location', 'rack_id'], ['DC1', 'R2'])
+        ids = {node['id'] for node in data['nodes']}
+        self.assertEqual(ids, {
+            str(self.devices[2].pk), str(self.devices[3].pk),
+            cluster_id(['DC1', 'R1']), cluster_id(['DC2']),
+        })
+
+    def test_cluster_endpoint(self):
+        url = reverse('inventory:network-topology-json')
+        response = self.client.get(url, {'cluster_by': 'location'})
+        self.assertEqual(len(response.json()['nodes']), 2)
+        response = self.client.get(url, {'cluster_by': 'location', 'cluster': 'DC1'})
+        self.assertEqual(len(response.json()['nodes']), 5)
+        self.assertEqual(self.client.get(url, {'cluster_by': 'serial_number'}).status_code, 400)
+
+
+class ShortestPathTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # A ring of six devices: two equal-length ways round between 0 and 3.
+        self.devices = build_chain(6)
+        Connection.objects.create(
+            source_interface=self.devices[5].interfaces.get(name='down'),
+            destination_interface=self.devices[0].interfaces.get(name='up'),
+            connection_type='wireless',
+        )
+        self.ids = [device.pk for device in self.devices]
+
+    def test_shortest_and_k_shortest_paths(self):
+        index = TopologyIndex.load(version=0)
+        with self.assertNumQueries(0):
+            cost, path = index.shortest_path(self.ids[0], self.ids[2])
+        self.assertEqual((cost, path), (2, self.ids[:3]))
+
+        paths = index.k_shortest_paths(self.ids[0], self.ids[3], k=3)
+        self.assertEqual(len(paths), 2)
+        self.assertEqual({cost for cost, _ in paths}, {3})
+
+    def test_weighted_paths_avoid_expensive_links(self):
+        index = TopologyIndex.load(version=0)
+        self.assertEqual(
+            index.shortest_path(self.ids[0], self.ids[4])[1],
+            [self.ids[0], self.ids[5], self.ids[4]],
+        )
+        cost, path = index.shortest_path(self.ids[0], self.ids[4], weighted=True)
+        self.assertEqual(path, self.ids[:5])
+        self.assertEqual(cost, 4)
+
+    def test_inactive_devices_are_not_traversed(self):
+        Device.objects.filter(pk=self.ids[1]).update(is_active=False)
+        index = TopologyIndex.load(version=0)
+        self.assertEqual(index.shortest_path(self.ids[0], self.ids[2])[1], [
+            self.ids[0], self.ids[5], self.ids[4], self.ids[3], self.ids[2],
+        ])
+
+    def test_shortest_path_endpoint(self):
+        url = reverse('inventory:shortest-path-json', kwargs={
+            'source': self.devices[0].slug, 'target': self.devices[3].slug,
+        })
+        data = self.client.get(url, {'k': 2}).json()
+        self.assertEqual(len(data['paths']), 2)
+        self.assertEqual(data['paths'][0]['hops'], 3)
+        self.assertEqual(data['paths'][0]['devices'][0]['slug'], self.devices[0].slug)
+
+        missing = reverse('inventory:shortest-path-json', kwargs={'source': 'nope', 'target': self.devices[0].slug})
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertEqual(self.client.get(url, {'k': 0}).status_code, 400)
+
+
+class FailureAnalysisTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # A chain 0-1-2 with a triangle 2-3-4 hanging off its end.
+        self.devices = build_chain(5)
+        Connection.objects.create(
+            source_interface=self.devices[4].interfaces.get(name='down'),
+            destination_interface=self.devices[2].interfaces.get(name='up'),
+        )
+        self.ids = [device.pk for device in self.devices]
+
+    def test_articulation_points_and_bridges(self):
+        index = TopologyIndex.load(version=0)
+        points, bridges = cut_structure(index)
+        self.assertEqual(points, {self.ids[1], self.ids[2]})
+        self.assertEqual(bridges, {(self.ids[0], self.ids[1]), (self.ids[1], self.ids[2])})
+
+    def test_parallel_links_are_not_bridges(self):
+        Connection.objects.create(
+            source_interface=self.devices[1].interfaces.get(name='up'),
+            destination_interface=self.devices[0].interfaces.get(name='up'),
+        )
+        _, bridges = cut_structure(TopologyIndex.load(version=0))
+        self.assertEqual(bridges, {(self.ids[1], self.ids[2])})
+
+    def test_failure_impact_with_parallel_links(self):
+        parallel = Connection.objects.create(
+            source_interface=self.devices[1].interfaces.get(name='up'),
+            destination_interface=self.devices[0].interfaces.get(name='up'),
+        ).pk
+        first_link = Connection.objects.get(source_interface__device=self.devices[0]).pk
+        index = TopologyIndex.load(version=0)
+        self.assertIn((self.ids[0], self.ids[1]), separating_pairs(index))
+        core = self.ids[0]
+        self.assertEqual(failure_impact(index, core, failed_connections=[parallel]), set())
+        self.assertEqual(failure_impact(index, core, failed_connections=[first_link, parallel]), set(self.ids[1:]))
+
+    def test_betweenness_ranks_the_hub_first(self):
+        scores = betweenness_centrality(TopologyIndex.load(version=0))
+        self.assertEqual(max(scores, key=scores.get), self.ids[2])
+        self.assertEqual(scores[self.ids[0]], 0.0)
+
+    def test_failure_impact(self):
+        index = TopologyIndex.load(version=0)
+        core = self.ids[0]
+        self.assertEqual(failure_impact(index, core, {self.ids[2]}), {self.ids[3], self.ids[4]})
+        self.assertEqual(failure_impact(index, core, {self.ids[3]}), set())
+        first_link = Connection.objects.get(source_interface__device=self.devices[0]).pk
+        self.assertEqual(failure_impact(index, core, failed_connections=[first_link]), set(self.ids[1:]))
+        closing_link = Connection.objects.latest('pk').pk
+        self.assertEqual(failure_impact(index, core, failed_connections=[closing_link]), set())
+        spur_link = Connection.objects.get(source_interface__device=self.devices[2]).pk
+        self.assertEqual(
+            failure_impact(index, core, failed_connections=[closing_link, spur_link]),
+            {self.ids[3], self.ids[4]},
+        )
+
+    def test_analysis_endpoints(self):
+        data = self.client.get(reverse('inventory:topology-analysis-json')).json()
+        self.assertEqual(len(data['articulation_points']), 2)
+        self.assertEqual(data['criticality'][0]['slug'], self.devices[2].slug)
+
+        url = reverse('inventory:failure-impact-json')
+        data = self.client.get(url, {
+            'core': self.devices[0].slug, 'failed_devices': self.devices[1].slug,
+        }).json()
+        self.assertEqual(len(data['scenarios'][0]['unreachable']), 3)
+
+        response = self.client.post(url, json.dumps({
+            'core': self.devices[0].slug,
+            'scenarios': [{'devices': [self.devices[2].slug]}, {'devices': [self.devices[4].slug]}],
+        }), content_type='application/json')
+        self.assertEqual(
+            [len(s['unreachable']) for s in response.json()['scenarios']], [2, 0]
+        )
+        response = Client(enforce_csrf_checks=True).post(url, json.dumps({
+            'core': self.devices[0].slug, 'scenarios': [{'devices': [self.devices[2].slug]}],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+
+class RackEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name, rack, location, start, height in [
+            ('fw', 'R1', 'DC1', 40, 2),
+            ('sw', 'R1', 'DC1', 38, 2),
+            ('db', 'R1', 'DC1', 10, 4),
+            ('web', 'R1', 'DC1', 12, 1),
+            ('nas', 'R2', 'DC2', 1, 30),
+            ('spare', 'R2', 'DC2', None, 1),
+        ]:
+            Device.objects.create(
+                name=name, device_type='server', rack_id=rack, location=location,
+                rack_unit_start=start, rack_unit_height=height,
+            )
+
+    def test_occupancy_in_one_query(self):
+        with self.assertNumQueries(1):
+            racks = build_racks()
+        r1, r2 = racks['R1'], racks['R2']
+        self.assertEqual(r1.used_units, 8)
+        self.assertEqual(r1.free_runs, [(1, 9), (14, 24), (42, 1)])
+        self.assertEqual(r1.device_at(11).name, 'db')
+        self.assertEqual(r1.device_at(41).name, 'fw')
+        self.assertIsNone(r1.device_at(20))
+        self.assertEqual([d.name for d in r2.unplaced], ['spare'])
+        self.assertEqual(r2.location, 'DC2')
+
+    def test_overlaps_and_free_space(self):
+        conflicts = rack_conflicts()
+        self.assertEqual([(r.rack_id, a.name, b.name) for r, a, b in conflicts], [('R1', 'db', 'web')])
+        self.assertEqual([r.rack_id for r in find_rack_space(20)], ['R1'])
+        self.assertEqual([r.rack_id for r in find_rack_space(10, location='DC2')], ['R2'])
+        self.assertEqual(find_rack_space(25), [])
+
+    def test_elevation_rows_cover_every_unit(self):
+        rows = build_racks()['R1'].elevation()
+        self.assertEqual([row['unit'] for row in rows], list(range(42, 0, -1)))
+        top = rows[1]
+        self.assertEqual((top['device'].name, top['rowspan']), ('fw', 2))
+        self.assertTrue(rows[2]['covered'])
+
+    def test_clean_rejects_overlapping_placement(self):
+        device = Device(name='new', device_type='server', rack_id='R1', rack_unit_start=39, rack_unit_height=1)
+        with self.assertRaises(ValidationError):
+            device.clean()
+        device.rack_unit_start = 20
+        device.clean()
+
+    def test_rack_views(self):
+        response = self.client.get(reverse('inventory:rack-detail', kwargs={'rack_id': 'R1'}))
+        self.assertContains(response, 'fw')
+        self.assertEqual(self.client.get(reverse('inventory:rack-detail', kwargs={'rack_id': 'R9'})).status_code, 404)
+        data = self.client.get(reverse('inventory:rack-list-json'), {'free_units': 20}).json()
+        self.assertEqual([r['rack_id'] for r in data['racks']], ['R1'])
+        data = self.client.get(reverse('inventory:rack-conflicts-json')).json()
+        self.assertEqual(len(data['conflicts']), 1)
+
+    def test_rack_id_with_slash(self):
+        device = Device.objects.create(
+            name='edge', device_type='router', rack_id='DC1/R12', rack_unit_start=1, rack_unit_height=1,
+        )
+        self.assertContains(self.client.get(device.get_absolute_url()), 'DC1/R12')
+        response = self.client.get(reverse('inventory:rack-detail', kwargs={'rack_id': 'DC1/R12'}))
+        self.assertContains(response, 'edge')
+
+
+class AddressIndexTest(TestCase):
+    def setUp(self):
+        for name, ip in [
+            ('a', '10.20.0.5'), ('b', '10.20.255.1'), ('c', '10.21.0.1'),
+            ('d', '10.3.0.1'), ('v6', '2001:db8::10'),
+        ]:
+            Device.objects.create(name=name, device_type='server', ip_address=ip)
+        Interface.objects.create(
+            device=Device.objects.get(name='a'), name='eth1',
+            interface_type='ethernet', ip_address='10.20.7.7',
+        )
+
+    def names(self, entries):
+        return [entry['name'] for entry in entries]
+
+    def test_packed_key_kept_in_sync(self):
+        device = Device.objects.get(name='a')
+        self.assertEqual(unpack_ip(device.ip_packed), unpack_ip(pack_ip('10.20.0.5')))
+        device.ip_address = None
+        device.save()
+        device.refresh_from_db()
+        self.assertIsNone(device.ip_packed)
+        device.ip_address = '10.20.0.6'
+        device.save(update_fields=['ip_address'])
+        interface = Interface.objects.get(name='eth1')
+        interface.ip_address = '10.99.0.1'
+        interface.save(update_fields=['ip_address'])
+        self.assertEqual(self.names(addresses_in_network('10.20.0.0/24')[0]), ['a'])
+        self.assertEqual(self.names(addresses_in_network('10.99.0.0/16')[0]), ['a - eth1'])
+        # Numeric, not lexical, order.
+        self.assertLess(pack_ip('10.3.0.1'), pack_ip('10.20.0.1'))
+
+    def test_subnet_and_range_queries(self):
+        entries, truncated = addresses_in_network('10.20.0.0/16')
+        self.assertEqual(self.names(entries), ['a', 'a - eth1', 'b'])
+        self.assertFalse(truncated)
+        entries, truncated = addresses_in_network('10.0.0.0/8', limit=2)
+        self.assertEqual(self.names(entries), ['d', 'a'])
+        self.assertTrue(truncated)
+        self.assertEqual(self.names(addresses_in_network('2001:db8::/32')[0]), ['v6'])
+        self.assertEqual(self.names(addresses_between('10.20.200.0', '10.21.0.1')[0]), ['b', 'c'])
+
+    def test_longest_prefix_match(self):
+        length, entries = longest_prefix_match('10.20.7.9')
+        self.assertEqual(length, 28)
+        self.assertEqual(self.names(entries), ['a - eth1'])
+        length, entries = longest_prefix_match('2001:db8::1')
+        self.assertEqual(self.names(entries), ['v6'])
+
+    def test_address_api(self):
+        url = reverse('inventory:address-search-json')
+        data = self.client.get(url, {'cidr': '10.20.1.1/16'}).json()
+        self.assertEqual(data['cidr'], '10.20.0.0/16')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(self.client.get(url, {'cidr': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        data = self.client.get(reverse('inventory:address-match-json'), {'address': '10.21.0.200'}).json()
+        self.assertEqual([r['device'] for r in data['results']], ['c'])
+
+
+class MacLookupTest(TestCase):
+    def setUp(self):
+        self.switch = Device.objects.create(name='Access-01', device_type='switch', mac_address='00-11-22-33-44-00')
+        self.server = Device.objects.create(name='Server-01', device_type='server')
+        self.port = Interface.objects.create(device=self.switch, name='Gi1/0/7', interface_type='ethernet')
+        self.nic = Interface.objects.create(
+            device=self.server, name='eth0', interface_type='ethernet', mac_address='AABB.CCDD.EEFF',
+        )
+        Connection.objects.create(source_interface=self.nic, destination_interface=self.port)
+
+    def test_parse_mac_notations(self):
+        for mac in ('aa:bb:cc:dd:ee:ff', 'AA-BB-CC-DD-EE-FF', 'aabb.ccdd.eeff', 'aabbccddeeff'):
+            self.assertEqual(parse_mac(mac), 0xaabbccddeeff)
+        for mac in ('', None, 'aa:bb:cc:dd:ee', 'gg:bb:cc:dd:ee:ff'):
+            self.assertIsNone(parse_mac(mac))
+        self.assertEqual(format_mac(0xaabbccddeeff), 'aa:bb:cc:dd:ee:ff')
+        self.assertEqual(self.nic.mac_value, 0xaabbccddeeff)
+
+    def test_lookup_returns_owner_and_peer(self):
+        results, unknown, invalid = lookup_macs(['aa:bb:cc:dd:ee:ff', '0011.2233.4400', '02:00:00:00:00:01', 'junk'])
+        [owner] = results['aa:bb:cc:dd:ee:ff']
+        self.assertEqual((owner['kind'], owner['name']), ('interface', 'Server-01 - eth0'))
+        self.assertEqual([peer['name'] for peer in owner['peers']], ['Access-01 - Gi1/0/7'])
+        self.assertEqual(results['00:11:22:33:44:00'][0]['kind'], 'device')
+        self.assertEqual((unknown, invalid), (['02:00:00:00:00:01'], ['junk']))
+
+    def test_update_fields_keep_value_in_sync(self):
+        self.switch.mac_address = '00:11:22:33:44:01'
+        self.switch.save(update_fields=['mac_address'])
+        self.nic.mac_address = '02:00:00:00:00:02'
+        self.nic.save(update_fields=['mac_address'])
+        results, unknown, _ = lookup_macs(['00:11:22:33:44:01', '02:00:00:00:00:02', 'aa:bb:cc:dd:ee:ff'])
+        self.assertEqual(results['00:11:22:33:44:01'][0]['name'], 'Access-01')
+        self.assertEqual(results['02:00:00:00:00:02'][0]['name'], 'Server-01 - eth0')
+        self.assertEqual(unknown, ['aa:bb:cc:dd:ee:ff'])
+
+    def test_batch_queries_grow_per_chunk_not_per_mac(self):
+        macs = [format_mac(0x020000000000 + i) for i in range(MAC_LOOKUP_CHUNK * 2)]
+        # Two chunks without interfaces skip the peer queries; the chunk
+        # holding eth0 costs both models plus one query per link direction.
+        with self.assertNumQueries(2 + 2 + 4):
+            _, unknown, _ = lookup_macs(macs + ['aa-bb-cc-dd-ee-ff'])
+        self.assertEqual(len(unknown), MAC_LOOKUP_CHUNK * 2)
+
+    def test_endpoint(self):
+        url = reverse('inventory:mac-lookup-json')
+        data = self.client.get(url, {'mac': 'AA:BB:CC:DD:EE:FF'}).json()
+        self.assertEqual(data['count'], 1)
+        response = self.client.post(url, json.dumps({'macs': ['aabbccddeeff', 'nope']}), content_type='application/json')
+        self.assertEqual(response.json()['invalid'], ['nope'])
+        self.assertEqual(self.client.post(url, '[]', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        # API clients post without a CSRF token.
+        response = Client(enforce_csrf_checks=True).post(
+            url, json.dumps({'macs': ['aabbccddeeff']}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+class ImportInventoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_inventory', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_upsert_by_name(self):
+        Device.objects.create(name='Edge 1', device_type='router', location='Old', serial_number='SN1')
+        path = self.write('devices.csv', (
+            'name,device_type,location,ip_address,is_active\n'
+            'Edge 1,router,DC1,10.0.0.1,true\n'
+            'edge-1,switch,DC1,,false\n'
+            'Core,switch,DC2,10.0.0.2,1\n'
+        ))
+        version = get_topology_version()
+        out, err = self.run_import(path, '--kind', 'devices', '--batch-size', '2')
+        self.assertIn('devices: 3 upserted', out)
+        self.assertEqual(err, '')
+
+        edge = Device.objects.get(name='Edge 1')
+        self.assertEqual((edge.location, edge.serial_number, edge.slug), ('DC1', 'SN1', 'edge-1'))
+        self.assertEqual(edge.ip_packed, pack_ip('10.0.0.1'))
+        self.assertEqual(Device.objects.get(name='edge-1').slug, 'edge-1-2')
+        self.assertFalse(Device.objects.get(name='edge-1').is_active)
+        self.assertGreater(get_topology_version(), version)
+
+    def test_jsonl_resolves_references(self):
+        lines = [
+            {'kind': 'devices', 'name': 'A', 'device_type': 'server'},
+            {'kind': 'devices', 'name': 'B', 'device_type': 'server'},
+            {'kind': 'interfaces', 'device': 'A', 'name': 'eth0', 'interface_type': 'ethernet', 'ip_address': '10.1.0.1'},
+            {'kind': 'interfaces', 'device': 'B', 'name': 'eth0', 'interface_type': 'ethernet'},
+            {'kind': 'interfaces', 'device': 'Missing', 'name': 'eth0', 'interface_type': 'ethernet'},
+            {'kind': 'connections', 'source_device': 'A', 'source_interface': 'eth0',
+             'destination_device': 'B', 'destination_interface': 'eth0', 'connection_type': 'vlan'},
+            {'kind': 'devices', 'name': 'C', 'device_type': 'server', 'rack_unit_start': 'x'},
+        ]
+        path = self.write('dump.jsonl', '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n')
+        out, err = self.run_import(path)
+        self.assertIn('connections: 1 upserted', out)
+        self.assertIn("unknown device 'Missing'", err)
+        self.assertIn('rack_unit_start', err)
+        self.assertIn('invalid JSON', err)
+
+        connection = Connection.objects.get()
+        self.assertEqual(connection.connection_type, 'vlan')
+        self.assertEqual([r['name'] for r in search_devices('10.1.0.1')], ['A'])
+        self.assertEqual(connection.source_interface.ip_packed, pack_ip('10.1.0.1'))
+        # Re-importing updates in place.
+        self.run_import(path)
+        self.assertEqual(Interface.objects.count(), 2)
+        self.assertEqual(Connection.objects.count(), 1)
+
+    def test_rejected_batch_still_finalizes(self):
+        path = self.write('devices.csv', (
+            'name,device_type,ip_address\n'
+            'Alpha,server,10.2.0.1\n'
+            'Beta,server,10.2.0.2\n'
+            'Gamma,server,10.2.0.1\n'
+        ))
+        version = get_topology_version()
+        out, err = self.run_import(path, '--kind', 'devices', '--batch-size', '2')
+        self.assertIn('devices: 2 upserted, 1 skipped', out)
+        self.assertIn('rejected', err)
+        self.assertEqual(sorted(Device.objects.values_list('name', flat=True)), ['Alpha', 'Beta'])
+        # The committed batch is indexed, versioned, journaled and counted.
+        self.assertGreater(get_topology_version(), version)
+        self.assertEqual([r['name'] for r in search_devices('10.2.0.2')], ['Beta'])
+        self.assertEqual(get_dashboard_counters()['total_devices'], 2)
+
+
+class DeviceListPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Device.objects.bulk_create([
+            Device(name=f'Dev {i:03d}', slug=f'dev-{i:03d}', device_type='server' if i % 2 else 'switch')
+            for i in range(130)
+        ])
+        self.url = reverse('inventory:device-list')
+
+    def names(self, response):
+        return [device.name for device in response.context['devices']]
+
+    def test_walks_pages_by_cursor(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.names(response)[0], 'Dev 000')
+        page = response.context['page_obj']
+        self.assertEqual([p['number'] for p in page.window], [1, 2, 3])
+        self.assertIsNone(page.previous)
+
+        response = self.client.get(self.url + page.next)
+        self.assertEqual(self.names(response)[0], 'Dev 050')
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 2)
+
+        response = self.client.get(self.url + page.last)
+        self.assertEqual(self.names(response), [f'Dev {i:03d}' for i in range(100, 130)])
+        page = response.context['page_obj']
+        self.assertEqual((page.number, page.next), (3, None))
+
+        response = self.client.get(self.url + page.previous)
+        self.assertEqual(self.names(response)[0], 'Dev 050')
+        response = self.client.get(self.url + response.context['page_obj'].previous)
+        self.assertEqual(self.names(response)[0], 'Dev 000')
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        self.client.get(self.url)
+        # The page, its two neighbour-key queries and the inventory version
+        # behind the cached facet counts (only cached outside transactions).
+        with self.assertNumQueries(4):
+            page = self.client.get(self.url).context['page_obj']
+        with self.assertNumQueries(4):
+            self.client.get(self.url + page.next)
+
+    def test_filter_kept_and_counts_annotated(self):
+        device = Device.objects.get(name='Dev 001')
+        left = Interface.objects.create(device=device, name='eth0', interface_type='ethernet')
+        right = Interface.objects.create(device=device, name='eth1', interface_type='ethernet')
+        other = Interface.objects.create(device=Device.objects.get(name='Dev 003'), name='eth0', interface_type='ethernet')
+        Connection.objects.create(source_interface=left, destination_interface=other)
+        Connection.objects.create(source_interface=right, destination_interface=left)
+
+        response = self.client.get(self.url, {'type': 'server'})
+        first = response.context['devices'][0]
+        self.assertEqual((first.name, first.interface_count, first.connection_count), ('Dev 001', 2, 2))
+        self.assertIn('type=server', response.context['page_obj'].next)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 404)
+
+
+class DeviceFacetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        rows = [
+            ('a', 'server', 'linux', 'DC1', 'R1', True),
+            ('b', 'server', 'linux', 'DC2', 'R2', True),
+            ('c', 'server', 'windows', 'DC1', None, False),
+            ('d', 'switch', 'ios', 'DC1', 'R1', True),
+            ('e', 'switch', 'ios', 'DC2', None, True),
+            ('f', 'router', None, None, None, True),
+        ]
+        Device.objects.bulk_create([
+            Device(name=name, slug=name, device_type=kind, os_type=os, location=location, rack_id=rack, is_active=active)
+            for name, kind, os, location, rack, active in rows
+        ])
+        self.url = reverse('inventory:device-list')
+
+    def test_counts_ignore_own_facet(self):
+        total, counts = facet_counts({'device_type': ['server']})
+        self.assertEqual(total, 3)
+        # Type counts still show the alternatives.
+        self.assertEqual(counts['device_type'], {'server': 3, 'switch': 2, 'router': 1})
+        self.assertEqual(counts['location'], {'DC1': 2, 'DC2': 1})
+        self.assertEqual(counts['is_active'], {'true': 2, 'false': 1})
+
+        total, counts = facet_counts({'device_type': ['server', 'switch'], 'location': ['DC1']})
+        self.assertEqual(total, 3)
+        self.assertEqual(counts['device_type'], {'server': 2, 'switch': 1})
+        self.assertEqual(counts['location'], {'DC1': 3, 'DC2': 2})
+        self.assertEqual(counts['rack_id'], {'R1': 2, '': 1})
+
+    def test_unset_values_filter_together(self):
+        queryset = filter_devices(Device.objects.all(), {'location': [''], 'os_type': ['']})
+        self.assertEqual([device.name for device in queryset], ['f'])
+
+    def test_list_filters_and_caches_counts(self):
+        response = self.client.get(self.url, {'device_type': ['server', 'switch'], 'location': 'DC1'})
+        self.assertEqual([device.name for device in response.context['devices']], ['a', 'c', 'd'])
+        self.assertEqual(response.context['matching_count'], 3)
+        types = {item['value']: item for item in response.context['facets'][0]['values']}
+        self.assertTrue(types['server']['selected'])
+        # Routers fail both the type and the location filter.
+        self.assertNotIn('router', types)
+        self.assertEqual(types['server']['url'], '?device_type=switch&location=DC1')
+
+        # One grouped query builds every facet; repeats hit the cache.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            facet_counts({'is_active': ['false']})
+            facet_counts({'is_active': ['false']})
+            facet_counts({'rack_id': ['R1']})
+        self.assertEqual(len([q for q in queries if 'GROUP BY' in q['sql']]), 1)
+
+        # Writes invalidate through the inventory version.
+        Device.objects.create(name='g', slug='g', device_type='router', location='DC1')
+        self.assertEqual(facet_counts({})[1]['device_type']['router'], 2)
+
+    def test_type_alias(self):
+        response = self.client.get(self.url, {'type': 'switch'})
+        self.assertEqual([device.name for device in response.context['devices']], ['d', 'e'])
+        self.assertEqual(response.context['active_filters'][0]['label'], 'Type: Network Switch')
+
+class DeviceSearchTest(TestCase):
+    def setUp(self):
+        self.core = Device.objects.create(
+            name='Core-Switch-01', device_type='switch', ip_address='10.20.0.1',
+            serial_number='FOC1234X', location='DC1', mac_address='00:1a:2b:3c:4d:5e',
+        )
+        self.server = Device.objects.create(
+            name='Web-01', device_type='server', ip_address='10.30.0.5',
+            description='Frontend for the core portal',
+        )
+        Interface.objects.create(
+            device=self.server, name='Gi1/0/24', interface_type='ethernet', ip_address='10.20.9.9',
+        )
+
+    def names(self, text):
+        return [result['name'] for result in search_devices(text)]
+
+    def test_match_query(self):
+        self.assertEqual(build_match_query('core-sw 10.20.'), '"core sw"* "10.20."*')
+        self.assertEqual(build_match_query(' -- '), '')
+
+    def test_finds_every_indexed_field(self):
+        self.assertEqual(self.names('core-sw'), ['Core-Switch-01'])
+        self.assertEqual(self.names('FOC12'), ['Core-Switch-01'])
+        self.assertEqual(self.names('00:1a:2b'), ['Core-Switch-01'])
+        self.assertEqual(self.names('gi1/0'), ['Web-01'])
+        self.assertEqual(self.names('10.30.'), ['Web-01'])
+        self.assertEqual(sorted(self.names('10.20.')), ['Core-Switch-01', 'Web-01'])
+        self.assertEqual(self.names('core portal'), ['Web-01'])
+        self.assertEqual(self.names('nothing-here'), [])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.names('core'), ['Core-Switch-01', 'Web-01'])
+
+    def test_limit_keeps_best_matches(self):
+        for i in range(5):
+            Device.objects.create(name=f'Spare-{i}', device_type='server', description='uplink spare')
+        Device.objects.create(name='Uplink', device_type='router')
+        self.assertEqual([r['name'] for r in search_devices('uplink', limit=1)], ['Uplink'])
+
+    def test_search_page_does_not_shadow_device_slug(self):
+        device = Device.objects.create(name='Search', device_type='server')
+        self.assertEqual(device.slug, 'search')
+        self.assertNotEqual(reverse('inventory:device-search'), device.get_absolute_url())
+        self.assertContains(self.client.get(device.get_absolute_url()), 'Search')
+
+    def test_signals_keep_index_current(self):
+        interface = self.server.interfaces.get()
+        interface.name = 'Te1/1/1'
+        interface.save()
+        self.assertEqual(self.names('te1'), ['Web-01'])
+        self.assertEqual(self.names('gi1'), [])
+        self.core.delete()
+        self.assertEqual(self.names('FOC12'), [])
+
+    def test_search_views(self):
+        data = self.client.get(reverse('inventory:device-search-json'), {'q': 'web'}).json()
+        self.assertEqual([r['slug'] for r in data['results']], ['web-01'])
+        self.assertEqual(self.client.get(reverse('inventory:device-search-json')).status_code, 400)
+        response = self.client.get(reverse('inventory:device-search'), {'q': '10.20.'})
+        self.assertContains(response, 'Core-Switch-01')
+
+
+class DeviceDossierTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.chassis = Device.objects.create(name='Chassis', device_type='switch')
+        self.server = Device.objects.create(name='Server', device_type='server')
+        ports = Interface.objects.bulk_create([
+            Interface(device=self.chassis, name=f'Gi1/0/{i}', interface_type='ethernet') for i in range(1, 41)
+        ])
+        nic = Interface.objects.create(device=self.server, name='eth0', interface_type='ethernet')
+        Connection.objects.create(source_interface=ports[0], destination_interface=nic)
+        Connection.objects.create(source_interface=nic, destination_interface=ports[1])
+        Connection.objects.create(source_interface=ports[2], destination_interface=ports[3])
+
+        self.diagram = Diagram.objects.create(name='Core', diagram_type='network')
+        self.diagram.devices.add(self.chassis)
+        article = Article.objects.create(title='Runbook', content='...', is_published=True)
+        ArticleEmbed.objects.create(article=article, embed_type='device', device=self.chassis)
+
+    def test_loads_in_fixed_queries(self):
+        with self.assertNumQueries(5):
+            dossier = load_dossier('chassis')
+        self.assertEqual(dossier['interface_count'], 40)
+        self.assertEqual(dossier['connection_count'], 3)
+        ports = {interface['name']: interface for interface in dossier['interfaces']}
+        self.assertEqual(
+            [(link['direction'], link['peer_device'], link['peer_interface']) for link in ports['Gi1/0/1']['links']],
+            [('out', 'Server', 'eth0')],
+        )
+        self.assertEqual(ports['Gi1/0/2']['links'][0]['direction'], 'in')
+        self.assertEqual(ports['Gi1/0/3']['links'][0]['peer_interface'], 'Gi1/0/4')
+        self.assertEqual([diagram['name'] for diagram in dossier['diagrams']], ['Core'])
+        self.assertEqual([article['title'] for article in dossier['articles']], ['Runbook'])
+        self.assertIsNone(load_dossier('missing'))
+
+    def test_page_and_json_share_cached_dossier(self):
+        response = self.client.get(self.chassis.get_absolute_url())
+        self.assertContains(response, 'Runbook')
+        self.assertContains(response, 'Gi1/0/40')
+
+        url = reverse('inventory:device-dossier-json', kwargs={'slug': 'chassis'})
+        with self.assertNumQueries(1):
+            # Only the topology version; cached outside test transactions.
+            data = self.client.get(url).json()
+        self.assertEqual(data['device']['device_type_display'], 'Network Switch')
+        self.assertEqual(self.client.get(url.replace('chassis', 'missing')).status_code, 404)
+        self.assertEqual(self.client.get(reverse('inventory:device-detail', kwargs={'slug': 'missing'})).status_code, 404)
+
+    def test_related_changes_invalidate(self):
+        url = reverse('inventory:device-dossier-json', kwargs={'slug': 'chassis'})
+        self.client.get(url)
+        self.diagram.devices.remove(self.chassis)
+        self.assertEqual(self.client.get(url).json()['diagrams'], [])
+        Interface.objects.create(device=self.chassis, name='mgmt0', interface_type='ethernet')
+        self.assertEqual(self.client.get(url).json()['interface_count'], 41)
+
+
+class ChangeJournalTest(TestCase):
+    def setUp(self):
+        self.start = timezone.now() - timedelta(hours=1)
+        TopologyCheckpoint.objects.all().delete()
+        take_checkpoint()
+        TopologyCheckpoint.objects.update(timestamp=self.start)
+
+    def stamp(self, minutes):
+        """Backdate the records written since the last call to ``minutes`` after the start."""
+        at = self.start + timedelta(minutes=minutes)
+        ChangeRecord.objects.filter(timestamp__gt=self.start + timedelta(minutes=30)).update(timestamp=at)
+        return at
+
+    def test_records_only_deltas(self):
+        device = Device.objects.create(name='Edge-01', device_type='router', location='DC1')
+        created = ChangeRecord.objects.get()
+        self.assertEqual((created.action, created.changes['location']), ('create', 'DC1'))
+
+        device.location = 'DC2'
+        device.save()
+        device.save()
+        update = ChangeRecord.objects.last()
+        self.assertEqual((update.action, update.changes), ('update', {'location': 'DC2'}))
+        self.assertEqual(ChangeRecord.objects.count(), 2)
+
+        Interface.objects.create(device=device, name='eth0', interface_type='ethernet')
+        device.delete()
+        self.assertEqual(
+            list(ChangeRecord.objects.filter(action='delete').values_list('model', flat=True).order_by('model')),
+            ['device', 'interface'],
+        )
+
+    def test_reconstructs_topology_as_of(self):
+        core = Device.objects.create(name='Core', device_type='switch')
+        edge = Device.objects.create(name='Edge', device_type='router')
+        a = Interface.objects.create(device=core, name='eth0', interface_type='ethernet')
+        b = Interface.objects.create(device=edge, name='eth0', interface_type='ethernet')
+        Connection.objects.create(source_interface=a, destination_interface=b)
+        first = self.stamp(1)
+
+        edge.name = 'Edge-Renamed'
+        edge.save()
+        second = self.stamp(2)
+
+        edge.delete()
+        self.stamp(3)
+
+        topology = topology_as_of(first + timedelta(seconds=30))
+        self.assertEqual([node['label'] for node in topology['nodes']], ['Core', 'Edge'])
+        self.assertEqual(len(topology['edges']), 1)
+        self.assertEqual(
+            [node['label'] for node in topology_as_of(second)['nodes']], ['Core', 'Edge-Renamed'],
+        )
+        latest = topology_as_of(timezone.now())
+        self.assertEqual(([node['label'] for node in latest['nodes']], latest['edges']), (['Core'], []))
+        with self.assertRaises(ValueError):
+            topology_as_of(self.start - timedelta(days=1))
+
+        url = reverse('inventory:topology-history-json')
+        data = self.client.get(url, {'at': second.isoformat()}).json()
+        self.assertEqual(len(data['nodes']), 2)
+        self.assertEqual(self.client.get(url, {'at': 'yesterday'}).status_code, 400)
+        # A device slugged "history" keeps its own topology endpoint.
+        history = Device.objects.create(name='History', device_type='server')
+        response = self.client.get(reverse('inventory:device-topology-json', args=[history.slug]))
+        self.assertEqual([node['label'] for node in response.json()['nodes']], ['History'])
+
+    def test_replays_from_nearest_checkpoint(self):
+        Device.objects.create(name='Old', device_type='server')
+        self.stamp(1)
+        take_checkpoint()
+        TopologyCheckpoint.objects.filter(timestamp__gt=self.start + timedelta(minutes=30)).update(
+            timestamp=self.start + timedelta(minutes=2),
+        )
+        Device.objects.create(name='New', device_type='server')
+        self.stamp(3)
+
+        topology = topology_as_of(self.start + timedelta(minutes=4))
+        self.assertEqual((topology['replayed'], len(topology['nodes'])), (1, 2))
+        self.assertEqual(len(topology_as_of(self.start + timedelta(minutes=1))['nodes']), 1)
+
+
+def snapshot_diff(before, after):
+    """Diff two full network topologies by node and edge id, ignoring layout."""
+    def index(items):
+        return {
+            item['id']: {key: value for key, value in item.items() if key not in ('x', 'y')}
+            for item in items
+        }
+    result = {}
+    for part in ('nodes', 'edges'):
+        old, new = index(before[part]), index(after[part])
+        result[part] = {
+            'added': [new[key] for key in sorted(new) if key not in old],
+            'removed': sorted(key for key in old if key not in new),
+            'changed': [new[key] for key in sorted(new) if key in old and old[key] != new[key]],
+        }
+    return result
+
+
+class TopologyDiffTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.devices = build_chain(4)
+        self.since = get_topology_version()
+        self.before = build_network_topology()
+
+    def assertDiffMatchesSnapshots(self):
+        diff = topology_diff(self.since)
+        self.assertFalse(diff['reset'])
+        expected = snapshot_diff(self.before, build_network_topology())
+        self.assertEqual({'nodes': diff['nodes'], 'edges': diff['edges']}, expected)
+        return diff
+
+    def test_diff_matches_full_snapshots(self):
+        a, b, c, d = self.devices
+        b.name = 'Renamed'
+        b.save()
+        Connection.objects.filter(source_interface__device=a).get().delete()
+        e = Device.objects.create(name='New', device_type='router')
+        Connection.objects.create(
+            source_interface=d.interfaces.get(name='down'),
+            destination_interface=Interface.objects.create(device=e, name='up', interface_type='ethernet'),
+            connection_type='logical',
+        )
+        c.is_active = False
+        c.save()
+        diff = self.assertDiffMatchesSnapshots()
+        self.assertEqual([node['label'] for node in diff['nodes']['added']], ['New'])
+        self.assertEqual(diff['nodes']['removed'], [str(c.pk)])
+        self.assertEqual(diff['edges']['removed'], [f'{a.pk}-{b.pk}'])
+
+    def test_parallel_link_and_deleted_device(self):
+        a, b, c, d = self.devices
+        # A second a-b link changes nothing visible; deleting d drops its edge.
+        Connection.objects.create(
+            source_interface=Interface.objects.create(device=b, name='extra', interface_type='ethernet'),
+            destination_interface=a.interfaces.get(name='up'),
+        )
+        d_id = d.pk
+        d.delete()
+        diff = self.assertDiffMatchesSnapshots()
+        self.assertEqual(diff['edges']['removed'], [f'{c.pk}-{d_id}'])
+        self.assertEqual(diff['edges']['added'] + diff['edges']['changed'], [])
+
+    def test_moved_interface(self):
+        a, b, c, d = self.devices
+        port = b.interfaces.get(name='up')
+        port.device, port.name = d, 'moved'
+        port.save()
+        diff = self.assertDiffMatchesSnapshots()
+        self.assertEqual(diff['edges']['removed'], [f'{a.pk}-{b.pk}'])
+        self.assertEqual([edge['id'] for edge in diff['edges']['added']], [f'{a.pk}-{d.pk}'])
+
+    def test_reset_and_endpoint(self):
+        url = reverse('inventory:network-topology-json')
+        response = self.client.get(url, {'since': self.since})
+        self.assertEqual(response['X-Topology-Version'], str(self.since))
+        self.assertEqual(response.json()['nodes']['added'], [])
+
+        first_id = self.devices[0].pk
+        self.devices[0].delete()
+        data = self.client.get(url, {'since': self.since}).json()
+        self.assertEqual(data['nodes']['removed'], [str(first_id)])
+        self.assertEqual(self.client.get(url, {'since': 'x'}).status_code, 400)
+
+        take_checkpoint(bulk=True)
+        self.assertTrue(topology_diff(self.since)['reset'])
+
+
+class TopologyEventsTest(TestCase):
+    def setUp(self):
+        self.devices = build_chain(3)
+        self.after = ChangeRecord.objects.order_by('-pk').values_list('pk', flat=True).first()
+
+    def test_coalesce(self):
+        records = [
+            (1, 'device', 7, 'create', {'name': 'a'}, None),
+            (2, 'device', 7, 'update', {'name': 'b'}, {'name': 'a'}),
+            (3, 'interface', 9, 'create', {'device_id': 7}, None),
+            (4, 'interface', 9, 'delete', None, {'device_id': 7}),
+            (5, 'connection', 4, 'delete', None, {'source_interface_id': 2, 'destination_interface_id': 3}),
+        ]
+        events = coalesce(records, {2: 1, 3: 5})
+        self.assertEqual(events, [
+            {'model': 'device', 'id': 7, 'action': 'create', 'devices': [7]},
+            {'model': 'connection', 'id': 4, 'action': 'delete', 'devices': [1, 5]},
+        ])
+
+    def test_read_window(self):
+        a, b, c = self.devices
+        link = Connection.objects.get(source_interface__device=a)
+        link.is_active = False
+        link.save()
+        link.delete()
+        b.name = 'Renamed'
+        b.save()
+        with self.assertNumQueries(2):
+            last_id, version, events = read_window(self.after)
+        self.assertEqual(last_id, ChangeRecord.objects.latest('pk').pk)
+        self.assertEqual(version, get_topology_version())
+        self.assertEqual(
+            [(event['model'], event['action'], event['devices']) for event in events],
+            [('connection', 'delete', [a.pk, b.pk]), ('device', 'update', [b.pk])],
+        )
+        self.assertEqual(read_window(last_id), (last_id, None, []))
+
+    async def test_broadcast_to_followers(self):
+        a, b, c = self.devices
+        hub = ChangeBroadcaster(window=0.01)
+        following_c = await hub.subscribe([c.pk])
+        following_a = await hub.subscribe([a.pk])
+        self.assertIsNotNone(hub._task)
+
+        b.name = 'Renamed'
+        await sync_to_async(b.save)()
+        port = await Interface.objects.filter(device=a).afirst()
+        port.description = 'uplink'
+        await sync_to_async(port.save)()
+        await hub.poll()
+        message = following_a.queue.get_nowait()
+        self.assertEqual(message['changes'], [{'model': 'interface', 'id': port.pk, 'action': 'update', 'devices': [a.pk]}])
+        self.assertTrue(following_c.queue.empty())
+        self.assertIn(f"id: {message['id']}\nevent: change\n", format_event(message))
+
+        # Resuming from an older Last-Event-ID replays what was missed.
+        resumed = await hub.subscribe(after=self.after)
+        self.assertEqual(len(resumed.queue.get_nowait()['changes']), 2)
+
+        stream = event_stream(following_c, hub=hub)
+        self.assertEqual(await stream.__anext__(), 'retry: 2000\n\n')
+        await stream.aclose()
+        self.assertNotIn(following_c, hub.subscriptions)
+        hub.unsubscribe(following_a)
+        hub.unsubscribe(resumed)
+        await hub._task
+        self.assertIsNone(hub._task)
+
+    async def test_broadcast_survives_read_errors(self):
+        hub = ChangeBroadcaster(window=0.01)
+        subscription = await hub.subscribe()
+        device = self.devices[0]
+        device.name = 'Renamed'
+        await sync_to_async(device.save)()
+        calls = []
+
+        def locked_once(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return read_window(*args)
+
+        with mock.patch('inventory.events.read_window', locked_once):
+            with self.assertLogs('inventory.events', 'ERROR'):
+                message = await asyncio.wait_for(subscription.queue.get(), 5)
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(message['changes'][0]['id'], device.pk)
+        hub.unsubscribe(subscription)
+        await hub._task
+
+        # A task that died anyway is replaced on the next subscribe.
+        hub._task = asyncio.create_task(asyncio.sleep(0))
+        await hub._task
+        subscription = await hub.subscribe()
+        self.assertFalse(hub._task.done())
+        hub.unsubscribe(subscription)
+        await hub._task
+
+    def test_endpoint(self):
+        url = reverse('inventory:topology-events')
+        self.assertEqual(self.client.get(url).status_code, 501)
+
+    async def test_endpoint_asgi(self):
+        url = reverse('inventory:topology-events')
+        hub = ChangeBroadcaster(window=0.01)
+        with mock.patch('inventory.views.broadcaster', hub):
+            response = await self.async_client.get(url, {'device': 'missing'})
+            self.assertEqual(response.status_code, 404)
+            response = await self.async_client.get(url, {'device': self.devices[0].slug})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(len(hub.subscriptions), 1)
+            stream = response.streaming_content
+            self.assertEqual(await stream.__anext__(), b'retry: 2000\n\n')
+            # The ASGI handler cancels the stream when the client disconnects.
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            pending.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await pending
+        self.assertEqual(hub.subscriptions, set())
+        await hub._task
@@ -0,0 +1,354 @@
+"""
+Topology graph builder used by the Vis.js JSON endpoints.
+
+Everything here works on flat ``values_list`` rows instead of model
+instances, so building a graph costs a fixed number of queries no matter
+how many devices or connections exist.
+"""
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Least
+
+from .layout import LAYOUT_MAX_NODES, compute_layout
+from .models import Device, Connection, TopologyVersion
+
+
+NODE_COLOR = '#4ECDC4'
+FOCUS_NODE_COLOR = '#FF6B6B'
+
+VERSION_CACHE_KEY = 'inventory:topology:version'
+SNAPSHOT_CACHE_KEY = 'inventory:topology:{kind}:v{version}'
+LAYOUT_CACHE_KEY = 'inventory:topology:layout:v{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+STREAM_CHUNK_SIZE = 2000
+MAX_NEIGHBOURHOOD_DEPTH = 5
+MAX_NEIGHBOURHOOD_NODES = 500
+
+EDGE_FIELDS = (
+    'source_interface__device_id',
+    'destination_interface__device_id',
+    'connection_type',
+    'description',
+)
+
+
+def device_edges(connections=None):
+    """
+    Yield device-level edges as ``(src_id, dst_id, connection_type, description)``.
+
+    The device ids are resolved through a join on ``Interface`` in the same
+    query, and parallel links between the same pair of devices (in either
+    direction) are collapsed into the first one seen.
+    """
+    if connections is None:
+        connections = Connection.objects.filter(is_active=True)
+    return unique_edges(connections.order_by('pk').values_list(*EDGE_FIELDS))
+
+
+def unique_edges(rows):
+    """Drop rows whose (unordered) device pair has already been yielded."""
+    seen = set()
+    for row in rows:
+        src_id, dst_id = row[0], row[1]
+        key = (src_id, dst_id) if src_id < dst_id else (dst_id, src_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield row
+
+
+def make_node(device_id, name, device_type, color=NODE_COLOR, **extra):
+    """Build a single Vis.js node dict."""
+    node = {
+        'id': str(device_id),
+        'label': name,
+        'title': f"{name} ({device_type})",
+        'color': color,
+    }
+    node.update(extra)
+    return node
+
+
+def pair_id(src_id, dst_id):
+    """Stable edge id for the (unordered) device pair; parallel links share it."""
+    return f'{min(src_id, dst_id)}-{max(src_id, dst_id)}'
+
+
+def make_edge(src_id, dst_id, connection_type, description=None, with_title=False, edge_id=None):
+    """Build a single Vis.js edge dict."""
+    edge = {
+        'from': str(src_id),
+        'to': str(dst_id),
+        'label': connection_type,
+    }
+    if edge_id is not None:
+        edge['id'] = edge_id
+    if with_title:
+        edge['title'] = description or ''
+    return edge
+
+
+def position(positions, device_id):
+    """Vis.js ``x``/``y`` node attributes for ``device_id``, if it has been laid out."""
+    xy = positions.get(device_id)
+    return {'x': xy[0], 'y': xy[1]} if xy else {}
+
+
+def build_network_topology():
+    """
+    Build the full network graph: every active device and every active link.
+
+    Nodes carry precomputed ``x``/``y`` coordinates when a layout is available;
+    edges carry their ``pair_id`` so clients can patch them with a diff
+    (see ``journal.topology_diff``). Runs two queries, plus one for the topology version when it is not cached.
+    """
+    devices = list(
+        Device.objects.filter(is_active=True)
+        .values_list('id', 'name', 'device_type')
+    )
+    edge_rows = list(device_edges())
+    positions = get_network_layout(
+        lambda: ([row[0] for row in devices], [row[:2] for row in edge_rows])
+    )
+
+    nodes = [
+        make_node(device_id, name, device_type, **position(positions, device_id))
+        for device_id, name, device_type in devices
+    ]
+    edges = [
+        make_edge(src_id, dst_id, connection_type, edge_id=pair_id(src_id, dst_id))
+        for src_id, dst_id, connection_type, _ in edge_rows
+    ]
+    return {'nodes': nodes, 'edges': edges}
+
+
+def get_network_layout(load_graph=None):
+    """
+    Return ``{device_id: (x, y)}`` for the full network, computed once per topology version.
+
+    ``load_graph`` returns ``(device_ids, edge_pairs)``; by default both are
+    read from the database. No layout is computed for networks larger than
+    ``LAYOUT_MAX_NODES``.
+    """
+    key = LAYOUT_CACHE_KEY.format(version=get_topology_version())
+    positions = cache.get(key)
+    if positions is None:
+        positions = compute_layout(*(load_graph or _load_layout_graph)())
+        cache.set(key, positions, SNAPSHOT_TIMEOUT)
+    return positions
+
+
+def _load_layout_graph():
+    devices = Device.objects.filter(is_active=True)
+    if devices.count() > LAYOUT_MAX_NODES:
+        return [], []
+    device_ids = list(devices.values_list('id', flat=True))
+    edge_pairs = [row[:2] for row in device_edges()]
+    return device_ids, edge_pairs
+
+
+def build_device_topology(device, depth=1, types=None, max_nodes=MAX_NEIGHBOURHOOD_NODES):
+    """
+    Build the graph around ``device``: the device and its ``depth``-hop neighbourhood.
+
+    The neighbourhood is expanded breadth-first with one set-based query per
+    hop (all connections touching the current frontier), plus one query for
+    links among the outermost ring and one for the devices themselves. Any
+    connection counts for reachability; only active ones are drawn as edges.
+    ``types`` restricts both to the given ``connection_type`` values.
+
+    Expansion stops once ``max_nodes`` devices have been collected, in which
+    case the result is flagged ``truncated``. Each node carries the hop
+    ``level`` it was reached at.
+    """
+    connections = Connection.objects.all()
+    if types:
+        connections = connections.filter(connection_type__in=types)
+    fields = ('is_active',) + EDGE_FIELDS
+
+    levels = {device.id: 0}
+    frontier = {device.id}
+    rows = []
+    truncated = False
+
+    for hop in range(1, depth + 1):
+        if not frontier:
+            break
+        hop_rows = list(
+            connections.filter(
+                Q(source_interface__device_id__in=frontier)
+                | Q(destination_interface__device_id__in=frontier)
+            ).order_by('pk').values_list(*fields)
+        )
+        rows.extend(hop_rows)
+
+        next_frontier = set()
+        for _, src_id, dst_id, _, _ in hop_rows:
+            for device_id in (src_id, dst_id):
+                if device_id in levels:
+                    continue
+                if len(levels) >= max_nodes:
+                    truncated = True
+                    continue
+                levels[device_id] = hop
+                next_frontier.add(device_id)
+        frontier = next_frontier
+
+    if frontier:
+        # Links between devices on the outermost ring were never fetched above.
+        rows.extend(
+            connections.filter(
+                source_interface__device_id__in=frontier,
+                destination_interface__device_id__in=frontier,
+            ).order_by('pk').values_list(*fields)
+        )
+
+    active = list(unique_edges(
+        row[1:] for row in rows
+        if row[0] and row[1] in levels and row[2] in levels
+    ))
+    positions = compute_layout(levels, [row[:2] for row in active])
+
+    devices = (
+        Device.objects.filter(id__in=levels)
+        .values_list('id', 'name', 'device_type')
+    )
+    nodes = []
+    for device_id, name, device_type in devices:
+        focus = device_id == device.id
+        nodes.append(make_node(
+            device_id, name, device_type,
+            color=FOCUS_NODE_COLOR if focus else NODE_COLOR,
+            font={'size': 16 if focus else 14},
+            level=levels[device_id],
+            **position(positions, device_id),
+        ))
+
+    edges = [
+        make_edge(src_id, dst_id, connection_type, description, with_title=True)
+        for src_id, dst_id, connection_type, description in active
+    ]
+
+    return {'nodes': nodes, 'edges': edges, 'truncated': truncated}
+
+
+def stream_network_topology(chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield the same document as ``build_network_topology`` in pieces.
+
+    Devices and connections are read with ``iterator(chunk_size=...)`` and
+    each chunk is encoded and yielded before the next one is fetched.
+    Parallel links are collapsed in SQL order instead of with a seen-set:
+    rows are sorted on the unordered device pair, so a duplicate is always
+    adjacent to the row it duplicates and memory stays flat.
+    """
+    positions = get_network_layout()
+    devices = (
+        Device.objects.filter(is_active=True)
+        .values_list('id', 'name', 'device_type')
+        .iterator(chunk_size=chunk_size)
+    )
+    yield '{"nodes": ['
+    yield from _stream_array(
+        (make_node(*row, **position(positions, row[0])) for row in devices),
+        chunk_size,
+    )
+
+    src = F('source_interface__device_id')
+    dst = F('destination_interface__device_id')
+    connections = (
+        Connection.objects.filter(is_active=True)
+        .annotate(pair_low=Least(src, dst), pair_high=Greatest(src, dst))
+        .order_by('pair_low', 'pair_high', 'pk')
+        .values_list('pair_low', 'pair_high', *EDGE_FIELDS[:3])
+        .iterator(chunk_size=chunk_size)
+    )
+
+    def edges():
+        previous = None
+        for low, high, src_id, dst_id, connection_type in connections:
+            if (low, high) == previous:
+                continue
+            previous = (low, high)
+            yield make_edge(src_id, dst_id, connection_type, edge_id=f'{low}-{high}')
+
+    yield '], "edges": ['
+    yield from _stream_array(edges(), chunk_size)
+    yield ']}'
+
+
+def _stream_array(items, chunk_size):
+    """Encode ``items`` as the body of a JSON array, ``chunk_size`` items per piece."""
+    encoder = DjangoJSONEncoder()
+    batch = []
+    first = True
+    for item in items:
+        batch.append(encoder.encode(item))
+        if len(batch) >= chunk_size:
+            yield ('' if first else ', ') + ', '.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ', ') + ', '.join(batch)
+
+
+def get_topology_version():
+    """
+    Return the current topology version, reading the database only on a cache miss.
+
+    Values read inside an atomic block are not cached: they may include
+    uncommitted bumps that a rollback would take back.
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = (
+            TopologyVersion.objects.filter(pk=1)
+            .values_list('version', flat=True)
+            .first()
+        ) or 0
+        if not transaction.get_connection().in_atomic_block:
+            cache.set(VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def bump_topology_version():
+    """
+    Increment the topology version.
+
+    The counter row is updated inside the current transaction; the cached
+    copy is dropped now and again on commit so no worker keeps serving a
+    version that predates the change.
+    """
+    updated = TopologyVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    if not updated:
+        TopologyVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+    cache.delete(VERSION_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(VERSION_CACHE_KEY))
+
+
+def topology_etag(kind, version=None):
+    """ETag value (without quotes) for a snapshot of ``kind`` at ``version``."""
+    if version is None:
+        version = get_topology_version()
+    return f"{kind}-v{version}"
+
+
+def get_topology_snapshot(kind, build, version=None):
+    """
+    Return the serialized JSON for ``kind`` at ``version``.
+
+    ``build`` is only called on a cache miss; its result is encoded once and
+    the bytes are cached, so hits skip both the graph build and the encoding.
+    """
+    if version is None:
+        version = get_topology_version()
+    key = SNAPSHOT_CACHE_KEY.format(kind=kind, version=version)
+    content = cache.get(key)
+    if content is None:
+        content = json.dumps(build(), cls=DjangoJSONEncoder)
+        cache.set(key, content, SNAPSHOT_TIMEOUT)
+    return content
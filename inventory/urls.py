@@ -6,6 +6,20 @@ app_name = 'inventory'
 urlpatterns = [
     path('devices/', views.DeviceListView.as_view(), name='device-list'),
     path('devices/<slug:slug>/', views.DeviceDetailView.as_view(), name='device-detail'),
+    path('search/', views.DeviceSearchView.as_view(), name='device-search'),
+    path('racks/<path:rack_id>/', views.RackElevationView.as_view(), name='rack-detail'),
     path('api/topology/', views.network_topology_json, name='network-topology-json'),
     path('api/topology/<slug:slug>/', views.device_topology_json, name='device-topology-json'),
+    path('api/history/topology/', views.topology_history_json, name='topology-history-json'),
+    path('api/analysis/', views.topology_analysis_json, name='topology-analysis-json'),
+    path('api/analysis/what-if/', views.failure_impact_json, name='failure-impact-json'),
+    path('api/racks/', views.rack_list_json, name='rack-list-json'),
+    path('api/racks/conflicts/', views.rack_conflicts_json, name='rack-conflicts-json'),
+    path('api/addresses/', views.address_search_json, name='address-search-json'),
+    path('api/addresses/match/', views.address_match_json, name='address-match-json'),
+    path('api/devices/<slug:slug>/', views.device_dossier_json, name='device-dossier-json'),
+    path('api/events/', views.topology_events, name='topology-events'),
+    path('api/macs/', views.mac_lookup_json, name='mac-lookup-json'),
+    path('api/search/', views.device_search_json, name='device-search-json'),
+    path('api/paths/<slug:source>/<slug:target>/', views.shortest_path_json, name='shortest-path-json'),
 ]
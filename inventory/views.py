@@ -1,9 +1,73 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, get_object_or_404
-from django.views.generic import ListView, DetailView
-from django.http import JsonResponse
-from django.db.models import Count, Q
+from django.views.decorators.csrf import csrf_exempt
+from django.views.generic import ListView, TemplateView
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.db.models import Count, Func, OuterRef, Q, Subquery
+
+from visualization.models import Diagram
+
+from .analysis import (
+    annotate_criticality,
+    betweenness_centrality,
+    cut_structure,
+    failure_impact,
+)
+from .clusters import build_clustered_topology, validate_cluster_path
+from .dossier import get_dossier
+from .events import broadcaster, event_stream
+from .facets import (
+    FACET_LABELS,
+    build_facets,
+    facet_counts,
+    facet_label,
+    filter_devices,
+    filter_signature,
+    parse_filters,
+    toggle_url,
+)
+from .addressing import parse_network
+from .graph import MAX_PATHS, get_topology_index
+from .ipam import (
+    MAX_ADDRESS_RESULTS,
+    addresses_between,
+    addresses_in_network,
+    longest_prefix_match,
+)
+from .journal import topology_as_of, topology_diff
+from .macs import MAX_MAC_LOOKUP, lookup_macs
 from .models import Device, Interface, Connection
-import json
+from .pagination import InvalidCursor, KeysetPaginator
+from .racks import find_rack_space, get_racks, rack_conflicts
+from .search import MAX_SEARCH_RESULTS, search_devices
+from .topology import (
+    MAX_NEIGHBOURHOOD_DEPTH,
+    SNAPSHOT_TIMEOUT,
+    build_device_topology,
+    build_network_topology,
+    get_topology_snapshot,
+    get_topology_version,
+    stream_network_topology,
+    topology_etag,
+)
+
+
+DEVICE_EXISTS_CACHE_KEY = 'inventory:topology:exists:{slug}:v{version}'
+
+
+def _count_subquery(queryset):
+    """COUNT(*) of ``queryset`` as a scalar subquery, for use in annotate()."""
+    return Subquery(queryset.order_by().values(count=Func('pk', function='COUNT')))
 
 
 class DeviceListView(ListView):
@@ -13,123 +77,525 @@ class DeviceListView(ListView):
     paginate_by = 50
     
     def get_queryset(self):
-        queryset = Device.objects.all()
-        device_type = self.request.GET.get('type')
-        if device_type:
-            queryset = queryset.filter(device_type=device_type)
-        return queryset
+        """
+        Query params:
+            device_type, os_type, location, rack_id, is_active: Facet filters;
+                repeat one to match any of its values ('type' is an alias
+                for device_type, an empty value matches unset fields)
+            cursor: Page cursor
+        """
+        self.filters = parse_filters(self.request.GET)
+        queryset = filter_devices(Device.objects.all(), self.filters)
+        # Per-device counts as correlated subqueries: evaluated only for the
+        # rows on the page, and with no join fan-out between them. Outgoing
+        # and incoming links are counted separately so each side is an index
+        # lookup (an OR across both would scan every connection per row).
+        interfaces = Interface.objects.filter(device=OuterRef('pk'))
+        outgoing = Connection.objects.filter(source_interface__device=OuterRef('pk'))
+        incoming = Connection.objects.filter(destination_interface__device=OuterRef('pk')).exclude(
+            source_interface__device=OuterRef('pk')
+        )
+        return queryset.annotate(
+            interface_count=_count_subquery(interfaces),
+            connection_count=_count_subquery(outgoing) + _count_subquery(incoming),
+        )
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination on (name, id): deep pages cost the same as the first."""
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        
+        def url_for(token):
+            params.pop('cursor', None)
+            if token:
+                params['cursor'] = token
+            return '?' + params.urlencode() if params else '?'
+        
+        paginator = KeysetPaginator(queryset, page_size, url_for, count_key=filter_signature(self.filters))
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid page cursor.')
+        return paginator, page, page.object_list, page.has_other_pages
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        total, counts = facet_counts(self.filters)
+        context['facets'] = build_facets(self.filters, counts)
+        context['matching_count'] = total
+        context['active_filters'] = [
+            {
+                'label': f'{FACET_LABELS[field]}: {facet_label(field, value)}',
+                'url': toggle_url(self.filters, field, value),
+            }
+            for field, values in self.filters.items()
+            for value in values
+        ]
+        return context
 
 
-class DeviceDetailView(DetailView):
-    model = Device
+class DeviceDetailView(TemplateView):
+    """Device page, rendered from the cached dossier (see ``inventory.dossier``)."""
     template_name = 'inventory/device_detail.html'
-    context_object_name = 'device'
-    slug_field = 'slug'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        device = self.object
-        context['interfaces'] = device.interfaces.all()
-        context['outgoing_connections'] = device.interfaces.prefetch_related('outgoing_connections')
-        context['incoming_connections'] = device.interfaces.prefetch_related('incoming_connections')
+        dossier = get_dossier(self.kwargs['slug'])
+        if dossier is None:
+            raise Http404('No device found matching the query')
+        context.update(dossier)
+        context['dossier'] = dossier
         return context
 
 
+def device_dossier_json(request, slug):
+    """Returns the device dossier: details, interfaces with their links, diagrams and articles."""
+    dossier = get_dossier(slug)
+    if dossier is None:
+        return JsonResponse({'error': 'device not found'}, status=404)
+    return JsonResponse(dossier)
+
+
+class DeviceSearchView(TemplateView):
+    template_name = 'inventory/device_search.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['results'] = search_devices(query, limit=MAX_SEARCH_RESULTS) if query else []
+        return context
+
+
+def _topology_response(request, kind, build, stream=None, exists=None):
+    """
+    Serve a cached topology snapshot with the topology version as its ETag.
+
+    Answers ``If-None-Match`` with 304 while the version is unchanged, so the
+    graph is neither rebuilt nor re-sent. When ``stream`` is given the body
+    is generated from it on the fly instead of going through the snapshot
+    cache. The version is also sent as ``X-Topology-Version`` for clients
+    asking for diffs with ``?since=``. ``exists(version)``, when given, is
+    checked first and a false result is a 404, 304 or not.
+    """
+    version = get_topology_version()
+    if exists is not None and not exists(version):
+        raise Http404('No topology for this request')
+    etag = quote_etag(topology_etag(kind, version))
+    response = get_conditional_response(request, etag=etag)
+    if response is None and stream is not None:
+        response = StreamingHttpResponse(stream(), content_type='application/json')
+    elif response is None:
+        content = get_topology_snapshot(kind, build, version)
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['X-Topology-Version'] = str(version)
+    return response
+
+
 def device_topology_json(request, slug):
     """
     Returns JSON data for Vis.js network visualization.
-    Includes the target device and all directly connected devices.
+    Includes the target device and all devices within ``?depth=N`` hops
+    (default 1), optionally following only ``?types=physical,vlan`` links.
     """
-    device = get_object_or_404(Device, slug=slug)
+    try:
+        depth = int(request.GET.get('depth', 1))
+    except ValueError:
+        return JsonResponse({'error': 'depth must be an integer'}, status=400)
+    if not 1 <= depth <= MAX_NEIGHBOURHOOD_DEPTH:
+        return JsonResponse(
+            {'error': f'depth must be between 1 and {MAX_NEIGHBOURHOOD_DEPTH}'},
+            status=400,
+        )
+
+    types = sorted({t for t in request.GET.get('types', '').split(',') if t})
+    valid_types = {value for value, _ in Connection.CONNECTION_TYPES}
+    unknown = [t for t in types if t not in valid_types]
+    if unknown:
+        return JsonResponse(
+            {'error': f"unknown connection type(s): {', '.join(unknown)}"},
+            status=400,
+        )
+
+    def exists(version):
+        # Device changes bump the version, so the answer holds for all of it.
+        key = DEVICE_EXISTS_CACHE_KEY.format(slug=slug, version=version)
+        return cache.get_or_set(key, lambda: Device.objects.filter(slug=slug).exists(), SNAPSHOT_TIMEOUT)
+
+    def build():
+        device = get_object_or_404(Device, slug=slug)
+        return build_device_topology(device, depth=depth, types=types)
+
+    kind = f"device-{slug}-d{depth}-{'+'.join(types) or 'all'}"
+    return _topology_response(request, kind, build, exists=exists)
+
+
+def network_topology_json(request):
+    """
+    Returns JSON data for full network topology visualization.
     
-    # Collect all connected devices
-    connected_device_ids = set([device.id])
+    Pass ``?stream=1`` on very large networks to have the document streamed
+    in chunks rather than built in memory.
     
-    for interface in device.interfaces.all():
-        # Outgoing connections
-        for conn in interface.outgoing_connections.all():
-            if conn.destination_interface.device_id not in connected_device_ids:
-                connected_device_ids.add(conn.destination_interface.device_id)
-        
-        # Incoming connections
-        for conn in interface.incoming_connections.all():
-            if conn.source_interface.device_id not in connected_device_ids:
-                connected_device_ids.add(conn.source_interface.device_id)
-    
-    # Get all relevant devices
-    devices = Device.objects.filter(id__in=connected_device_ids)
-    
-    # Build nodes
-    nodes = []
-    for dev in devices:
-        nodes.append({
-            'id': str(dev.id),
-            'label': dev.name,
-            'title': f"{dev.name} ({dev.device_type})",
-            'color': '#FF6B6B' if dev.id == device.id else '#4ECDC4',
-            'font': {'size': 16 if dev.id == device.id else 14}
-        })
+    Pass ``?cluster_by=location,rack_id`` to collapse devices into one
+    super-node per group instead; each ``?cluster=<value>`` expands one level
+    of that hierarchy, down to the member devices.
+    
+    Pass ``?size_by=criticality`` to size nodes by betweenness centrality.
+    
+    Pass ``?since=<version>``, the ``X-Topology-Version`` of an earlier
+    response, to get only the nodes and edges added, removed or changed
+    after it.
+    """
+    since = request.GET.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return JsonResponse({'error': 'since must be an integer'}, status=400)
+        if since < 0:
+            return JsonResponse({'error': 'since must not be negative'}, status=400)
+        return _topology_response(request, f'network-since-{since}', lambda: topology_diff(since))
+    
+    cluster_by = [f for f in request.GET.get('cluster_by', '').split(',') if f]
+    if cluster_by:
+        path = request.GET.getlist('cluster')
+        try:
+            validate_cluster_path(cluster_by, path)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        digest = hashlib.sha1(json.dumps([cluster_by, path]).encode()).hexdigest()[:16]
+        return _topology_response(
+            request, f'cluster-{digest}',
+            lambda: build_clustered_topology(cluster_by, path),
+        )
+
+    if request.GET.get('size_by') == 'criticality':
+        return _topology_response(
+            request, 'network-criticality',
+            lambda: annotate_criticality(build_network_topology(), get_topology_index()),
+        )
+
+    stream = stream_network_topology if request.GET.get('stream') == '1' else None
+    return _topology_response(request, 'network', build_network_topology, stream=stream)
+
+
+def topology_history_json(request):
+    """
+    Returns the network topology as it was at a past moment, rebuilt from the
+    change journal.
+    
+    Query params:
+        at: ISO 8601 timestamp (UTC unless it carries an offset)
+    """
+    at = parse_datetime(request.GET.get('at', ''))
+    if at is None:
+        return JsonResponse({'error': 'at must be an ISO 8601 timestamp'}, status=400)
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at, dt_timezone.utc)
+    try:
+        return JsonResponse(topology_as_of(at))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=404)
+
+
+def _followed_devices(device_slugs, diagram_slugs):
+    """Device ids for the ``device`` and ``diagram`` filters, or ``None`` when there are none."""
+    if not device_slugs and not diagram_slugs:
+        return None
+    device_ids = set(Device.objects.filter(slug__in=device_slugs).values_list('id', flat=True))
+    device_ids.update(
+        Diagram.devices.through.objects.filter(diagram__slug__in=diagram_slugs).values_list('device_id', flat=True)
+    )
+    return device_ids
+
+
+async def topology_events(request):
+    """
+    Server-sent events for Device, Interface and Connection changes,
+    coalesced per EVENT_WINDOW. Needs the ASGI application.
+    
+    Query params:
+        device: Only changes touching this device (slug; repeatable)
+        diagram: Only changes touching this diagram's devices (slug; repeatable)
+    
+    Each ``change`` event carries ``{"id", "version", "changes": [...]}``; a
+    ``reset`` event means the client fell behind and should refetch. The
+    browser resumes after a reconnect through ``Last-Event-ID``.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'live events are only served by the ASGI application'}, status=501)
+    device_slugs = request.GET.getlist('device')
+    diagram_slugs = request.GET.getlist('diagram')
+    device_ids = await sync_to_async(_followed_devices)(device_slugs, diagram_slugs)
+    if device_ids is not None and not device_ids:
+        return JsonResponse({'error': 'no devices match the filters'}, status=404)
+    try:
+        after = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        after = None
     
-    # Build edges
-    edges = []
-    edge_set = set()
-    
-    for interface in device.interfaces.all():
-        for conn in interface.outgoing_connections.filter(is_active=True):
-            src_id = str(conn.source_interface.device_id)
-            dst_id = str(conn.destination_interface.device_id)
-            edge_key = tuple(sorted([src_id, dst_id]))
-            
-            if edge_key not in edge_set:
-                edges.append({
-                    'from': src_id,
-                    'to': dst_id,
-                    'label': conn.connection_type,
-                    'title': conn.description or ''
-                })
-                edge_set.add(edge_key)
+    subscription = await broadcaster.subscribe(device_ids, after=after)
+    response = StreamingHttpResponse(event_stream(subscription, broadcaster), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def shortest_path_json(request, source, target):
+    """
+    Returns the shortest path(s) between two devices over active connections.
+    
+    Query params:
+        k: Number of alternative loopless paths to return (default 1)
+        weighted: If '1', links cost CONNECTION_WEIGHTS[connection_type]
+                  instead of one hop each
+    """
+    try:
+        k = int(request.GET.get('k', 1))
+    except ValueError:
+        return JsonResponse({'error': 'k must be an integer'}, status=400)
+    if not 1 <= k <= MAX_PATHS:
+        return JsonResponse({'error': f'k must be between 1 and {MAX_PATHS}'}, status=400)
+    weighted = request.GET.get('weighted') == '1'
+    
+    index = get_topology_index()
+    missing = [slug for slug in (source, target) if slug not in index.slugs]
+    if missing:
+        return JsonResponse(
+            {'error': f"unknown or inactive device(s): {', '.join(missing)}"},
+            status=404,
+        )
     
+    paths = index.k_shortest_paths(index.slugs[source], index.slugs[target], k=k, weighted=weighted)
     return JsonResponse({
-        'nodes': nodes,
-        'edges': edges
+        'source': source,
+        'target': target,
+        'weighted': weighted,
+        'paths': [index.describe_path(cost, path) for cost, path in paths],
     })
 
 
-def network_topology_json(request):
+def topology_analysis_json(request):
     """
-    Returns JSON data for full network topology visualization.
+    Returns single points of failure and the most critical devices.
+    
+    Query params:
+        limit: Number of devices to return in the criticality ranking (default 20)
+    """
+    try:
+        limit = max(int(request.GET.get('limit', 20)), 0)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    index = get_topology_index()
+    points, bridges = cut_structure(index)
+    scores = betweenness_centrality(index)
+    ranking = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    
+    return JsonResponse({
+        'articulation_points': [index.describe_device(d) for d in sorted(points)],
+        'bridges': [
+            {'from': index.describe_device(a), 'to': index.describe_device(b)}
+            for a, b in sorted(bridges)
+        ],
+        'criticality': [
+            dict(index.describe_device(device_id), score=round(score, 6))
+            for device_id, score in ranking
+        ],
+    })
+
+
+@csrf_exempt
+def failure_impact_json(request):
+    """
+    Returns the devices that would lose reachability to a core device.
+    
+    GET evaluates one scenario:
+        ?core=<slug>&failed_devices=<slug>,<slug>&failed_connections=<id>,<id>
+    
+    POST evaluates a batch against the same cached graph, with a JSON body:
+        {"core": "<slug>", "scenarios": [{"devices": [...], "connections": [...]}, ...]}
+    
+    POST only computes and changes nothing, so it is exempt from CSRF checks
+    for API clients.
     """
-    devices = Device.objects.filter(is_active=True)
-    connections = Connection.objects.filter(is_active=True)
-    
-    # Build nodes
-    nodes = []
-    for device in devices:
-        nodes.append({
-            'id': str(device.id),
-            'label': device.name,
-            'title': f"{device.name} ({device.device_type})",
-            'color': '#4ECDC4'
+    if request.method == 'POST':
+        try:
+            payload = json.loads(request.body)
+            core = payload['core']
+            scenarios = [
+                (s.get('devices', []), s.get('connections', []))
+                for s in payload['scenarios']
+            ]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return JsonResponse({'error': 'expected {"core": ..., "scenarios": [...]}'}, status=400)
+    else:
+        core = request.GET.get('core', '')
+        scenarios = [(
+            [s for s in request.GET.get('failed_devices', '').split(',') if s],
+            [c for c in request.GET.get('failed_connections', '').split(',') if c],
+        )]
+    
+    index = get_topology_index()
+    if core not in index.slugs:
+        return JsonResponse({'error': f'unknown or inactive core device: {core}'}, status=404)
+    
+    results = []
+    for device_slugs, connection_ids in scenarios:
+        try:
+            connection_ids = [int(c) for c in connection_ids]
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'connection ids must be integers'}, status=400)
+        failed = {index.slugs[slug] for slug in device_slugs if slug in index.slugs}
+        lost = failure_impact(index, index.slugs[core], failed, connection_ids)
+        results.append({
+            'failed_devices': device_slugs,
+            'failed_connections': connection_ids,
+            'unreachable': [index.describe_device(d) for d in sorted(lost)],
         })
     
-    # Build edges
-    edges = []
-    edge_set = set()
+    return JsonResponse({'core': core, 'scenarios': results})
+
+
+class RackElevationView(TemplateView):
+    """Front elevation of a single rack, rendered from the cached rack index."""
+    template_name = 'inventory/rack_detail.html'
     
-    for conn in connections:
-        src_id = str(conn.source_interface.device_id)
-        dst_id = str(conn.destination_interface.device_id)
-        edge_key = tuple(sorted([src_id, dst_id]))
-        
-        if edge_key not in edge_set:
-            edges.append({
-                'from': src_id,
-                'to': dst_id,
-                'label': conn.connection_type,
-            })
-            edge_set.add(edge_key)
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        rack = get_racks().get(self.kwargs['rack_id'])
+        if rack is None:
+            raise Http404('No devices are mounted in this rack.')
+        context['rack'] = rack
+        context['elevation'] = rack.elevation()
+        return context
+
+
+def rack_list_json(request):
+    """
+    Returns rack occupancy for every rack.
+    
+    Query params:
+        location: Only racks in this location
+        free_units: Only racks with at least this many contiguous free U
+    """
+    try:
+        free_units = int(request.GET.get('free_units', 0))
+    except ValueError:
+        return JsonResponse({'error': 'free_units must be an integer'}, status=400)
+    location = request.GET.get('location') or None
     
+    racks = find_rack_space(free_units, location=location)
+    return JsonResponse({'racks': [rack.as_dict() for rack in racks]})
+
+
+def rack_conflicts_json(request):
+    """Returns every pair of devices with overlapping U ranges, across all racks."""
     return JsonResponse({
-        'nodes': nodes,
-        'edges': edges
+        'conflicts': [
+            {'rack_id': rack.rack_id, 'devices': [a.as_dict(), b.as_dict()]}
+            for rack, a, b in rack_conflicts()
+        ],
     })
+
+
+def address_search_json(request):
+    """
+    Returns devices and interfaces whose IP falls in a subnet or range, in address order.
+    
+    Query params:
+        cidr: Subnet to search, e.g. 10.20.0.0/16 or 2001:db8::/48
+        start, end: Inclusive address range (instead of cidr)
+        limit: Maximum results (default and cap MAX_ADDRESS_RESULTS)
+    """
+    try:
+        limit = int(request.GET.get('limit', MAX_ADDRESS_RESULTS))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    limit = max(1, min(limit, MAX_ADDRESS_RESULTS))
+    
+    cidr = request.GET.get('cidr')
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+    try:
+        if cidr:
+            network = parse_network(cidr)
+            entries, truncated = addresses_in_network(network, limit)
+            query = {'cidr': str(network)}
+        elif start and end:
+            entries, truncated = addresses_between(start, end, limit)
+            query = {'start': start, 'end': end}
+        else:
+            return JsonResponse({'error': 'cidr or start and end are required'}, status=400)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    return JsonResponse({**query, 'count': len(entries), 'truncated': truncated, 'results': entries})
+
+
+def address_match_json(request):
+    """
+    Returns the recorded addresses sharing the longest prefix with an address.
+    
+    Query params:
+        address: IP address to match
+    """
+    try:
+        length, entries = longest_prefix_match(request.GET.get('address', ''))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'address': request.GET['address'], 'prefix_length': length, 'results': entries})
+
+
+@csrf_exempt
+def mac_lookup_json(request):
+    """
+    Returns the interfaces and devices owning MAC addresses, with the ports
+    each interface is connected to. Any notation is accepted.
+    
+    GET looks up a few:
+        ?mac=<mac>&mac=<mac> (or comma-separated)
+    
+    POST looks up a batch, e.g. a switch's CAM table, with a JSON body:
+        {"macs": ["<mac>", ...]}
+    
+    POST only reads, so it is exempt from CSRF checks for API clients.
+    """
+    if request.method == 'POST':
+        try:
+            macs = json.loads(request.body)['macs']
+            if not isinstance(macs, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'expected {"macs": [...]}'}, status=400)
+    else:
+        macs = [mac for value in request.GET.getlist('mac') for mac in value.split(',') if mac.strip()]
+    if not macs:
+        return JsonResponse({'error': 'mac is required'}, status=400)
+    if len(macs) > MAX_MAC_LOOKUP:
+        return JsonResponse({'error': f'at most {MAX_MAC_LOOKUP} MACs per request'}, status=400)
+    
+    results, unknown, invalid = lookup_macs(str(mac) for mac in macs)
+    return JsonResponse({'count': len(results), 'results': results, 'unknown': unknown, 'invalid': invalid})
+
+
+def device_search_json(request):
+    """
+    Returns devices matching a full-text query, best match first.
+    
+    Query params:
+        q: Search text; matches names, descriptions, locations, serials,
+           IPs, MACs and interface names (prefixes allowed)
+        limit: Maximum results (default 20, at most MAX_SEARCH_RESULTS)
+    """
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'q is required'}, status=400)
+    results = search_devices(query, limit=limit)
+    return JsonResponse({'query': query, 'count': len(results), 'results': results})
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from inventory.models import Device
 from .models import Diagram
@@ -18,3 +19,18 @@ class DiagramModelTest(TestCase):
     
     def test_diagram_slug_generation(self):
         self.assertEqual(self.diagram.slug, 'testdiagram')
+
+
+class RackDiagramTest(TestCase):
+    def test_rack_diagram_renders_elevations(self):
+        cache.clear()
+        device = Device.objects.create(
+            name='Rack-Server', device_type='server',
+            rack_id='Rack-07', rack_unit_start=5, rack_unit_height=2,
+        )
+        diagram = Diagram.objects.create(name='Racks', diagram_type='rack')
+        diagram.devices.add(device)
+        response = self.client.get(diagram.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Rack-07')
+        self.assertEqual(len(response.context['rack_elevations']), 1)
@@ -1,5 +1,7 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, DetailView
+from django.db.models import Count
+from inventory.racks import get_racks
 from .models import Diagram
 
 
@@ -10,7 +12,11 @@ class DiagramListView(ListView):
     paginate_by = 50
     
     def get_queryset(self):
-        return Diagram.objects.filter(is_published=True)
+        return (
+            Diagram.objects.filter(is_published=True)
+            .annotate(device_count=Count('devices'))
+            .order_by('name')
+        )
 
 
 class DiagramDetailView(DetailView):
@@ -21,3 +27,15 @@ class DiagramDetailView(DetailView):
     
     def get_queryset(self):
         return Diagram.objects.filter(is_published=True)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object.diagram_type == 'rack':
+            # Render every rack the diagram's devices sit in from the cached rack index
+            rack_ids = set(self.object.devices.exclude(rack_id='').values_list('rack_id', flat=True))
+            racks = get_racks()
+            context['rack_elevations'] = [
+                (racks[rack_id], racks[rack_id].elevation())
+                for rack_id in sorted(r for r in rack_ids if r in racks)
+            ]
+        return context